@@ -2,10 +2,26 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
 import numpy as np
-import time
 import os
+import time
+
+from panut import CacheFiguras, Diagnostico, abrir_loja, abrir_loja_compartilhada, dia_ordinal, exibir_figura
+from panut.diagnostico import mostrar_diagnostico
+from panut.importacao import comparar_catalogo, preparar_produtos, preparar_vendas, resumo_previa
+from panut.indice import ano_ate_hoje, mes_ate_hoje, trimestre_ate_hoje
+from panut.resolucao import (SUFIXOS_BALDE, maiores_estoques, modo_renderizacao, ohlc_adaptativo,
+                             serie_faturamento)
+
+# Banco local e janela de vendas carregada na inicialização
+CAMINHO_BANCO = os.getenv('PANUT_DB', 'panut.db')
+JANELA_DIAS = int(os.getenv('PANUT_JANELA_DIAS', '365'))
+# Log de eventos de estoque; vazio desliga
+DIRETORIO_EVENTOS = os.getenv('PANUT_EVENTOS', 'panut_eventos') or None
+# Vários processos do Streamlit (ver workers.py) compartilhando o banco
+COMPARTILHADO = os.getenv('PANUT_COMPARTILHADO', '') not in ('', '0')
+# Diretório onde um dos workers publica o ledger mapeado pelos demais (requer pyarrow); vazio desliga
+PUBLICACAO = os.getenv('PANUT_PUBLICACAO') or None
 
 # Configurações da página
 st.set_page_config(
@@ -15,118 +31,208 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Função para garantir a carga de dados consistente
-@st.cache_data
-def gerar_dados_iniciais():
-    """
-    Gera um conjunto de dados iniciais para o dashboard.
-    Esta função é decorada com @st.cache_data para garantir que os dados
-    sejam consistentes entre reexecuções no Streamlit Cloud.
-    """
-    produtos = {
-        'Graxas': {'preco': 50.00, 'estoque': 1000},
-        'Pastas': {'preco': 100.00, 'estoque': 5000},
-        'Óleos': {'preco': 200.00, 'estoque': 2000},
-        'Produtos de limpeza': {'preco': 200.00, 'estoque': 5000},
-        'Produtos de manutenção': {'preco': 100.00, 'estoque': 1000}
-    }
-    
-    filiais = ['Brasil', 'Alemanha', 'EUA']
-    
-    # Gerar vendas simuladas
-    vendas = []
-    hoje = datetime.now()
-    for _ in range(50):
-        data = hoje - timedelta(days=np.random.randint(0, 30))
-        produto = np.random.choice(list(produtos.keys()))
-        filial = np.random.choice(filiais, p=[0.6, 0.2, 0.2])
-        quantidade = np.random.randint(1, 10)
-        vendas.append({
-            'data': data.strftime('%Y-%m-%d'),
-            'produto': produto,
-            'filial': filial,
-            'quantidade': quantidade,
-            'valor': produtos[produto]['preco'] * quantidade
-        })
-    
-    return produtos, filiais, vendas
+# Início da execução, para o tempo total por página no diagnóstico
+inicio_execucao = time.perf_counter()
 
-# Inicializa o estado da sessão com dados consistentes
-if 'dados_inicializados' not in st.session_state:
-    # Carregar dados iniciais
-    produtos_iniciais, filiais_iniciais, vendas_iniciais = gerar_dados_iniciais()
-    
-    # Atribuir ao session_state
-    st.session_state.produtos = produtos_iniciais
-    st.session_state.filiais = filiais_iniciais
-    st.session_state.vendas = vendas_iniciais
-    st.session_state.dados_inicializados = True
+# Tempos das seções (PANUT_DIAGNOSTICO=1), agregados entre as sessões do
+# processo; desligado, os pontos de medição não custam quase nada
+@st.cache_resource
+def obter_diagnostico():
+    return Diagnostico.do_ambiente()
+
+diagnostico = obter_diagnostico()
+
+# Loja única do processo: todas as sessões leem e escrevem os mesmos dados
+@st.cache_resource
+def obter_loja():
+    """Abre a loja compartilhada sobre o banco SQLite local"""
+    if COMPARTILHADO:
+        # O banco é a fonte da verdade; o log de eventos é de um único processo
+        return abrir_loja_compartilhada(CAMINHO_BANCO, janela_dias=JANELA_DIAS, publicacao=PUBLICACAO)
+    return abrir_loja(CAMINHO_BANCO, janela_dias=JANELA_DIAS, diretorio_eventos=DIRETORIO_EVENTOS)
+
+loja = obter_loja()
+with diagnostico.secao('snapshot'):
+    dados = loja.snapshot()
 
 # Funções auxiliares
 def calcular_analytics():
-    """Calcula métricas analíticas baseadas nas vendas atuais"""
-    if not st.session_state.vendas:
-        return {
-            'total_vendas': 0,
-            'faturamento_total': 0,
-            'produto_mais_vendido': "Sem vendas",
-            'faturamento_fevereiro': 0
-        }
-    
-    df = pd.DataFrame(st.session_state.vendas)
-    
-    # Encontra o produto mais vendido
-    if not df.empty:
-        produto_mais_vendido = df.groupby('produto')['quantidade'].sum().idxmax()
-    else:
-        produto_mais_vendido = "Sem vendas"
-    
-    # Calcula faturamento de fevereiro
-    faturamento_fevereiro = sum(v['valor'] for v in st.session_state.vendas 
-        if datetime.strptime(v['data'], '%Y-%m-%d').month == 2)
-    
-    return {
-        'total_vendas': len(st.session_state.vendas),
-        'faturamento_total': sum(v['valor'] for v in st.session_state.vendas),
-        'produto_mais_vendido': produto_mais_vendido,
-        'faturamento_fevereiro': faturamento_fevereiro
-    }
+    """Retorna as métricas analíticas mantidas incrementalmente a cada venda"""
+    return dados.analytics
 
 def adicionar_venda(data, produto, filial, quantidade):
     """Adiciona uma nova venda"""
-    if st.session_state.produtos[produto]['estoque'] >= quantidade:
-        venda = {
-            'data': data,
-            'produto': produto,
-            'filial': filial,
-            'quantidade': quantidade,
-            'valor': st.session_state.produtos[produto]['preco'] * quantidade
-        }
-        
-        st.session_state.produtos[produto]['estoque'] -= quantidade
-        st.session_state.vendas.append(venda)
-        return True, "✅ Venda registrada com sucesso!"
-    else:
-        return False, "❌ Estoque insuficiente"
+    return loja.adicionar_venda(data, produto, filial, quantidade)
 
 def gerenciar_produto(nome, preco, estoque, atualizar=False):
     """Adiciona ou atualiza um produto"""
-    if atualizar:
-        if nome not in st.session_state.produtos:
-            return False, "❌ Produto não encontrado"
-        
-        st.session_state.produtos[nome]['estoque'] += estoque
-        st.session_state.produtos[nome]['preco'] = preco
-        return True, "✅ Produto atualizado com sucesso!"
+    return loja.gerenciar_produto(nome, preco, estoque, atualizar)
+
+# Figuras já serializadas, compartilhadas pelas sessões do processo
+@st.cache_resource
+def obter_cache_figuras():
+    return CacheFiguras(int(os.getenv('PANUT_CACHE_FIGURAS_MB', '64')) * 1024 * 1024, diagnostico=obter_diagnostico())
+
+def mostrar_figura(tipo, construir, *filtros, snapshot=None):
+    """Exibe uma figura do cache, montando-a só quando os dados mudam"""
+    snapshot = snapshot if snapshot is not None else dados
+    chave = (tipo, snapshot.epoca, snapshot.versao) + filtros
+    with diagnostico.secao(f'figura:{tipo}'):
+        spec = obter_cache_figuras().obter(chave, construir)
+    with diagnostico.secao(f'envio:{tipo}'):
+        exibir_figura(spec)
+
+# Callbacks dos formulários: gravam antes da reexecução, que já mostra os
+# dados atualizados sem pausa nem st.rerun
+def enviar_venda():
+    estado = st.session_state
+    estado['resultado_venda'] = adicionar_venda(
+        estado['venda_data'].strftime('%Y-%m-%d'),
+        estado['venda_produto'],
+        estado['venda_filial'],
+        int(estado['venda_quantidade'])
+    )
+
+def enviar_produto():
+    estado = st.session_state
+    atualizar = estado['produto_opcao'] == "Atualizar Produto Existente"
+    sufixo = 'atualizar' if atualizar else 'novo'
+    if f'produto_nome_{sufixo}' not in estado:
+        # A opção mudou neste envio: os campos dela só aparecem agora
+        return
+    estado['resultado_produto'] = gerenciar_produto(
+        estado[f'produto_nome_{sufixo}'],
+        float(estado[f'produto_preco_{sufixo}']),
+        int(estado[f'produto_quantidade_{sufixo}']),
+        atualizar
+    )
+
+def importar_arquivo():
+    estado = st.session_state
+    arquivo = estado.get('importacao_arquivo')
+    estado['rejeitadas_importacao'] = None
+    if arquivo is None:
+        estado['resultado_importacao'] = (False, "❌ Selecione um arquivo")
+        return
+    dados = loja.snapshot()
+    try:
+        lote = preparar_vendas(arquivo, dados.produtos, dados.filiais, arquivo.name)
+    except ValueError as e:
+        estado['resultado_importacao'] = (False, f"❌ Arquivo inválido: {e}")
+        return
+    sucesso, mensagem, estado['rejeitadas_importacao'] = loja.importar_vendas(lote)
+    estado['resultado_importacao'] = (sucesso, mensagem)
+
+def limpar_previa_catalogo():
+    st.session_state['previa_catalogo'] = None
+    st.session_state['lote_catalogo'] = None
+
+def previsualizar_catalogo():
+    """Lê o arquivo e compara com o catálogo atual, sem segurar a loja"""
+    estado = st.session_state
+    limpar_previa_catalogo()
+    arquivo = estado.get('catalogo_arquivo')
+    if arquivo is None:
+        estado['resultado_catalogo'] = (False, "❌ Selecione um arquivo")
+        return
+    try:
+        lote = preparar_produtos(arquivo, arquivo.name)
+    except ValueError as e:
+        estado['resultado_catalogo'] = (False, f"❌ Arquivo inválido: {e}")
+        return
+    estado['lote_catalogo'] = lote
+    estado['previa_catalogo'] = comparar_catalogo(lote, loja.snapshot().produtos)
+
+def aplicar_catalogo():
+    estado = st.session_state
+    lote = estado.get('lote_catalogo')
+    if lote is None:
+        return
+    sucesso, mensagem, previa = loja.importar_produtos(lote)
+    estado['resultado_catalogo'] = (sucesso, mensagem)
+    if sucesso:
+        limpar_previa_catalogo()
     else:
-        if nome in st.session_state.produtos:
-            return False, "❌ Este produto já existe!"
-        
-        st.session_state.produtos[nome] = {
-            'preco': preco,
-            'estoque': estoque
-        }
-        return True, "✅ Produto adicionado com sucesso!"
+        estado['previa_catalogo'] = previa
+
+def mostrar_resultado(chave):
+    """Mensagem da última gravação de um formulário, exibida uma vez"""
+    resultado = st.session_state.pop(chave, None)
+    if resultado is not None:
+        sucesso, mensagem = resultado
+        if sucesso:
+            st.success(mensagem)
+        else:
+            st.error(mensagem)
+
+# Linhas rejeitadas exibidas na tela; o relatório completo vai no download
+LINHAS_RELATORIO = 1000
+
+def mostrar_rejeitadas():
+    """Relatório da última importação rejeitada, mantido até a próxima"""
+    rejeitadas = st.session_state.get('rejeitadas_importacao')
+    if rejeitadas is not None and len(rejeitadas['linha']):
+        relatorio = pd.DataFrame(rejeitadas)
+        if len(relatorio) > LINHAS_RELATORIO:
+            st.caption(f"Primeiras {LINHAS_RELATORIO:,} de {len(relatorio):,} linhas rejeitadas")
+        st.dataframe(relatorio.head(LINHAS_RELATORIO), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Baixar relatório de rejeições",
+            relatorio.to_csv(index=False).encode('utf-8'),
+            file_name="vendas_rejeitadas.csv",
+            mime="text/csv"
+        )
+
+def mostrar_previa_catalogo():
+    """Resumo e linhas da prévia da importação de catálogo"""
+    previa = st.session_state.get('previa_catalogo')
+    if previa is None:
+        return
+    resumo = resumo_previa(previa)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Inserções", f"{resumo['inserir']:,}")
+    with col2:
+        st.metric("Atualizações", f"{resumo['atualizar']:,}")
+    with col3:
+        st.metric("Conflitos", f"{resumo['conflito']:,}")
+    if resumo['conflito']:
+        st.warning("Corrija os conflitos no arquivo antes de aplicar.")
+        previa = previa[previa['acao'] == 'conflito']
+    if len(previa) > LINHAS_RELATORIO:
+        st.caption(f"Primeiras {LINHAS_RELATORIO:,} de {len(previa):,} linhas")
+    st.dataframe(previa.head(LINHAS_RELATORIO), use_container_width=True, hide_index=True)
+
+def barra_filtros(cubo):
+    """
+    Filtros do Dashboard na barra lateral. Retorna (inicio, fim, filiais,
+    produtos), com dias ordinais e tuplas de nomes, e None onde não há
+    restrição, para que a visão sem filtros use o caminho mais rápido.
+    """
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Filtros")
+    inicio = fim = None
+    intervalo = cubo.intervalo_dias()
+    if intervalo is not None:
+        primeiro, ultimo = (np.datetime64(dia, 'D').item() for dia in intervalo)
+        periodo = st.sidebar.date_input(
+            "Período",
+            value=(primeiro, ultimo),
+            min_value=primeiro,
+            max_value=ultimo,
+            key="filtro_periodo"
+        )
+        # Durante a escolha do intervalo o widget devolve só a data inicial
+        if len(periodo) == 2 and tuple(periodo) != (primeiro, ultimo):
+            inicio, fim = dia_ordinal(periodo[0]), dia_ordinal(periodo[1])
+    filiais = st.sidebar.multiselect("Filiais", list(cubo.filiais), key="filtro_filiais",
+                                     placeholder="Todas as filiais")
+    produtos = st.sidebar.multiselect("Produtos", list(cubo.produtos), key="filtro_produtos",
+                                      placeholder="Todos os produtos")
+    filtros = (inicio, fim, tuple(filiais) or None, tuple(produtos) or None)
+    if intervalo is not None and cubo.intervalo_dias(*filtros) is None:
+        st.sidebar.warning("Nenhuma venda para os filtros selecionados.")
+    return filtros
 
 # Cabeçalho
 st.title("🏢 Dashboard Panut Brasil")
@@ -136,272 +242,369 @@ st.markdown("### *Empresa Alemã de produtos automotivos e indústria Química*"
 st.sidebar.title("Navegação")
 pagina = st.sidebar.radio(
     "Selecione:",
-    ["Dashboard", "Adicionar Venda", "Gerenciar Produtos e Estoque"]
+    ["Dashboard", "Adicionar Venda", "Gerenciar Produtos e Estoque"] + (["Diagnóstico"] if diagnostico.ativo else [])
 )
+execucao = pagina
 
 # Página principal - Dashboard
 if pagina == "Dashboard":
-    tab1, tab2, tab3 = st.tabs(["📊 Vendas", "📦 Estoque", "🏢 Filiais"])
+    # Seletor no lugar de st.tabs: só a visão escolhida é calculada e desenhada
+    aba = st.radio(
+        "Visão",
+        ["📊 Vendas", "📦 Estoque", "🏢 Filiais"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="aba_dashboard"
+    )
+    execucao = f"Dashboard/{aba.split(' ', 1)[1]}"
     
-    analytics = calcular_analytics()
+    # Período, filiais e produtos escolhidos na barra lateral
+    with diagnostico.secao('filtros'):
+        filtros = barra_filtros(dados.cubo)
+    inicio, fim, filiais, produtos = filtros
     
-    with tab1:
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Faturamento Total", f"R$ {analytics['faturamento_total']:,.2f}")
-        with col2:
-            st.metric("Produto Mais Vendido", analytics['produto_mais_vendido'])
-        with col3:
-            st.metric("Faturamento Fevereiro", f"R$ {analytics['faturamento_fevereiro']:,.2f}")
+    with diagnostico.secao('analytics'):
+        analytics = calcular_analytics()
+    
+    if aba == "📊 Vendas":
+        with diagnostico.secao('metricas:vendas'):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Faturamento Total", f"R$ {analytics['faturamento_total']:,.2f}")
+            with col2:
+                st.metric("Produto Mais Vendido", dados.cubo.produto_mais_vendido(*filtros) or "Sem vendas")
+            with col3:
+                st.metric("Faturamento Fevereiro", f"R$ {analytics['faturamento_fevereiro']:,.2f}")
+        
+            # Períodos até hoje, comparados ao mesmo período do ano anterior
+            hoje = np.datetime64('today', 'D')
+            periodos = [
+                ("Faturamento do Mês", mes_ate_hoje(hoje)),
+                ("Faturamento do Trimestre", trimestre_ate_hoje(hoje)),
+                ("Faturamento do Ano", ano_ate_hoje(hoje))
+            ]
+            for coluna, (rotulo, periodo) in zip(st.columns(3), periodos):
+                atual, anterior = dados.indice.comparar_ano_anterior(*periodo)
+                with coluna:
+                    st.metric(
+                        rotulo,
+                        f"R$ {atual:,.2f}",
+                        f"{atual / anterior - 1:+.1%} vs. ano anterior" if anterior else None
+                    )
         
-        if st.session_state.vendas:
-            df_vendas = pd.DataFrame(st.session_state.vendas)
-            df_vendas['data'] = pd.to_datetime(df_vendas['data'])
+        if dados.cubo.intervalo_dias(*filtros) is not None:
+            def figura_linha():
+                # Período e número de pontos adaptados ao histórico
+                datas, valores, balde = serie_faturamento(dados.cubo, inicio, fim, filiais=filiais, produtos=produtos)
+                
+                fig_linha = px.line(
+                    x=datas,
+                    y=valores,
+                    labels={'x': 'data', 'y': 'valor'},
+                    title='Evolução de Vendas' + SUFIXOS_BALDE[balde],
+                    template='plotly_dark',
+                    render_mode=modo_renderizacao(len(datas))
+                )
+                return fig_linha
             
-            fig_linha = px.line(
-                df_vendas.groupby('data')['valor'].sum().reset_index(),
-                x='data',
-                y='valor',
-                title='Evolução de Vendas',
+            mostrar_figura('linha', figura_linha, *filtros)
+    
+    elif aba == "📦 Estoque":
+        def figura_pizza():
+            nomes, estoques, outros = maiores_estoques(dados.produtos)
+            produtos_df = pd.DataFrame({'produto': nomes, 'estoque': estoques})
+            if outros:
+                produtos_df.loc[len(produtos_df)] = ["Outros", outros]
+            fig_pizza = px.pie(
+                produtos_df,
+                values='estoque',
+                names='produto',
+                title='Distribuição de Estoque',
                 template='plotly_dark'
             )
-            st.plotly_chart(fig_linha, use_container_width=True)
-    
-    with tab2:
-        produtos_df = pd.DataFrame([(k, v['estoque']) for k, v in st.session_state.produtos.items()], 
-                                columns=['produto', 'estoque'])
-        fig_pizza = px.pie(
-            produtos_df,
-            values='estoque',
-            names='produto',
-            title='Distribuição de Estoque',
-            template='plotly_dark'
-        )
-        st.plotly_chart(fig_pizza, use_container_width=True)
+            return fig_pizza
+        
+        mostrar_figura('pizza', figura_pizza)
     
-    with tab3:
-        if st.session_state.vendas:
-            df_vendas = pd.DataFrame(st.session_state.vendas)
-            df_vendas['data'] = pd.to_datetime(df_vendas['data'])
-            
-            cores_filiais = {
-                'Brasil': '#00FF00',
-                'EUA': '#0000FF',
-                'Alemanha': '#FF0000'
-            }
-            
-            df_grouped = df_vendas.groupby(['data', 'filial'])['valor'].agg([
-                ('min', 'min'),
-                ('max', 'max'),
-                ('open', 'first'),
-                ('close', 'last')
-            ]).reset_index()
+    elif aba == "🏢 Filiais":
+        if dados.cubo.intervalo_dias(*filtros) is not None:
+            cubo = dados.cubo
             
-            fig_candle = go.Figure()
-            
-            for filial in ['Brasil', 'Alemanha', 'EUA']:
-                filial_data = df_grouped[df_grouped['filial'] == filial]
+            def figura_candle():
+                cores_filiais = {
+                    'Brasil': '#00FF00',
+                    'EUA': '#0000FF',
+                    'Alemanha': '#FF0000'
+                }
+                
+                ohlc, balde = ohlc_adaptativo(cubo, inicio, fim, filiais=filiais, produtos=produtos)
+                
+                fig_candle = go.Figure()
                 
-                if not filial_data.empty:
-                    fig_candle.add_trace(
-                        go.Candlestick(
-                            x=filial_data['data'],
-                            open=filial_data['open'],
-                            high=filial_data['max'],
-                            low=filial_data['min'],
-                            close=filial_data['close'],
-                            name=filial,
-                            increasing_line_color=cores_filiais[filial],
-                            decreasing_line_color=cores_filiais[filial],
-                            showlegend=True
+                for filial in ['Brasil', 'Alemanha', 'EUA']:
+                    if filial not in cubo.filiais:
+                        continue
+                    linhas = ohlc['filial'] == cubo.filiais.index(filial)
+                
+                    if linhas.any():
+                        fig_candle.add_trace(
+                            go.Candlestick(
+                                x=ohlc['data'][linhas],
+                                open=ohlc['open'][linhas],
+                                high=ohlc['max'][linhas],
+                                low=ohlc['min'][linhas],
+                                close=ohlc['close'][linhas],
+                                name=filial,
+                                increasing_line_color=cores_filiais[filial],
+                                decreasing_line_color=cores_filiais[filial],
+                                showlegend=True
+                            )
                         )
+                
+                fig_candle.update_layout(
+                    title='Análise de Vendas por Filial' + SUFIXOS_BALDE[balde],
+                    template='plotly_dark',
+                    xaxis_title='Data',
+                    yaxis_title='Valor (R$)',
+                    showlegend=True,
+                    legend_title='Filiais',
+                    height=600,
+                    xaxis_rangeslider_visible=False,
+                    yaxis_tickprefix='R$ ',
+                    legend=dict(
+                        yanchor="top",
+                        y=0.99,
+                        xanchor="left",
+                        x=0.01
                     )
-            
-            fig_candle.update_layout(
-                title='Análise de Vendas por Filial',
-                template='plotly_dark',
-                xaxis_title='Data',
-                yaxis_title='Valor (R$)',
-                showlegend=True,
-                legend_title='Filiais',
-                height=600,
-                xaxis_rangeslider_visible=False,
-                yaxis_tickprefix='R$ ',
-                legend=dict(
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="left",
-                    x=0.01
                 )
-            )
+                return fig_candle
             
-            st.plotly_chart(fig_candle, use_container_width=True)
+            mostrar_figura('candle', figura_candle, *filtros)
             
-            col1, col2, col3 = st.columns(3)
-            vendas_por_filial = df_vendas.groupby('filial')['valor'].sum()
+            with diagnostico.secao('metricas:filiais'):
+                col1, col2, col3 = st.columns(3)
+                vendas_por_filial = cubo.faturamento_por_filial(*filtros)
             
-            with col1:
-                st.metric(
-                    "Brasil 🇧🇷",
-                    f"R$ {vendas_por_filial.get('Brasil', 0):,.2f}",
-                    "Líder em vendas"
-                )
-            with col2:
-                st.metric(
-                    "EUA 🇺🇸",
-                    f"R$ {vendas_por_filial.get('EUA', 0):,.2f}"
-                )
-            with col3:
-                st.metric(
-                    "Alemanha 🇩🇪",
-                    f"R$ {vendas_por_filial.get('Alemanha', 0):,.2f}"
-                )
+                with col1:
+                    st.metric(
+                        "Brasil 🇧🇷",
+                        f"R$ {vendas_por_filial.get('Brasil', 0):,.2f}",
+                        "Líder em vendas"
+                    )
+                with col2:
+                    st.metric(
+                        "EUA 🇺🇸",
+                        f"R$ {vendas_por_filial.get('EUA', 0):,.2f}"
+                    )
+                with col3:
+                    st.metric(
+                        "Alemanha 🇩🇪",
+                        f"R$ {vendas_por_filial.get('Alemanha', 0):,.2f}"
+                    )
 
 # Página - Adicionar Venda
 elif pagina == "Adicionar Venda":
     st.header("Registrar Nova Venda")
     
-    with st.form(key="form_venda"):
-        produtos_disponiveis = list(st.session_state.produtos.keys())
-        produto = st.selectbox(
-            "Produto",
-            options=produtos_disponiveis,
-            index=0 if produtos_disponiveis else None
-        )
+    # Fragmento: um envio do formulário reexecuta só esta seção
+    @st.fragment
+    def secao_venda():
+        # Lida a cada execução do fragmento, que pode rodar sozinho
+        dados = loja.snapshot()
         
-        filiais = st.session_state.filiais
-        filial = st.selectbox(
-            "Filial",
-            options=filiais,
-            index=0
-        )
-        
-        quantidade = st.number_input(
-            "Quantidade",
-            min_value=1,
-            value=1
-        )
-        
-        data_venda = st.date_input("Data da Venda")
-        
-        submit_button = st.form_submit_button("Registrar Venda")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Vendas Registradas", dados.analytics['total_vendas'])
+        with col2:
+            st.metric("Faturamento Total", f"R$ {dados.analytics['faturamento_total']:,.2f}")
         
-        if submit_button:
-            success, mensagem = adicionar_venda(
-                data_venda.strftime('%Y-%m-%d'),
-                produto,
-                filial,
-                int(quantidade)
+        with st.form(key="form_venda"):
+            produtos_disponiveis = list(dados.produtos.keys())
+            st.selectbox(
+                "Produto",
+                options=produtos_disponiveis,
+                index=0 if produtos_disponiveis else None,
+                key="venda_produto"
             )
             
-            if success:
-                st.success(mensagem)
-                time.sleep(1)
-                st.rerun()
-            else:
-                st.error(mensagem)
+            filiais = dados.filiais
+            st.selectbox(
+                "Filial",
+                options=filiais,
+                index=0,
+                key="venda_filial"
+            )
+            
+            st.number_input(
+                "Quantidade",
+                min_value=1,
+                value=1,
+                key="venda_quantidade"
+            )
+            
+            st.date_input("Data da Venda", key="venda_data")
+            
+            st.form_submit_button("Registrar Venda", on_click=enviar_venda)
+        
+        mostrar_resultado('resultado_venda')
+        
+        st.subheader("Importar Vendas em Lote")
+        st.caption(
+            "Arquivo CSV ou Parquet com as colunas data (AAAA-MM-DD), produto, filial e quantidade. "
+            "As vendas só são registradas se todas as linhas forem válidas e houver estoque para o total "
+            "de cada produto."
+        )
+        st.file_uploader("Arquivo de vendas", type=['csv', 'parquet'], key="importacao_arquivo")
+        st.button("Importar Vendas", on_click=importar_arquivo)
+        mostrar_resultado('resultado_importacao')
+        mostrar_rejeitadas()
+    
+    secao_venda()
 
 # Página - Gerenciar Produtos e Estoque
 elif pagina == "Gerenciar Produtos e Estoque":
     st.header("Gestão de Estoque")
     
-    tab_estoque, tab_adicionar = st.tabs(["📦 Estoque Atual", "➕ Adicionar/Atualizar Produtos"])
-    
-    with tab_estoque:
-        st.subheader("Estoque Disponível")
-        
-        estoque_df = pd.DataFrame([
-            {
-                'Produto': produto,
-                'Preço': f'R$ {st.session_state.produtos[produto]["preco"]:.2f}',
-                'Estoque': st.session_state.produtos[produto]["estoque"],
-                'Valor Total': f'R$ {st.session_state.produtos[produto]["preco"] * st.session_state.produtos[produto]["estoque"]:.2f}'
-            }
-            for produto in st.session_state.produtos
-        ])
-        
-        st.dataframe(
-            estoque_df,
-            column_config={
-                "Produto": st.column_config.TextColumn("Produto", width="medium"),
-                "Preço": st.column_config.TextColumn("Preço", width="small"),
-                "Estoque": st.column_config.NumberColumn("Quantidade", width="small"),
-                "Valor Total": st.column_config.TextColumn("Valor Total", width="medium")
-            },
-            hide_index=True,
-            use_container_width=True
-        )
+    # Fragmento: um envio do formulário reexecuta só esta seção
+    @st.fragment
+    def secao_estoque():
+        dados = loja.snapshot()
         
-        fig_estoque = px.bar(
-            estoque_df,
-            x='Produto',
-            y='Estoque',
-            title='Quantidade em Estoque por Produto',
-            template='plotly_dark',
-            color='Estoque',
-            color_continuous_scale='Viridis'
+        tab_estoque, tab_adicionar, tab_importar = st.tabs(
+            ["📦 Estoque Atual", "➕ Adicionar/Atualizar Produtos", "📥 Importar Catálogo"]
         )
-        st.plotly_chart(fig_estoque, use_container_width=True)
-    
-    with tab_adicionar:
-        st.subheader("Adicionar Novo Produto ou Atualizar Estoque")
         
-        with st.form(key="form_produto"):
-            opcao = st.radio(
-                "Escolha uma opção:",
-                ["Atualizar Produto Existente", "Adicionar Novo Produto"]
-            )
+        with tab_estoque:
+            st.subheader("Estoque Disponível")
             
-            if opcao == "Atualizar Produto Existente":
-                produto = st.selectbox(
-                    "Selecione o Produto",
-                    list(st.session_state.produtos.keys())
-                )
-                nova_quantidade = st.number_input(
-                    "Quantidade a Adicionar",
-                    min_value=1,
-                    value=1
-                )
-                novo_preco = st.number_input(
-                    "Atualizar Preço (opcional)",
-                    min_value=0.0,
-                    value=float(st.session_state.produtos[produto]["preco"]),
-                    format="%.2f"
-                )
-            else:
-                produto = st.text_input("Nome do Novo Produto")
-                nova_quantidade = st.number_input(
-                    "Quantidade Inicial",
-                    min_value=1,
-                    value=1
+            with diagnostico.secao('tabela_estoque'):
+                estoque_df = pd.DataFrame([
+                    {
+                        'Produto': produto,
+                        'Preço': f'R$ {dados.produtos[produto]["preco"]:.2f}',
+                        'Estoque': dados.produtos[produto]["estoque"],
+                        'Valor Total': f'R$ {dados.produtos[produto]["preco"] * dados.produtos[produto]["estoque"]:.2f}'
+                    }
+                    for produto in dados.produtos
+                ])
+            
+                st.dataframe(
+                    estoque_df,
+                    column_config={
+                        "Produto": st.column_config.TextColumn("Produto", width="medium"),
+                        "Preço": st.column_config.TextColumn("Preço", width="small"),
+                        "Estoque": st.column_config.NumberColumn("Quantidade", width="small"),
+                        "Valor Total": st.column_config.TextColumn("Valor Total", width="medium")
+                    },
+                    hide_index=True,
+                    use_container_width=True
                 )
-                novo_preco = st.number_input(
-                    "Preço do Produto",
-                    min_value=0.01,
-                    value=1.0,
-                    format="%.2f"
+            
+            def figura_estoque():
+                nomes, estoques, _ = maiores_estoques(dados.produtos)
+                fig_estoque = px.bar(
+                    pd.DataFrame({'Produto': nomes, 'Estoque': estoques}),
+                    x='Produto',
+                    y='Estoque',
+                    title='Quantidade em Estoque por Produto' + (
+                        f' ({len(nomes)} maiores)' if len(nomes) < len(dados.produtos) else ''
+                    ),
+                    template='plotly_dark',
+                    color='Estoque',
+                    color_continuous_scale='Viridis'
                 )
+                return fig_estoque
             
-            submit_button = st.form_submit_button("Salvar")
+            mostrar_figura('estoque', figura_estoque, snapshot=dados)
+        
+        with tab_adicionar:
+            st.subheader("Adicionar Novo Produto ou Atualizar Estoque")
             
-            if submit_button:
-                success, mensagem = gerenciar_produto(
-                    produto,
-                    float(novo_preco),
-                    int(nova_quantidade),
-                    opcao == "Atualizar Produto Existente"
+            with st.form(key="form_produto"):
+                opcao = st.radio(
+                    "Escolha uma opção:",
+                    ["Atualizar Produto Existente", "Adicionar Novo Produto"],
+                    key="produto_opcao"
                 )
                 
-                if success:
-                    st.success(mensagem)
-                    time.sleep(1)
-                    st.rerun()
+                if opcao == "Atualizar Produto Existente":
+                    produto = st.selectbox(
+                        "Selecione o Produto",
+                        list(dados.produtos.keys()),
+                        key="produto_nome_atualizar"
+                    )
+                    st.number_input(
+                        "Quantidade a Adicionar",
+                        min_value=1,
+                        value=1,
+                        key="produto_quantidade_atualizar"
+                    )
+                    st.number_input(
+                        "Atualizar Preço (opcional)",
+                        min_value=0.01,
+                        value=float(dados.produtos[produto]["preco"]),
+                        format="%.2f",
+                        key="produto_preco_atualizar"
+                    )
                 else:
-                    st.error(mensagem)
+                    st.text_input("Nome do Novo Produto", key="produto_nome_novo")
+                    st.number_input(
+                        "Quantidade Inicial",
+                        min_value=1,
+                        value=1,
+                        key="produto_quantidade_novo"
+                    )
+                    st.number_input(
+                        "Preço do Produto",
+                        min_value=0.01,
+                        value=1.0,
+                        format="%.2f",
+                        key="produto_preco_novo"
+                    )
+                
+                st.form_submit_button("Salvar", on_click=enviar_produto)
+            
+            mostrar_resultado('resultado_produto')
+        
+        with tab_importar:
+            st.subheader("Importar Catálogo ou Reposição")
+            st.caption(
+                "Arquivo CSV ou Parquet com as colunas produto, preco e estoque. Produtos existentes recebem o "
+                "novo preço (vazio mantém o atual) e têm o estoque somado; produtos novos são inseridos. "
+                "Confira a prévia antes de aplicar: a importação é tudo ou nada."
+            )
+            st.file_uploader(
+                "Arquivo de catálogo",
+                type=['csv', 'parquet'],
+                key="catalogo_arquivo",
+                on_change=limpar_previa_catalogo
+            )
+            previa = st.session_state.get('previa_catalogo')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.button("Pré-visualizar", on_click=previsualizar_catalogo, use_container_width=True)
+            with col2:
+                st.button(
+                    "Aplicar Importação",
+                    on_click=aplicar_catalogo,
+                    disabled=previa is None or resumo_previa(previa)['conflito'] > 0,
+                    use_container_width=True
+                )
+            mostrar_resultado('resultado_catalogo')
+            mostrar_previa_catalogo()
+    
+    secao_estoque()
+
+# Página - Diagnóstico (só com PANUT_DIAGNOSTICO ligado)
+elif pagina == "Diagnóstico":
+    mostrar_diagnostico(diagnostico, obter_cache_figuras())
 
 # Rodapé
 st.markdown("""
 ---
 Desenvolvido orgulhosamente por Cezi Cola Tecnologia  
 Tecnologia puramente em Python – Todos os direitos reservados 2025.
-""") 
\ No newline at end of file
+""") 
+
+diagnostico.observar(f'execucao:{execucao}', time.perf_counter() - inicio_execucao)
@@ -0,0 +1,317 @@
+"""
+Backend Flask do Dashboard Panut Brasil, consumido por dash.py.
+
+Endpoints:
+    GET  /api/dados       produtos, filiais, vendas, analytics e cursor
+    GET  /api/alteracoes  mudanças desde um cursor (?cursor=...); 304 se nada
+                          mudou (If-None-Match com o cursor), 410 se inválido
+    GET  /api/vendas      vendas paginadas (?inicio=0&limite=1000)
+    GET  /api/estoque     estoque de cada produto ao fim de uma data
+                          (?data=AAAA-MM-DD), a partir do log de eventos
+    POST /api/vendas      registra uma venda
+    POST /api/vendas/importar
+                          importa um arquivo CSV ou Parquet (campo
+                          multipart 'arquivo'): todas as vendas ou nenhuma
+    POST /api/produtos    adiciona ou atualiza um produto
+    POST /api/produtos/importar
+                          insere e atualiza produtos de um arquivo (campo
+                          'arquivo'); com ?previa=1 só devolve a prévia
+
+As leituras vêm de snapshots imutáveis da loja e as escritas são
+serializadas por ela, então o app pode ser servido por um servidor WSGI com
+várias threads. Cada resposta GET leva um ETag derivado da versão da loja;
+um If-None-Match com a versão atual custa um 304 sem corpo. Os corpos JSON
+ficam em cache por versão e, acima de 1 KB, são enviados com gzip quando o
+cliente aceita.
+
+/api/dados e /api/alteracoes também respondem como stream IPC do Arrow a
+quem pede `Accept: application/vnd.apache.arrow.stream` (com o pyarrow
+instalado): as vendas vão como colunas num record batch, com os buffers
+comprimidos por PANUT_ARROW_COMPRESSAO (padrão zstd; vazio desliga), e os
+demais campos em JSON nos metadados do esquema. JSON continua o padrão.
+
+Meta de vazão por processo (`gunicorn -w 1 --threads 8 backend:app`,
+medida com benchmarks/bench_backend.py):
+    - POST /api/vendas:                  >= 1 000 req/s
+    - GET condicional sem mudança (304): >= 2 000 req/s
+    - GET /api/vendas (página em cache): >= 1 000 req/s
+
+Use um único worker: a loja vive na memória do processo e vários workers
+teriam estados separados.
+"""
+import gzip
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Flask, Response, jsonify, request
+
+from panut import abrir_loja, dia_ordinal
+from panut.colunar import TIPO_ARROW, arrow_disponivel, lote_vendas, serializar_arrow
+from panut.importacao import comparar_catalogo, preparar_produtos, preparar_vendas, resumo_previa
+
+# Banco local e janela de vendas carregada na inicialização
+CAMINHO_BANCO = os.getenv('PANUT_DB', 'panut.db')
+JANELA_DIAS = int(os.getenv('PANUT_JANELA_DIAS', '365'))
+# Log de eventos de estoque; vazio desliga
+DIRETORIO_EVENTOS = os.getenv('PANUT_EVENTOS', 'panut_eventos') or None
+# Compressão dos buffers das respostas em Arrow ('lz4' ou 'zstd'); vazio desliga
+COMPRESSAO_ARROW = os.getenv('PANUT_ARROW_COMPRESSAO', 'zstd') or None
+
+LIMITE_PAGINA_PADRAO = 1000
+LIMITE_PAGINA_MAXIMO = 10000
+TAMANHO_MINIMO_GZIP = 1024
+RESPOSTAS_EM_CACHE = 64
+
+
+def serializar(dados):
+    """Corpo JSON e, se valer a pena, sua versão gzip"""
+    corpo = json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    comprimido = gzip.compress(corpo, compresslevel=6) if len(corpo) >= TAMANHO_MINIMO_GZIP else None
+    return corpo, comprimido
+
+
+def serializar_arrow_dados(dados, compressao=None):
+    """Vendas (ledger) num stream IPC do Arrow e os demais campos em JSON nos metadados"""
+    dados = dict(dados)
+    vendas = dados.pop('vendas')
+    metadados = {'dados': json.dumps(dados, ensure_ascii=False, separators=(',', ':'))}
+    return serializar_arrow(lote_vendas(vendas, metadados), compressao), None
+
+
+class CacheRespostas:
+    """Corpos serializados (JSON e sua versão gzip, ou Arrow) por chave, com descarte LRU"""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, gerar, formatar=serializar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+
+        # Serializa fora do lock; duas threads podem gerar o mesmo corpo,
+        # o que é inofensivo
+        corpos = formatar(gerar())
+
+        with self._lock:
+            self._itens[chave] = corpos
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+        return corpos
+
+
+def _produtos_json(snapshot):
+    return {nome: dict(dados) for nome, dados in snapshot.produtos.items()}
+
+
+def _previa_json(previa):
+    """Prévia de importação de catálogo como colunas JSON (NaN vira null)"""
+    return previa.astype(object).where(previa.notna(), None).to_dict(orient='list')
+
+
+def criar_app(loja, compressao_arrow=COMPRESSAO_ARROW):
+    """Cria o app Flask servindo a loja informada"""
+    app = Flask(__name__)
+    app.json.ensure_ascii = False
+    cache = CacheRespostas(RESPOSTAS_EM_CACHE)
+    arrow_instalado = arrow_disponivel()
+
+    def pede_arrow():
+        # Sem preferência explícita (ex.: Accept: */*) a resposta é JSON
+        return arrow_instalado and request.accept_mimetypes.best_match(
+            ['application/json', TIPO_ARROW]) == TIPO_ARROW
+
+    def formatar_arrow(dados):
+        return serializar_arrow_dados(dados, compressao_arrow)
+
+    def enviar(corpos, tipo='application/json'):
+        corpo, comprimido = corpos
+        if comprimido is not None and 'gzip' in request.accept_encodings:
+            resposta = Response(comprimido, mimetype=tipo)
+            resposta.headers['Content-Encoding'] = 'gzip'
+        else:
+            resposta = Response(corpo, mimetype=tipo)
+        resposta.headers['Vary'] = 'Accept, Accept-Encoding'
+        return resposta
+
+    def responder(chave, gerar, arrow=False):
+        if arrow:
+            chave = (*chave, 'arrow')
+        # A época distingue versões de processos diferentes, já que `versao`
+        # recomeça em 0 a cada partida
+        etag = f'{loja.epoca}-' + '-'.join(str(parte) for parte in chave)
+        if request.if_none_match.contains(etag):
+            resposta = Response(status=304)
+        elif arrow:
+            resposta = enviar(cache.obter(chave, gerar, formatar_arrow), TIPO_ARROW)
+        else:
+            resposta = enviar(cache.obter(chave, gerar))
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
+
+    @app.get('/api/dados')
+    def dados():
+        snapshot = loja.snapshot()
+        arrow = pede_arrow()
+        return responder(('dados', snapshot.versao), lambda: {
+            'versao': snapshot.versao,
+            'cursor': loja.cursor(snapshot),
+            'produtos': _produtos_json(snapshot),
+            'filiais': list(snapshot.filiais),
+            'vendas': snapshot.vendas if arrow else snapshot.vendas.para_registros(),
+            'analytics': snapshot.analytics
+        }, arrow)
+
+    @app.get('/api/alteracoes')
+    def alteracoes():
+        # O ETag é o cursor da versão atual: um cliente em dia recebe 304
+        cursor_atual = loja.cursor(loja.snapshot())
+        if request.if_none_match.contains(cursor_atual):
+            resposta = Response(status=304)
+        else:
+            arrow = pede_arrow()
+            mudancas = loja.alteracoes(request.args.get('cursor', ''), registros=not arrow)
+            if mudancas is None:
+                return jsonify({'erro': "Cursor inválido; recarregue /api/dados"}), 410
+            resposta = enviar(formatar_arrow(mudancas), TIPO_ARROW) if arrow else enviar(serializar(mudancas))
+            cursor_atual = mudancas['cursor']
+        resposta.set_etag(cursor_atual)
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
+
+    @app.get('/api/vendas')
+    def listar_vendas():
+        snapshot = loja.snapshot()
+        inicio = max(request.args.get('inicio', 0, type=int), 0)
+        limite = request.args.get('limite', LIMITE_PAGINA_PADRAO, type=int)
+        limite = min(max(limite, 1), LIMITE_PAGINA_MAXIMO)
+        total = len(snapshot.vendas)
+        proximo = inicio + limite if inicio + limite < total else None
+
+        return responder(('vendas', snapshot.versao, inicio, limite), lambda: {
+            'versao': snapshot.versao,
+            'total': total,
+            'inicio': inicio,
+            'limite': limite,
+            'proximo': proximo,
+            'vendas': snapshot.vendas.para_registros(inicio, inicio + limite)
+        })
+
+    @app.get('/api/estoque')
+    def estoque_em():
+        data = request.args.get('data', '')
+        try:
+            dia_ordinal(data)
+        except ValueError:
+            data = ''
+        if not data:
+            return jsonify({'erro': "❌ Informe a data como ?data=AAAA-MM-DD"}), 400
+        estoques = loja.estoque_em(data)
+        if estoques is None:
+            return jsonify({'erro': "❌ Log de eventos desligado (PANUT_EVENTOS)"}), 404
+        return jsonify({'data': data, 'estoque': estoques})
+
+    @app.post('/api/vendas')
+    def registrar_venda():
+        venda = request.get_json(silent=True) or {}
+        try:
+            data = venda['data']
+            dia_ordinal(data)
+            produto = venda['produto']
+            filial = venda['filial']
+            quantidade = venda['quantidade']
+            if not isinstance(produto, str) or not isinstance(filial, str) or isinstance(quantidade, bool):
+                raise TypeError
+            # int() truncaria 2.7 para 2
+            if isinstance(quantidade, float) and not quantidade.is_integer():
+                raise ValueError
+            quantidade = int(quantidade)
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return jsonify({'erro': "❌ Dados de venda inválidos"}), 400
+        if quantidade < 1:
+            return jsonify({'erro': "❌ Quantidade deve ser positiva"}), 400
+        if filial not in loja.snapshot().filiais:
+            return jsonify({'erro': "❌ Filial não encontrada"}), 400
+
+        sucesso, mensagem = loja.adicionar_venda(data, produto, filial, quantidade)
+        if not sucesso:
+            return jsonify({'erro': mensagem}), 400
+        return jsonify({'mensagem': mensagem, 'versao': loja.versao, 'epoca': loja.epoca})
+
+    @app.post('/api/vendas/importar')
+    def importar_vendas():
+        arquivo = request.files.get('arquivo')
+        if arquivo is None:
+            return jsonify({'erro': "❌ Envie o arquivo no campo 'arquivo'"}), 400
+        snapshot = loja.snapshot()
+        try:
+            lote = preparar_vendas(arquivo.stream, snapshot.produtos, snapshot.filiais, arquivo.filename or '')
+        except ValueError as e:
+            return jsonify({'erro': f"❌ Arquivo inválido: {e}"}), 400
+
+        sucesso, mensagem, rejeitadas = loja.importar_vendas(lote)
+        if not sucesso:
+            return jsonify({
+                'erro': mensagem,
+                'rejeitadas': {'linha': rejeitadas['linha'].tolist(), 'motivo': rejeitadas['motivo'].tolist()}
+            }), 400
+        return jsonify({'mensagem': mensagem, 'importadas': len(lote), 'versao': loja.versao, 'epoca': loja.epoca})
+
+    @app.post('/api/produtos')
+    def salvar_produto():
+        produto = request.get_json(silent=True) or {}
+        try:
+            nome = str(produto['nome']).strip()
+            preco = float(produto['preco'])
+            estoque = produto['estoque']
+            if isinstance(estoque, bool):
+                raise TypeError
+            # int() truncaria 2.9 para 2
+            if isinstance(estoque, float) and not estoque.is_integer():
+                raise ValueError
+            estoque = int(estoque)
+            atualizar = bool(produto.get('atualizar', False))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return jsonify({'erro': "❌ Dados de produto inválidos"}), 400
+        if not nome or not math.isfinite(preco) or preco <= 0 or estoque < 0:
+            return jsonify({'erro': "❌ Dados de produto inválidos"}), 400
+
+        sucesso, mensagem = loja.gerenciar_produto(nome, preco, estoque, atualizar)
+        if not sucesso:
+            return jsonify({'erro': mensagem}), 400
+        return jsonify({'mensagem': mensagem, 'versao': loja.versao, 'epoca': loja.epoca})
+
+    @app.post('/api/produtos/importar')
+    def importar_produtos():
+        arquivo = request.files.get('arquivo')
+        if arquivo is None:
+            return jsonify({'erro': "❌ Envie o arquivo no campo 'arquivo'"}), 400
+        try:
+            lote = preparar_produtos(arquivo.stream, arquivo.filename or '')
+        except ValueError as e:
+            return jsonify({'erro': f"❌ Arquivo inválido: {e}"}), 400
+
+        if request.args.get('previa', 0, type=int):
+            previa = comparar_catalogo(lote, loja.snapshot().produtos)
+            return jsonify({'previa': _previa_json(previa), 'resumo': resumo_previa(previa)})
+
+        sucesso, mensagem, previa = loja.importar_produtos(lote)
+        if not sucesso:
+            return jsonify({'erro': mensagem, 'previa': _previa_json(previa), 'resumo': resumo_previa(previa)}), 400
+        return jsonify({'mensagem': mensagem, 'resumo': resumo_previa(previa), 'versao': loja.versao,
+                        'epoca': loja.epoca})
+
+    return app
+
+
+app = criar_app(abrir_loja(CAMINHO_BANCO, janela_dias=JANELA_DIAS, diretorio_eventos=DIRETORIO_EVENTOS))
+
+if __name__ == '__main__':
+    app.run(host=os.getenv('HOST', '127.0.0.1'), port=int(os.getenv('PORT', '5000')), threaded=True)
@@ -0,0 +1,77 @@
+"""
+Benchmark de vazão do backend Flask com clientes concorrentes.
+
+Sobe backend.py num servidor WSGI com threads e mede req/s de escritas,
+leituras condicionais (304) e páginas de vendas.
+
+Uso:
+    python benchmarks/bench_backend.py --clientes 8 --requisicoes 2000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def medir(nome, clientes, requisicoes, chamada):
+    locais = threading.local()
+
+    def executar(_):
+        if not hasattr(locais, 'sessao'):
+            locais.sessao = requests.Session()
+        return chamada(locais.sessao)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(clientes) as executor:
+        status = list(executor.map(executar, range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    erros = sum(1 for codigo in status if codigo >= 400)
+    print(f"{nome:<32} {requisicoes / duracao:>9.0f} req/s  erros={erros}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.environ['PANUT_DB'] = os.path.join(diretorio, 'bench_backend.db')
+        import backend
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        servidor = make_server('127.0.0.1', 0, backend.app, threaded=True)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{servidor.server_port}'
+
+        # Estoque suficiente para todas as escritas
+        requests.post(f'{url}/api/produtos', json={
+            'nome': 'Graxas', 'preco': 50.0, 'estoque': args.requisicoes * 10, 'atualizar': True
+        })
+
+        venda = {'data': time.strftime('%Y-%m-%d'), 'produto': 'Graxas', 'filial': 'Brasil', 'quantidade': 1}
+        medir('POST /api/vendas', args.clientes, args.requisicoes,
+              lambda s: s.post(f'{url}/api/vendas', json=venda).status_code)
+
+        etag = requests.get(f'{url}/api/dados').headers['ETag']
+        medir('GET /api/dados (304)', args.clientes, args.requisicoes,
+              lambda s: s.get(f'{url}/api/dados', headers={'If-None-Match': etag}).status_code)
+        medir('GET /api/vendas?limite=1000', args.clientes, args.requisicoes,
+              lambda s: s.get(f'{url}/api/vendas', params={'limite': 1000}).status_code)
+
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark da importação de catálogo: leitura do arquivo, prévia (comparação
+com o catálogo atual) e aplicação atômica na loja, com e sem SQLite.
+
+Uso:
+    python benchmarks/bench_catalogo.py --tamanhos 1000,10000,100000
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_persistencia import FILIAIS, PRODUTOS
+from panut import LojaDados, PersistenciaSQLite
+from panut.importacao import comparar_catalogo, preparar_produtos
+
+
+def arquivo_catalogo(n, semente=0):
+    """CSV com os produtos atuais (reposição) e n produtos novos"""
+    rng = np.random.default_rng(semente)
+    nomes = list(PRODUTOS) + [f'Produto {i}' for i in range(n)]
+    tabela = pd.DataFrame({
+        'produto': nomes,
+        'preco': np.round(rng.uniform(1, 500, len(nomes)), 2),
+        'estoque': rng.integers(0, 1000, len(nomes))
+    })
+    return tabela.to_csv(index=False).encode()
+
+
+def medir(n, diretorio):
+    bruto = arquivo_catalogo(n)
+    persistencia = PersistenciaSQLite(os.path.join(diretorio, 'bench.db')) if diretorio else None
+    loja = LojaDados(PRODUTOS, FILIAIS, persistencia=persistencia)
+
+    inicio = time.perf_counter()
+    lote = preparar_produtos(io.BytesIO(bruto), 'catalogo.csv')
+    leitura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    comparar_catalogo(lote, loja.snapshot().produtos)
+    previa = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    sucesso, mensagem, _ = loja.importar_produtos(lote)
+    aplicacao = time.perf_counter() - inicio
+    assert sucesso, mensagem
+    if persistencia is not None:
+        persistencia.fechar()
+    return leitura, previa, aplicacao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default='1000,10000,100000',
+                        help='Número de produtos novos por arquivo separado por vírgula')
+    parser.add_argument('--sqlite', action='store_true', help='Grava também no SQLite')
+    args = parser.parse_args()
+
+    print(f"{'produtos':>10} {'leitura(s)':>10} {'prévia(s)':>10} {'aplicação(s)':>12}")
+    for n in (int(t) for t in args.tamanhos.split(',')):
+        with tempfile.TemporaryDirectory() as diretorio:
+            leitura, previa, aplicacao = medir(n, diretorio if args.sqlite else None)
+        print(f"{n:>10,} {leitura:>10.2f} {previa:>10.2f} {aplicacao:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
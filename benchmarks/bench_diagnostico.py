@@ -0,0 +1,61 @@
+"""
+Benchmark do diagnóstico por seções: custo de um ponto de medição desligado e
+ligado e tempo da exportação Prometheus.
+
+Uso:
+    python benchmarks/bench_diagnostico.py --chamadas 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from panut.diagnostico import Diagnostico
+
+# Seções medidas numa reexecução típica do Dashboard
+SECOES_POR_EXECUCAO = 12
+
+
+def por_chamada(funcao, chamadas):
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        funcao()
+    return (time.perf_counter() - inicio) / chamadas
+
+
+def custo_secao(diagnostico, chamadas):
+    """Tempo (s) de um bloco `with diagnostico.secao(...)` vazio, descontado o laço"""
+    def medida():
+        with diagnostico.secao('secao'):
+            pass
+
+    def vazio():
+        pass
+
+    return por_chamada(medida, chamadas) - por_chamada(vazio, chamadas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chamadas', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    desligado = custo_secao(Diagnostico(), args.chamadas)
+    ligado = custo_secao(Diagnostico(ativo=True), args.chamadas)
+    print(f"Seção desligada: {desligado * 1e9:,.0f} ns ({desligado * SECOES_POR_EXECUCAO * 1e6:,.1f} µs "
+          f"por reexecução com {SECOES_POR_EXECUCAO} seções)")
+    print(f"Seção ligada:    {ligado * 1e9:,.0f} ns ({ligado * SECOES_POR_EXECUCAO * 1e6:,.1f} µs por reexecução)")
+
+    diagnostico = Diagnostico(ativo=True)
+    for i in range(50):
+        for _ in range(100):
+            diagnostico.observar(f'secao:{i}', 0.01)
+    texto = diagnostico.prometheus()
+    exportacao = por_chamada(diagnostico.prometheus, 100)
+    print(f"Exportação Prometheus de 50 seções: {exportacao * 1e3:,.2f} ms ({len(texto) / 1024:,.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
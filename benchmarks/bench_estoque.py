@@ -0,0 +1,87 @@
+"""
+Reserva de estoque sob concorrência: vazão (vendas/s) com várias threads
+disputando um produto. A garantia de que vendas simultâneas nunca passam do
+estoque é conferida em tests/test_estoque.py.
+
+Uso:
+    python benchmarks/bench_estoque.py --threads 1,4,16 --vendas 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_persistencia import FILIAIS, PRODUTOS
+from panut import LojaDados, PersistenciaSQLite
+
+PRODUTO = 'Graxas'
+
+
+def nova_loja(estoque, diretorio=None):
+    produtos = {nome: dict(dados) for nome, dados in PRODUTOS.items()}
+    produtos[PRODUTO]['estoque'] = estoque
+    persistencia = PersistenciaSQLite(os.path.join(diretorio, 'bench.db')) if diretorio else None
+    return LojaDados(produtos, FILIAIS, persistencia=persistencia)
+
+
+def em_paralelo(n_threads, alvo):
+    """Roda `alvo(i)` em n threads liberadas ao mesmo tempo; retorna os resultados e o tempo"""
+    barreira = threading.Barrier(n_threads + 1)
+    resultados = [None] * n_threads
+
+    def rodar(i):
+        barreira.wait()
+        resultados[i] = alvo(i)
+
+    threads = [threading.Thread(target=rodar, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return resultados, time.perf_counter() - inicio
+
+
+def medir(n_threads, vendas, diretorio=None, esgotado=False):
+    """Vendas/s com `n_threads` threads vendendo o mesmo produto"""
+    loja = nova_loja(0 if esgotado else vendas, diretorio)
+    hoje = str(np.datetime64('today', 'D'))
+    por_thread = vendas // n_threads
+
+    def vender(i):
+        aceitas = 0
+        for _ in range(por_thread):
+            aceitas += loja.adicionar_venda(hoje, PRODUTO, 'Brasil', 1)[0]
+        return aceitas
+
+    aceitas, tempo = em_paralelo(n_threads, vender)
+    if loja._persistencia is not None:
+        loja._persistencia.fechar()
+    assert sum(aceitas) == (0 if esgotado else por_thread * n_threads)
+    return por_thread * n_threads / tempo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', default='1,4,16', help='Números de threads separados por vírgula')
+    parser.add_argument('--vendas', type=int, default=20_000, help='Tentativas de venda por medição')
+    parser.add_argument('--sqlite', action='store_true', help='Grava também no SQLite')
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} {'vendas/s':>10} {'recusas/s (esgotado)':>21}")
+    for n_threads in (int(t) for t in args.threads.split(',')):
+        with tempfile.TemporaryDirectory() as diretorio:
+            vazao = medir(n_threads, args.vendas, diretorio if args.sqlite else None)
+        recusas = medir(n_threads, args.vendas, esgotado=True)
+        print(f"{n_threads:>7} {vazao:>10,.0f} {recusas:>21,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark do log de eventos de estoque: escrita, recuperação do estado na
+partida (último snapshot mais os eventos seguintes, comparado com reler o log
+inteiro) e consulta do estoque num instante passado.
+
+Uso:
+    python benchmarks/bench_eventos.py --tamanhos 100000,1000000,10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from panut.eventos import CADASTRO, REPOSICAO, VENDA, LogEventos
+
+N_PRODUTOS = 1000
+EVENTOS_POR_LOTE = 100_000
+
+
+def preencher(log, n, semente=0):
+    """Acrescenta n eventos (vendas com reposições ocasionais) em lotes"""
+    rng = np.random.default_rng(semente)
+    nomes = np.array([f'Produto {i}' for i in range(N_PRODUTOS)], dtype=object)
+    log.registrar_lote(CADASTRO, nomes.tolist(), np.full(N_PRODUTOS, 10**9), rng.uniform(1, 500, N_PRODUTOS))
+    for inicio in range(0, n, EVENTOS_POR_LOTE):
+        k = min(EVENTOS_POR_LOTE, n - inicio)
+        reposicao = rng.random(k) < 0.05
+        log.registrar_lote(np.where(reposicao, REPOSICAO, VENDA), nomes[rng.integers(0, N_PRODUTOS, k)].tolist(),
+                           np.where(reposicao, rng.integers(10, 100, k), -rng.integers(1, 10, k)))
+
+
+def cronometrar(funcao, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def medir(n, diretorio):
+    log = LogEventos(diretorio)
+    inicio = time.perf_counter()
+    preencher(log, n)
+    escrita = time.perf_counter() - inicio
+    meio = int(log._registros(len(log) // 2, len(log) // 2 + 1)['momento'][0])
+
+    inicio = time.perf_counter()
+    for _ in range(10_000):
+        log.registrar(VENDA, 'Produto 0', -1)
+    unitario = (time.perf_counter() - inicio) / 10_000
+    log.fechar()
+
+    # Partida: abrir o log e reconstruir o estado atual
+    com_snapshot, estado = cronometrar(lambda: LogEventos(diretorio).estado())
+    passado, _ = cronometrar(lambda: LogEventos(diretorio).estado(meio))
+    os.rename(os.path.join(diretorio, 'snapshots'), os.path.join(diretorio, 'snapshots_off'))
+    sem_snapshot, estado_completo = cronometrar(lambda: LogEventos(diretorio).estado())
+    assert estado == estado_completo
+    tamanho = os.path.getsize(os.path.join(diretorio, 'eventos.bin'))
+    return tamanho, escrita, unitario, com_snapshot, sem_snapshot, passado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default='100000,1000000,10000000',
+                        help='Número de eventos no log separado por vírgula')
+    args = parser.parse_args()
+
+    print(f"{'eventos':>11} {'log(MB)':>8} {'escrita(s)':>10} {'evento(µs)':>10} {'partida(ms)':>11} "
+          f"{'sem snapshot(ms)':>16} {'passado(ms)':>11}")
+    for n in (int(t) for t in args.tamanhos.split(',')):
+        with tempfile.TemporaryDirectory() as diretorio:
+            tamanho, escrita, unitario, com_snapshot, sem_snapshot, passado = medir(n, diretorio)
+        print(f"{n:>11,} {tamanho / 2 ** 20:>8.1f} {escrita:>10.2f} {unitario * 1e6:>10.1f} "
+              f"{com_snapshot * 1e3:>11.1f} {sem_snapshot * 1e3:>16.1f} {passado * 1e3:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark dos filtros do Dashboard: faturamento filtrado por período, filial e
+produto com varredura por máscara e com o índice de filtros, sobre as vendas
+do ledger e sobre as células do cubo.
+
+Uso:
+    python benchmarks/bench_filtros.py --tamanhos 1000000,5000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_persistencia import ledger_aleatorio
+from panut import CuboVendas
+from panut.filtros import IndiceFiltros
+
+
+def cenarios(ultimo_dia):
+    """(nome, inicio, fim, filiais, produtos) com códigos do ledger"""
+    return [
+        ('últimos 30 dias', ultimo_dia - 29, ultimo_dia, None, None),
+        ('30 dias + filial', ultimo_dia - 29, ultimo_dia, [1], None),
+        ('filial + produto', None, None, [2], [0]),
+        ('90 dias + filial + 2 produtos', ultimo_dia - 89, ultimo_dia, [0], [1, 3])
+    ]
+
+
+def varrer(dias, filiais, produtos, inicio, fim, codigos_filiais, codigos_produtos):
+    """Linhas selecionadas por máscara booleana sobre todas as linhas"""
+    mascara = np.ones(len(dias), dtype=bool)
+    if inicio is not None:
+        mascara &= dias >= inicio
+    if fim is not None:
+        mascara &= dias <= fim
+    if codigos_filiais is not None:
+        mascara &= np.isin(filiais, codigos_filiais)
+    if codigos_produtos is not None:
+        mascara &= np.isin(produtos, codigos_produtos)
+    return mascara
+
+
+def cronometrar(funcao, repeticoes):
+    """Menor tempo (s) entre as repetições e o último resultado"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def medir(rotulo, dias, filiais, produtos, valores, ultimo_dia, repeticoes):
+    inicio = time.perf_counter()
+    indice = IndiceFiltros(dias, filiais, produtos)
+    construcao = time.perf_counter() - inicio
+    print(f"{rotulo}: {len(dias):,} linhas, índice montado em {construcao * 1000:.0f} ms")
+
+    for nome, *filtro in cenarios(ultimo_dia):
+        t_mascara, total_mascara = cronometrar(
+            lambda: float(valores[varrer(dias, filiais, produtos, *filtro)].sum()), repeticoes)
+        t_indice, (linhas, total_indice) = cronometrar(
+            lambda: (lambda ids: (len(ids), float(valores[ids].sum())))(indice.linhas(*filtro)), repeticoes)
+        assert np.isclose(total_mascara, total_indice), (nome, total_mascara, total_indice)
+        print(f"  {nome:<30} {linhas:>10,} linhas  máscara {t_mascara * 1000:>8.2f} ms  "
+              f"índice {t_indice * 1000:>8.2f} ms  ({t_mascara / max(t_indice, 1e-9):.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default='1000000,5000000',
+                        help='Número de vendas separado por vírgula')
+    parser.add_argument('--dias-historico', type=int, default=1825)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    for n in (int(t) for t in args.tamanhos.split(',')):
+        ledger = ledger_aleatorio(n, args.dias_historico)
+        ultimo_dia = int(ledger.dia.max())
+        medir(f"ledger ({n:,} vendas)", ledger.dia, ledger.filial, ledger.produto, ledger.valor,
+              ultimo_dia, args.repeticoes)
+
+        cubo = CuboVendas.de_ledger(ledger)
+        medir(f"cubo ({n:,} vendas)", cubo.coluna('dia'), cubo.coluna('filial'), cubo.coluna('produto'),
+              cubo.coluna('valor'), ultimo_dia, args.repeticoes)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark dos gráficos do Dashboard: tamanho do JSON e tempo de montagem por
+tamanho do histórico, com resolução diária fixa e com resolução adaptativa.
+
+Uso:
+    python benchmarks/bench_graficos.py --historicos 30,365,1825,7300
+"""
+import argparse
+import os
+import sys
+import time
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_persistencia import FILIAIS, ledger_aleatorio
+from panut import CuboVendas
+from panut.resolucao import modo_renderizacao, ohlc_adaptativo, serie_faturamento
+
+
+def figura_linha(datas, valores, render_mode='auto'):
+    return px.line(x=datas, y=valores, labels={'x': 'data', 'y': 'valor'}, template='plotly_dark',
+                   render_mode=render_mode)
+
+
+def figura_candle(cubo, ohlc):
+    figura = go.Figure()
+    for filial in FILIAIS:
+        linhas = ohlc['filial'] == cubo.filiais.index(filial)
+        figura.add_trace(go.Candlestick(x=ohlc['data'][linhas], open=ohlc['open'][linhas],
+                                        high=ohlc['max'][linhas], low=ohlc['min'][linhas],
+                                        close=ohlc['close'][linhas], name=filial))
+    return figura
+
+
+def medir(montar):
+    """Tempo (s) para montar e serializar uma figura e o tamanho do JSON (bytes)"""
+    inicio = time.perf_counter()
+    spec = plotly.io.to_json(montar(), validate=False)
+    return time.perf_counter() - inicio, len(spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--historicos', default='30,365,1825,7300',
+                        help='Dias de histórico separados por vírgula')
+    parser.add_argument('--vendas-por-dia', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'dias':>6} {'modo':>11} {'pontos':>7} {'linha(KB)':>9} {'linha(ms)':>9} "
+          f"{'velas':>6} {'candle(KB)':>10} {'candle(ms)':>10}")
+    for dias in (int(d) for d in args.historicos.split(',')):
+        cubo = CuboVendas.de_ledger(ledger_aleatorio(dias * args.vendas_por_dia, dias))
+
+        datas, valores = cubo.faturamento_por_dia()
+        ohlc = cubo.ohlc_por_dia_filial()
+        linha = medir(lambda: figura_linha(datas, valores))
+        candle = medir(lambda: figura_candle(cubo, ohlc))
+        print(f"{dias:>6} {'diário':>11} {len(datas):>7} {linha[1] / 1024:>9.1f} {linha[0] * 1000:>9.1f} "
+              f"{len(ohlc['data']):>6} {candle[1] / 1024:>10.1f} {candle[0] * 1000:>10.1f}")
+
+        datas, valores, _ = serie_faturamento(cubo)
+        ohlc, balde = ohlc_adaptativo(cubo)
+        linha = medir(lambda: figura_linha(datas, valores, modo_renderizacao(len(datas))))
+        candle = medir(lambda: figura_candle(cubo, ohlc))
+        print(f"{dias:>6} {'adaptativo':>11} {len(datas):>7} {linha[1] / 1024:>9.1f} {linha[0] * 1000:>9.1f} "
+              f"{len(ohlc['data']):>6} {candle[1] / 1024:>10.1f} {candle[0] * 1000:>10.1f}  ({balde})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark da importação de vendas em lote: leitura e validação do arquivo
+(CSV e Parquet) e aplicação atômica na loja, comparadas com o registro venda a
+venda por `adicionar_venda`.
+
+Uso:
+    python benchmarks/bench_importacao.py --tamanhos 10000,100000,1000000
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_persistencia import FILIAIS, PRODUTOS
+from panut import LojaDados, PersistenciaSQLite
+from panut.importacao import preparar_vendas
+
+
+def arquivo_vendas(n, formato, semente=0):
+    """Bytes de um arquivo com n vendas válidas no formato 'csv' ou 'parquet'"""
+    rng = np.random.default_rng(semente)
+    hoje = np.datetime64('today', 'D')
+    tabela = pd.DataFrame({
+        'data': (hoje - rng.integers(0, 365, n)).astype(str),
+        'produto': rng.choice(list(PRODUTOS), n),
+        'filial': rng.choice(FILIAIS, n),
+        'quantidade': rng.integers(1, 10, n)
+    })
+    saida = io.BytesIO()
+    if formato == 'parquet':
+        tabela.to_parquet(saida, index=False)
+    else:
+        tabela.to_csv(saida, index=False)
+    return saida.getvalue()
+
+
+def nova_loja(diretorio=None):
+    persistencia = PersistenciaSQLite(os.path.join(diretorio, 'bench.db')) if diretorio else None
+    return LojaDados(PRODUTOS, FILIAIS, persistencia=persistencia)
+
+
+def medir_lote(n, formato, diretorio):
+    bruto = arquivo_vendas(n, formato)
+    loja = nova_loja(diretorio)
+    snapshot = loja.snapshot()
+
+    inicio = time.perf_counter()
+    lote = preparar_vendas(io.BytesIO(bruto), snapshot.produtos, snapshot.filiais, f'vendas.{formato}')
+    leitura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    sucesso, mensagem, _ = loja.importar_vendas(lote)
+    aplicacao = time.perf_counter() - inicio
+    assert sucesso, mensagem
+    if loja._persistencia is not None:
+        loja._persistencia.fechar()
+    return len(bruto), leitura, aplicacao
+
+
+def medir_unitario(n):
+    """Tempo de registrar n vendas uma a uma (sem persistência)"""
+    lote = pd.read_csv(io.BytesIO(arquivo_vendas(n, 'csv')))
+    loja = nova_loja()
+    inicio = time.perf_counter()
+    for data, produto, filial, quantidade in lote.itertuples(index=False):
+        loja.adicionar_venda(data, produto, filial, int(quantidade))
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default='10000,100000,1000000',
+                        help='Número de vendas por arquivo separado por vírgula')
+    parser.add_argument('--sqlite', action='store_true', help='Grava também no SQLite')
+    args = parser.parse_args()
+
+    formatos = ['csv']
+    try:
+        import pyarrow  # noqa: F401
+        formatos.append('parquet')
+    except ImportError:
+        print("pyarrow não instalado: Parquet fica de fora")
+
+    print(f"{'vendas':>10} {'formato':>8} {'arquivo(MB)':>11} {'leitura(s)':>10} {'aplicação(s)':>12} "
+          f"{'vendas/s':>10}")
+    for n in (int(t) for t in args.tamanhos.split(',')):
+        for formato in formatos:
+            with tempfile.TemporaryDirectory() as diretorio:
+                tamanho, leitura, aplicacao = medir_lote(n, formato, diretorio if args.sqlite else None)
+            print(f"{n:>10,} {formato:>8} {tamanho / 2 ** 20:>11.1f} {leitura:>10.2f} {aplicacao:>12.2f} "
+                  f"{n / (leitura + aplicacao):>10,.0f}")
+
+    n = 10_000
+    tempo = medir_unitario(n)
+    print(f"\nadicionar_venda venda a venda: {n:,} vendas em {tempo:.2f} s ({n / tempo:,.0f} vendas/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark da persistência SQLite: latência de escrita e tempo de partida a frio.
+
+Uso:
+    python benchmarks/bench_persistencia.py --tamanhos 10000,1000000,10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from panut import LedgerVendas, LojaDados, PersistenciaSQLite
+
+PRODUTOS = {
+    'Graxas': {'preco': 50.00, 'estoque': 10**12},
+    'Pastas': {'preco': 100.00, 'estoque': 10**12},
+    'Óleos': {'preco': 200.00, 'estoque': 10**12},
+    'Produtos de limpeza': {'preco': 200.00, 'estoque': 10**12},
+    'Produtos de manutenção': {'preco': 100.00, 'estoque': 10**12}
+}
+FILIAIS = ['Brasil', 'Alemanha', 'EUA']
+
+
+def ledger_aleatorio(n, dias_historico, semente=0):
+    """Ledger com n vendas espalhadas pelos últimos `dias_historico` dias"""
+    rng = np.random.default_rng(semente)
+    hoje = int(np.datetime64('today', 'D').astype(np.int64))
+    ledger = LedgerVendas(PRODUTOS, FILIAIS, capacidade=n)
+    precos = np.array([dados['preco'] for dados in PRODUTOS.values()])
+    produtos = rng.integers(0, len(PRODUTOS), n)
+    quantidades = rng.integers(1, 10, n)
+    ledger.estender(
+        np.sort(rng.integers(hoje - dias_historico, hoje + 1, n)),
+        produtos,
+        rng.choice(len(FILIAIS), n, p=[0.6, 0.2, 0.2]),
+        quantidades,
+        precos[produtos] * quantidades
+    )
+    return ledger
+
+
+def medir(n, janela_dias, dias_historico, vendas_escrita, diretorio):
+    caminho = os.path.join(diretorio, f'bench_{n}.db')
+    persistencia = PersistenciaSQLite(caminho)
+    inicio = time.perf_counter()
+    persistencia.importar(PRODUTOS, FILIAIS, ledger_aleatorio(n, dias_historico))
+    carga = time.perf_counter() - inicio
+    persistencia.fechar()
+
+    # Partida a frio: abrir o banco e carregar só a janela recente
+    inicio = time.perf_counter()
+    persistencia = PersistenciaSQLite(caminho)
+    produtos, filiais, vendas, analytics, cubo = persistencia.carregar(janela_dias=janela_dias)
+    partida = time.perf_counter() - inicio
+    vendas_na_janela = len(vendas)
+
+    # Latência por venda, incluindo os commits em lote
+    loja = LojaDados(produtos, filiais, vendas, analytics=analytics, persistencia=persistencia, cubo=cubo)
+    hoje = np.datetime64('today', 'D')
+    latencias = np.empty(vendas_escrita)
+    for i in range(vendas_escrita):
+        inicio = time.perf_counter()
+        loja.adicionar_venda(hoje, 'Graxas', 'Brasil', 1)
+        latencias[i] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    persistencia.descarregar()
+    latencias[-1] += time.perf_counter() - inicio
+    persistencia.fechar()
+
+    return {
+        'vendas': n,
+        'carga_inicial_s': carga,
+        'partida_fria_s': partida,
+        'vendas_na_janela': vendas_na_janela,
+        'escrita_p50_us': float(np.percentile(latencias, 50) * 1e6),
+        'escrita_p99_us': float(np.percentile(latencias, 99) * 1e6),
+        'escrita_media_us': float(latencias.mean() * 1e6),
+        'tamanho_banco_mb': os.path.getsize(caminho) / 2**20
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default='10000,1000000,10000000',
+                        help='Tamanhos do ledger separados por vírgula')
+    parser.add_argument('--janela', type=int, default=365, help='Dias carregados na partida')
+    parser.add_argument('--historico', type=int, default=5 * 365, help='Dias cobertos pelas vendas')
+    parser.add_argument('--escritas', type=int, default=10_000, help='Vendas gravadas por medição')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"{'vendas':>10} {'carga(s)':>9} {'partida(s)':>10} {'janela':>9} "
+              f"{'p50(us)':>8} {'p99(us)':>8} {'banco(MB)':>9}")
+        for n in (int(t) for t in args.tamanhos.split(',')):
+            r = medir(n, args.janela, args.historico, args.escritas, diretorio)
+            print(f"{r['vendas']:>10} {r['carga_inicial_s']:>9.2f} {r['partida_fria_s']:>10.2f} "
+                  f"{r['vendas_na_janela']:>9} {r['escrita_p50_us']:>8.1f} {r['escrita_p99_us']:>8.1f} "
+                  f"{r['tamanho_banco_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark da publicação do ledger em snapshots Arrow mapeados em memória
+(panut/publicacao.py): tempo de publicação e de mapeamento, e memória de
+cada processo leitor, comparada com a de processos que guardam a própria
+cópia do ledger (como um worker sem publicação).
+
+A memória vem de /proc/self/smaps_rollup (Linux): `privada` é o que só o
+processo ocupa e `PSS` divide as páginas compartilhadas entre os processos
+que as usam. Os leitores percorrem todas as colunas antes da medição.
+
+Uso:
+    python benchmarks/bench_publicacao.py --vendas 10000000 --leitores 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from panut.dados_iniciais import FILIAIS_INICIAIS, PRODUTOS_INICIAIS
+from panut.ledger import TIPOS_COLUNAS
+from panut.publicacao import LeitorLedger, PublicadorLedger
+from panut.sintetico import ledger_sintetico
+
+
+def memoria():
+    """(RSS, PSS, privada) do processo em MB"""
+    campos = {}
+    with open('/proc/self/smaps_rollup', encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            partes = linha.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return campos['Rss'], campos['Pss'], campos['Private_Clean'] + campos['Private_Dirty']
+
+
+def _ler(diretorio, copiar, barreira, resultados):
+    antes = memoria()
+    inicio = time.perf_counter()
+    leitor = LeitorLedger(diretorio)
+    leitor.atualizar()
+    ledger = leitor.ledger
+    tempo = time.perf_counter() - inicio
+    colunas = [np.array(getattr(ledger, nome)) if copiar else getattr(ledger, nome) for nome in TIPOS_COLUNAS]
+    # Percorre todas as páginas, como uma agregação sobre o ledger inteiro
+    total = sum(float(coluna.sum()) for coluna in colunas)
+    barreira.wait()
+    depois = memoria()
+    resultados.put((tempo, total, *(d - a for d, a in zip(depois, antes))))
+    barreira.wait()
+
+
+def medir_leitores(diretorio, leitores, copiar):
+    contexto = multiprocessing.get_context('spawn')
+    barreira = contexto.Barrier(leitores)
+    resultados = contexto.Queue()
+    processos = [contexto.Process(target=_ler, args=(diretorio, copiar, barreira, resultados))
+                 for _ in range(leitores)]
+    for processo in processos:
+        processo.start()
+    medidas = [resultados.get() for _ in processos]
+    for processo in processos:
+        processo.join()
+    assert len({medida[1] for medida in medidas}) == 1
+    return np.mean(np.array([medida[:1] + medida[2:] for medida in medidas]), axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vendas', type=int, default=10_000_000, help='Vendas no ledger')
+    parser.add_argument('--leitores', type=int, default=4, help='Processos leitores simultâneos')
+    args = parser.parse_args()
+
+    produtos = {nome: {'preco': dados['preco'], 'estoque': 10 ** 12} for nome, dados in PRODUTOS_INICIAIS.items()}
+    ledger = ledger_sintetico(args.vendas, produtos, FILIAIS_INICIAIS, semente=0).congelar()
+    print(f"Ledger: {args.vendas:,} vendas, {ledger.nbytes() / 2 ** 20:,.0f} MB")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        publicador = PublicadorLedger(diretorio)
+        publicador.assumir()
+        inicio = time.perf_counter()
+        publicador.publicar(ledger)
+        publicacao = time.perf_counter() - inicio
+        tamanho = sum(os.path.getsize(os.path.join(diretorio, nome))
+                      for nome in os.listdir(diretorio) if nome.endswith('.arrow'))
+        print(f"Publicação: {publicacao * 1e3:,.0f} ms, arquivo de {tamanho / 2 ** 20:,.0f} MB")
+
+        print(f"\n{args.leitores} leitores simultâneos, média por processo:")
+        print(f"{'modo':<10} {'abrir(ms)':>10} {'RSS(MB)':>9} {'PSS(MB)':>9} {'privada(MB)':>12}")
+        for modo, copiar in (('mapeado', False), ('cópia', True)):
+            tempo, rss, pss, privada = medir_leitores(diretorio, args.leitores, copiar)
+            print(f"{modo:<10} {tempo * 1e3:>10.1f} {rss:>9.0f} {pss:>9.0f} {privada:>12.0f}")
+        publicador.fechar()
+
+
+if __name__ == '__main__':
+    main()
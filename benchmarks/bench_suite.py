@@ -0,0 +1,270 @@
+"""
+Suíte de benchmarks dos caminhos quentes do Dashboard, com o app.py rodando
+sem navegador (streamlit.testing.v1.AppTest), para ledgers de 1e3 a 1e7
+vendas.
+
+Mede, para cada tamanho: snapshot da loja após uma escrita (o que
+`calcular_analytics` lê), recálculo completo das métricas, `adicionar_venda`,
+`gerenciar_produto`, OHLC (agrupamento do ledger e do cubo), montagem e
+serialização de cada figura, reexecução completa de cada visão e página do
+app (com e sem escrita antes, isto é, sem e com o cache de figuras) e pico de
+memória (RSS). Cada tamanho roda num processo separado, para que o pico de
+memória seja só dele.
+
+Os resultados vão para um JSON e são comparados com a linha de base
+(benchmarks/baseline.json); o código de saída é 1 se alguma medição piorar
+além da tolerância. A linha de base só vale para a máquina em que foi gravada.
+
+Uso:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --tamanhos 1000,100000 --sem-comparar
+    python benchmarks/bench_suite.py --atualizar-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+BASELINE = os.path.join(RAIZ, 'benchmarks', 'baseline.json')
+TAMANHOS_PADRAO = '1000,10000,100000,1000000,10000000'
+
+# Piora relativa tolerada. Medições mais curtas que a diferença mínima (s)
+# são dominadas pelo ruído e só contam como regressão se passarem do dobro
+TOLERANCIA = 0.5
+DIFERENCA_MINIMA = 0.005
+# Piora (MB) ignorada no pico de memória
+DIFERENCA_MINIMA_RSS = 16
+
+ABAS = {'📊 Vendas': 'vendas', '📦 Estoque': 'estoque', '🏢 Filiais': 'filiais'}
+PAGINAS = {'Adicionar Venda': 'adicionar_venda', 'Gerenciar Produtos e Estoque': 'produtos'}
+
+
+def cronometrar(funcao, repeticoes=5):
+    """Mediana do tempo (s) de `repeticoes` chamadas"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def por_chamada(funcao, chamadas, repeticoes=5):
+    """Mediana do tempo médio (s) por chamada em `repeticoes` rodadas"""
+    def rodada():
+        for _ in range(chamadas):
+            funcao()
+    return cronometrar(rodada, repeticoes) / chamadas
+
+
+def nova_loja(n):
+    from panut import LojaDados
+    from panut.dados_iniciais import FILIAIS_INICIAIS, PESOS_FILIAIS, PRODUTOS_INICIAIS
+    from panut.sintetico import ledger_sintetico
+
+    produtos = {nome: {'preco': dados['preco'], 'estoque': 10 ** 12} for nome, dados in PRODUTOS_INICIAIS.items()}
+    # Vendas até hoje, para que as métricas de mês, trimestre e ano não fiquem vazias
+    vendas = ledger_sintetico(n, produtos, FILIAIS_INICIAIS, semente=0, pesos_filiais=PESOS_FILIAIS,
+                              fim=np.datetime64('today', 'D'), dias=730)
+    return LojaDados(produtos, FILIAIS_INICIAIS, vendas)
+
+
+def medir_caminhos(loja):
+    import plotly.express as px
+    import plotly.io
+
+    from benchmarks.bench_graficos import figura_candle, figura_linha
+    from panut import AnalyticsIncremental
+    from panut.resolucao import maiores_estoques, modo_renderizacao, ohlc_adaptativo, serie_faturamento
+
+    hoje = str(np.datetime64('today', 'D'))
+    resultados = {}
+
+    def snapshot_apos_escrita():
+        loja.gerenciar_produto('Graxas', 50.0, 0, atualizar=True)
+        loja.snapshot()
+
+    resultados['snapshot'] = cronometrar(snapshot_apos_escrita, 21)
+    dados = loja.snapshot()
+    resultados['analytics_recalculo'] = cronometrar(
+        lambda: AnalyticsIncremental.de_ledger(dados.vendas).resumo(dados.vendas.produtos), 3)
+    resultados['adicionar_venda'] = por_chamada(lambda: loja.adicionar_venda(hoje, 'Graxas', 'Brasil', 1), 1000)
+    resultados['gerenciar_produto'] = por_chamada(
+        lambda: loja.gerenciar_produto('Pastas', 100.0, 1, atualizar=True), 1000)
+
+    dados = loja.snapshot()
+    resultados['ohlc_ledger'] = cronometrar(dados.vendas.ohlc_por_dia_filial, 3)
+    resultados['ohlc_cubo'] = cronometrar(lambda: ohlc_adaptativo(dados.cubo))
+
+    def linha():
+        datas, valores, _ = serie_faturamento(dados.cubo)
+        return figura_linha(datas, valores, modo_renderizacao(len(datas)))
+
+    def pizza():
+        nomes, estoques, _ = maiores_estoques(dados.produtos)
+        return px.pie(values=estoques, names=nomes, template='plotly_dark')
+
+    def candle():
+        return figura_candle(dados.cubo, ohlc_adaptativo(dados.cubo)[0])
+
+    for nome, montar in (('linha', linha), ('pizza', pizza), ('candle', candle)):
+        resultados[f'figura_{nome}'] = cronometrar(lambda: plotly.io.to_json(montar(), validate=False))
+    return resultados
+
+
+def medir_app(loja):
+    """Reexecuções completas do app.py servindo `loja`"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    import panut
+
+    # O app abre a loja com abrir_loja; aqui ele recebe a loja já montada
+    panut.abrir_loja = lambda *args, **kwargs: loja
+    st.cache_resource.clear()
+    hoje = str(np.datetime64('today', 'D'))
+    resultados = {}
+
+    app = AppTest.from_file(os.path.join(RAIZ, 'app.py'), default_timeout=600)
+    inicio = time.perf_counter()
+    app.run()
+    resultados['rerun_inicial'] = time.perf_counter() - inicio
+    assert not app.exception, app.exception
+
+    for aba, nome in ABAS.items():
+        app.radio(key='aba_dashboard').set_value(aba).run()
+        assert not app.exception, app.exception
+
+        def frio():
+            # Uma venda nova invalida o snapshot e as figuras em cache
+            loja.adicionar_venda(hoje, 'Graxas', 'Brasil', 1)
+            app.run()
+
+        resultados[f'rerun_{nome}_frio'] = cronometrar(frio)
+        resultados[f'rerun_{nome}_quente'] = cronometrar(app.run)
+
+    for pagina, nome in PAGINAS.items():
+        app.sidebar.radio[0].set_value(pagina).run()
+        assert not app.exception, app.exception
+        resultados[f'rerun_{nome}'] = cronometrar(app.run)
+    return resultados
+
+
+def medir_tamanho(n):
+    inicio = time.perf_counter()
+    loja = nova_loja(n)
+    resultados = {'carga': time.perf_counter() - inicio}
+    resultados.update(medir_caminhos(loja))
+    resultados.update(medir_app(loja))
+    resultados['pico_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return resultados
+
+
+def ambiente():
+    import pandas
+    import plotly
+    import streamlit
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'plotly': plotly.__version__,
+        'streamlit': streamlit.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def rodar(tamanhos):
+    """Roda cada tamanho num subprocesso e junta os resultados"""
+    resultados = {}
+    for n in tamanhos:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as arquivo:
+            saida = arquivo.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--um-tamanho', str(n), '--saida', saida],
+                           check=True, cwd=RAIZ)
+            with open(saida, encoding='utf-8') as arquivo:
+                resultados[str(n)] = json.load(arquivo)
+        finally:
+            os.remove(saida)
+        print(f"{n:>10,} vendas: rerun Vendas frio {resultados[str(n)]['rerun_vendas_frio'] * 1e3:,.0f} ms, "
+              f"pico {resultados[str(n)]['pico_rss_mb']:,.0f} MB")
+    return {'ambiente': ambiente(), 'resultados': resultados}
+
+
+def comparar(atual, base, tolerancia, diferenca_minima):
+    """Imprime atual × linha de base e retorna as medições que pioraram"""
+    regressoes = []
+    print(f"\n{'vendas':>10} {'medição':<24} {'base':>10} {'atual':>10} {'variação':>9}")
+    for tamanho, medidas in atual['resultados'].items():
+        referencia = base['resultados'].get(tamanho, {})
+        for nome, valor in medidas.items():
+            if nome not in referencia:
+                continue
+            anterior = referencia[nome]
+            variacao = valor / anterior - 1 if anterior else 0.0
+            if nome == 'pico_rss_mb':
+                piorou = variacao > tolerancia and valor - anterior > DIFERENCA_MINIMA_RSS
+            elif anterior < diferenca_minima:
+                piorou = variacao > 1
+            else:
+                piorou = variacao > tolerancia and valor - anterior > diferenca_minima
+            if piorou:
+                regressoes.append((tamanho, nome, anterior, valor))
+            unidade = ' MB' if nome == 'pico_rss_mb' else ' ms'
+            escala = 1 if nome == 'pico_rss_mb' else 1e3
+            print(f"{int(tamanho):>10,} {nome:<24} {anterior * escala:>7.1f}{unidade} {valor * escala:>7.1f}{unidade} "
+                  f"{variacao:>+8.0%}{' ⚠' if piorou else ''}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default=TAMANHOS_PADRAO, help='Vendas no ledger separado por vírgula')
+    parser.add_argument('--saida', default=os.path.join(RAIZ, 'benchmarks', 'resultados.json'),
+                        help='Arquivo JSON com os resultados')
+    parser.add_argument('--baseline', default=BASELINE, help='Linha de base para comparação')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA, help='Piora relativa tolerada')
+    parser.add_argument('--sem-comparar', action='store_true', help='Não compara com a linha de base')
+    parser.add_argument('--atualizar-baseline', action='store_true', help='Grava os resultados como linha de base')
+    parser.add_argument('--um-tamanho', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.um_tamanho is not None:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(medir_tamanho(args.um_tamanho), arquivo)
+        return
+
+    atual = rodar([int(t) for t in args.tamanhos.split(',')])
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados em {args.saida}")
+
+    if args.atualizar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+        print(f"Linha de base atualizada em {args.baseline}")
+    elif not args.sem_comparar and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(atual, base, args.tolerancia, DIFERENCA_MINIMA)
+        if regressoes:
+            print(f"\n{len(regressoes)} medição(ões) pioraram mais de {args.tolerancia:.0%}")
+            sys.exit(1)
+        print("\nNenhuma regressão em relação à linha de base")
+
+
+if __name__ == '__main__':
+    main()
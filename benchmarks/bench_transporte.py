@@ -0,0 +1,132 @@
+"""
+Benchmark do transporte das vendas entre backend.py e dash.py: JSON (com e
+sem gzip) contra stream IPC do Arrow (sem compressão, lz4 e zstd).
+
+Para cada tamanho de ledger mede o corpo de /api/dados, o tempo do backend
+para gerá-lo (sem cache), o tempo do cliente para transformá-lo no ledger
+local da `ReplicaDados` e a carga completa ponta a ponta (GET pelo HTTP
+local, com o corpo já em cache no backend, mais a leitura no cliente).
+
+Uso:
+    python benchmarks/bench_transporte.py --tamanhos 10000,100000,1000000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from panut import LojaDados, ReplicaDados
+from panut.colunar import TIPO_ARROW
+from panut.dados_iniciais import FILIAIS_INICIAIS, PRODUTOS_INICIAIS
+from panut.sintetico import ledger_sintetico
+
+# (nome, formato Arrow?, compressão Arrow, gzip no JSON?)
+FORMATOS = (
+    ('JSON', False, None, False),
+    ('JSON+gzip', False, None, True),
+    ('Arrow', True, None, False),
+    ('Arrow+lz4', True, 'lz4', False),
+    ('Arrow+zstd', True, 'zstd', False),
+)
+
+
+def cronometrar(funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def nova_loja(n):
+    produtos = {nome: {'preco': dados['preco'], 'estoque': 10 ** 12} for nome, dados in PRODUTOS_INICIAIS.items()}
+    return LojaDados(produtos, FILIAIS_INICIAIS, ledger_sintetico(n, produtos, FILIAIS_INICIAIS, semente=0))
+
+
+def servir(app):
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_port}'
+
+
+def medir(backend, loja, arrow, compressao, gzip, repeticoes):
+    app = backend.criar_app(loja, compressao_arrow=compressao)
+    servidor, url = servir(app)
+    try:
+        sessao = requests.Session()
+        sessao.headers['Accept-Encoding'] = 'gzip' if gzip else 'identity'
+        replica = ReplicaDados(url, sessao=sessao, arrow=arrow)
+        cabecalhos = replica._aceitar
+
+        # Corpo na rede: com gzip, o tamanho comprimido
+        resposta = sessao.get(f'{url}/api/dados', headers=cabecalhos, stream=True)
+        tamanho = len(resposta.raw.read(decode_content=False))
+        assert resposta.headers['Content-Type'].startswith(TIPO_ARROW if arrow else 'application/json')
+
+        snapshot = loja.snapshot()
+
+        def gerar():
+            dados = {
+                'versao': snapshot.versao,
+                'cursor': loja.cursor(snapshot),
+                'produtos': backend._produtos_json(snapshot),
+                'filiais': list(snapshot.filiais),
+                'vendas': snapshot.vendas if arrow else snapshot.vendas.para_registros(),
+                'analytics': snapshot.analytics
+            }
+            if arrow:
+                return backend.serializar_arrow_dados(dados, compressao)
+            return backend.serializar(dados)
+
+        servidor_s = cronometrar(gerar, repeticoes)
+        resposta = sessao.get(f'{url}/api/dados', headers=cabecalhos)
+        cliente_s = cronometrar(lambda: replica._recarregar(replica._ler(resposta)), repeticoes)
+
+        def carga_completa():
+            replica.cursor = None
+            replica.sincronizar()
+
+        total_s = cronometrar(carga_completa, repeticoes)
+        assert len(replica.snapshot_atual().vendas) == len(snapshot.vendas)
+        return tamanho, servidor_s, cliente_s, total_s
+    finally:
+        servidor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', default='10000,100000,1000000', help='Vendas no ledger separado por vírgula')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        # O backend abre a própria loja ao ser importado; aqui ela fica vazia e sem log
+        os.environ['PANUT_DB'] = os.path.join(diretorio, 'bench_transporte.db')
+        os.environ['PANUT_EVENTOS'] = ''
+        import backend
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        for n in (int(t) for t in args.tamanhos.split(',')):
+            loja = nova_loja(n)
+            print(f"\n{n:,} vendas")
+            print(f"{'formato':<11} {'corpo(MB)':>10} {'backend(ms)':>12} {'cliente(ms)':>12} {'total(ms)':>10}")
+            for nome, arrow, compressao, gzip in FORMATOS:
+                tamanho, servidor_s, cliente_s, total_s = medir(backend, loja, arrow, compressao, gzip,
+                                                                args.repeticoes)
+                print(f"{nome:<11} {tamanho / 2 ** 20:>10.2f} {servidor_s * 1e3:>12.1f} {cliente_s * 1e3:>12.1f} "
+                      f"{total_s * 1e3:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmark do modo com vários workers (workers.py): vazão de reexecuções do
+app.py com sessões simultâneas pelo balanceador, para 1 a N workers, e
+tempo até uma venda gravada por um processo aparecer na memória de outro.
+
+As sessões falam o protocolo do navegador (WebSocket em /_stcore/stream) e
+pedem reexecuções do Dashboard sem parar, enquanto outro processo registra
+vendas num ritmo fixo, de modo que parte das reexecuções remonta os
+gráficos. Com --verificar, vários processos disputam o estoque de um mesmo
+produto e o resultado é conferido com o banco.
+
+Uso:
+    python benchmarks/bench_workers.py --workers 1,2,4 --sessoes 16 --segundos 20
+    python benchmarks/bench_workers.py --verificar
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from panut import abrir_loja_compartilhada
+
+PORTA = 8750
+PORTA_BASE = 8760
+
+
+def aguardar(url, limite=60):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resposta:
+                if resposta.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} não respondeu")
+
+
+async def sessao(url, fim, tempos):
+    """Uma sessão do navegador pedindo reexecuções até `fim`"""
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from tornado.websocket import websocket_connect
+
+    conexao = await websocket_connect(url)
+    pedido = BackMsg()
+    pedido.rerun_script.query_string = ''
+    pedido.rerun_script.page_script_hash = ''
+    try:
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            await conexao.write_message(pedido.SerializeToString(), binary=True)
+            while True:
+                dados = await conexao.read_message()
+                if dados is None:
+                    raise RuntimeError("Conexão encerrada pelo worker")
+                mensagem = ForwardMsg()
+                mensagem.ParseFromString(dados)
+                if mensagem.WhichOneof('type') == 'script_finished':
+                    break
+            tempos.append(time.perf_counter() - inicio)
+    finally:
+        conexao.close()
+
+
+def vender(caminho, fim, por_segundo):
+    """Vendas num ritmo fixo, por um processo que não atende sessões"""
+    loja = abrir_loja_compartilhada(caminho)
+    hoje = str(np.datetime64('today', 'D'))
+    while time.perf_counter() < fim:
+        loja.adicionar_venda(hoje, 'Graxas', 'Brasil', 1)
+        time.sleep(1 / por_segundo)
+
+
+def medir_vazao(caminho, workers, sessoes, segundos, vendas_por_segundo):
+    ambiente = dict(os.environ, PANUT_DB=caminho, PANUT_JANELA_DIAS='365')
+    processo = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, 'workers.py'), '--workers', str(workers), '--porta', str(PORTA),
+         '--porta-base', str(PORTA_BASE), '--host', '127.0.0.1'],
+        cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for i in range(workers):
+            aguardar(f'http://127.0.0.1:{PORTA_BASE + i}/_stcore/health')
+        aguardar(f'http://127.0.0.1:{PORTA}/_stcore/health')
+
+        async def rodar(segundos, tempos):
+            fim = time.perf_counter() + segundos
+            # Sem cookie, cada sessão nova vai para o próximo worker do rodízio
+            await asyncio.gather(*(sessao(f'ws://127.0.0.1:{PORTA}/_stcore/stream', fim, tempos)
+                                   for _ in range(sessoes)))
+
+        # Aquecimento: primeira execução e cache de cada worker
+        asyncio.run(rodar(3, []))
+        tempos = []
+        vendedor = threading.Thread(target=vender, args=(caminho, time.perf_counter() + segundos,
+                                                         vendas_por_segundo))
+        vendedor.start()
+        asyncio.run(rodar(segundos, tempos))
+        vendedor.join()
+        return len(tempos) / segundos, statistics.median(tempos), np.percentile(tempos, 95)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def medir_propagacao(caminho, amostras=200):
+    """Tempo (s) até uma venda de um processo aparecer no snapshot de outro"""
+    escritor = abrir_loja_compartilhada(caminho)
+    leitor = abrir_loja_compartilhada(caminho)
+    hoje = str(np.datetime64('today', 'D'))
+    tempos = []
+    for _ in range(amostras):
+        antes = len(leitor.snapshot().vendas)
+        inicio = time.perf_counter()
+        escritor.adicionar_venda(hoje, 'Graxas', 'Brasil', 1)
+        while len(leitor.snapshot().vendas) == antes:
+            time.sleep(0.001)
+        tempos.append(time.perf_counter() - inicio)
+    escritor.fechar()
+    leitor.fechar()
+    return statistics.median(tempos), np.percentile(tempos, 95)
+
+
+def _disputar(caminho, vendas, barreira, resultados):
+    loja = abrir_loja_compartilhada(caminho)
+    hoje = str(np.datetime64('today', 'D'))
+    barreira.wait()
+    aceitas = sum(loja.adicionar_venda(hoje, 'Produto Disputado', 'Brasil', 1)[0] for _ in range(vendas))
+    # Espera as vendas dos outros processos chegarem à memória deste
+    time.sleep(0.5)
+    dados = loja.snapshot()
+    resultados.put((aceitas, dados.produtos['Produto Disputado']['estoque'], len(dados.vendas),
+                    dados.analytics['total_vendas']))
+
+
+def verificar(caminho, processos=4, vendas=500, estoque=1000):
+    """Vários processos vendem o mesmo produto: nenhum vende além do estoque e todos convergem"""
+    loja = abrir_loja_compartilhada(caminho)
+    loja.gerenciar_produto('Produto Disputado', 1.0, estoque)
+    contexto = multiprocessing.get_context('spawn')
+    barreira = contexto.Barrier(processos)
+    resultados = contexto.Queue()
+    filhos = [contexto.Process(target=_disputar, args=(caminho, vendas, barreira, resultados))
+              for _ in range(processos)]
+    for filho in filhos:
+        filho.start()
+    respostas = [resultados.get() for _ in filhos]
+    for filho in filhos:
+        filho.join()
+
+    aceitas = sum(resposta[0] for resposta in respostas)
+    with sqlite3.connect(caminho) as conexao:
+        (final,) = conexao.execute("SELECT estoque FROM produtos WHERE nome = 'Produto Disputado'").fetchone()
+        (total,) = conexao.execute("SELECT COUNT(*) FROM vendas").fetchone()
+    assert aceitas == min(estoque, processos * vendas), aceitas
+    assert final == estoque - aceitas, (final, aceitas)
+    # Todos os processos terminam com o mesmo estado que o banco
+    assert all(resposta[1] == final and resposta[3] == total for resposta in respostas), (respostas, final, total)
+    print(f"{processos} processos, {processos * vendas:,} tentativas para {estoque:,} unidades: "
+          f"{aceitas:,} aceitas, estoque final {final}, réplicas convergentes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='Números de workers separados por vírgula')
+    parser.add_argument('--sessoes', type=int, default=16, help='Sessões simultâneas')
+    parser.add_argument('--segundos', type=float, default=20, help='Duração de cada medição')
+    parser.add_argument('--vendas-por-segundo', type=float, default=20, help='Ritmo das vendas durante a medição')
+    parser.add_argument('--verificar', action='store_true', help='Só a verificação de estoque entre processos')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'panut.db')
+        if args.verificar:
+            verificar(caminho)
+            return
+
+        mediana, p95 = medir_propagacao(caminho)
+        print(f"Venda visível em outro processo: mediana {mediana * 1e3:.0f} ms, p95 {p95 * 1e3:.0f} ms")
+        print(f"\n{'workers':>7} {'reexecuções/s':>13} {'mediana(ms)':>11} {'p95(ms)':>8} {'aceleração':>10}")
+        base = None
+        for workers in (int(n) for n in args.workers.split(',')):
+            vazao, mediana, p95 = medir_vazao(caminho, workers, args.sessoes, args.segundos,
+                                              args.vendas_por_segundo)
+            base = base or vazao
+            print(f"{workers:>7} {vazao:>13.1f} {mediana * 1e3:>11.0f} {p95 * 1e3:>8.0f} {vazao / base:>9.2f}x")
+        print(f"({os.cpu_count()} CPUs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Gera um arquivo de vendas sintéticas (CSV ou Parquet) para testes de carga,
+reprodutível pela semente e importável pela página "Adicionar Venda".
+
+Uso:
+    python benchmarks/gerar_vendas.py 10000000 vendas.parquet --semente 42 --dias 730 --sazonalidade 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from panut.dados_iniciais import FILIAIS_INICIAIS, PESOS_FILIAIS, PRODUTOS_INICIAIS
+from panut.sintetico import FIM_PADRAO, PICO_PADRAO, VENDAS_POR_BLOCO, salvar_vendas
+
+
+def pesos(texto):
+    return [float(peso) for peso in texto.split(',')] if texto else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('vendas', type=int, help='Número de vendas')
+    parser.add_argument('saida', help='Arquivo de saída (.csv ou .parquet)')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--fim', default=FIM_PADRAO, help='Último dia das vendas (AAAA-MM-DD)')
+    parser.add_argument('--dias', type=int, default=365, help='Dias cobertos até --fim')
+    parser.add_argument('--sazonalidade', type=float, default=0.0, help='Amplitude da onda anual (0 a 1)')
+    parser.add_argument('--pico', type=int, default=PICO_PADRAO, help='Dia do ano com mais vendas')
+    parser.add_argument('--pesos-semana', type=pesos, help='Sete pesos, de segunda a domingo')
+    parser.add_argument('--produtos', type=int,
+                        help='Catálogo sintético com N produtos (padrão: produtos de demonstração)')
+    parser.add_argument('--pesos-produtos', type=pesos, help='Um peso por produto, separados por vírgula')
+    parser.add_argument('--pesos-filiais', type=pesos, default=PESOS_FILIAIS,
+                        help='Um peso por filial, separados por vírgula')
+    parser.add_argument('--bloco', type=int, default=VENDAS_POR_BLOCO, help='Vendas geradas e gravadas por vez')
+    args = parser.parse_args()
+
+    produtos = list(PRODUTOS_INICIAIS) if args.produtos is None else [f'Produto {i}' for i in range(args.produtos)]
+    inicio = time.perf_counter()
+    try:
+        salvar_vendas(args.saida, args.vendas, produtos, FILIAIS_INICIAIS, semente=args.semente, fim=args.fim,
+                      dias=args.dias, sazonalidade=args.sazonalidade, pico=args.pico,
+                      pesos_semana=args.pesos_semana, pesos_produtos=args.pesos_produtos,
+                      pesos_filiais=args.pesos_filiais, vendas_por_bloco=args.bloco)
+    except ValueError as e:
+        parser.error(str(e))
+    tempo = time.perf_counter() - inicio
+    print(f"{args.vendas:,} vendas em {args.saida} ({os.path.getsize(args.saida) / 2 ** 20:.1f} MB) "
+          f"em {tempo:.1f} s ({args.vendas / tempo:,.0f} vendas/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,17 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import requests
 import numpy as np
-import time
 import os
+import time
 from dotenv import load_dotenv
 
+from panut import CacheFiguras, ClienteAPI, Diagnostico, ReplicaDados, dia_ordinal, exibir_figura
+from panut.diagnostico import mostrar_diagnostico
+from panut.importacao import COLUNAS_PREVIA, resumo_previa
+from panut.indice import ano_ate_hoje, mes_ate_hoje, trimestre_ate_hoje
+from panut.resolucao import (SUFIXOS_BALDE, maiores_estoques, modo_renderizacao, ohlc_adaptativo,
+                             serie_faturamento)
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -23,28 +30,264 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Cache de dados
-@st.cache_data(ttl=300)
+# Início da execução, para o tempo total por página no diagnóstico
+inicio_execucao = time.perf_counter()
+
+# Intervalo (s) entre revalidações da réplica; cada uma custa um GET
+# condicional que devolve 304 quando nada mudou
+REVALIDAR_S = float(os.getenv('DASH_REVALIDAR_S', '5'))
+
+# Cliente HTTP único do processo: pool de conexões keep-alive, timeouts e
+# novas tentativas para leituras
+@st.cache_resource
+def obter_cliente():
+    return ClienteAPI(API_URL)
+
+# Réplica local dos dados do backend, compartilhada pelas sessões deste
+# processo e atualizada por um feed de mudanças
+@st.cache_resource
+def obter_replica():
+    cliente = obter_cliente()
+    return ReplicaDados(API_URL, sessao=cliente, intervalo=REVALIDAR_S, timeout=cliente.timeout)
+
+# Tempos das seções (PANUT_DIAGNOSTICO=1), agregados entre as sessões do
+# processo; desligado, os pontos de medição não custam quase nada
+@st.cache_resource
+def obter_diagnostico():
+    diagnostico = Diagnostico.do_ambiente()
+    diagnostico.incluir('panut_http_segundos', "Latência das chamadas ao backend", 'endpoint',
+                        obter_cliente().latencias)
+    return diagnostico
+
+diagnostico = obter_diagnostico()
+
 def carregar_dados():
+    replica = obter_replica()
     try:
-        response = requests.get('http://localhost:5000/api/dados')
-        return response.json()
-    except:
+        return replica.snapshot()
+    except requests.RequestException:
         st.error('Erro ao carregar dados')
-        return {
-            'produtos': {},
-            'filiais': [],
-            'vendas': [],
-            'analytics': {
-                'total_vendas': 0,
-                'faturamento_total': 0,
-                'produto_mais_vendido': "Sem dados",
-                'faturamento_fevereiro': 0
-            }
-        }
+        return replica.snapshot_atual()
 
 # Carregamento inicial
-dados = carregar_dados()
+with diagnostico.secao('carga_dados'):
+    dados = carregar_dados()
+
+# Figuras já serializadas, compartilhadas pelas sessões do processo
+@st.cache_resource
+def obter_cache_figuras():
+    return CacheFiguras(int(os.getenv('PANUT_CACHE_FIGURAS_MB', '64')) * 1024 * 1024, diagnostico=obter_diagnostico())
+
+def mostrar_figura(tipo, construir, *filtros, snapshot=None):
+    """Exibe uma figura do cache, montando-a só quando os dados mudam"""
+    snapshot = snapshot if snapshot is not None else dados
+    chave = (tipo, snapshot.epoca, snapshot.versao) + filtros
+    with diagnostico.secao(f'figura:{tipo}'):
+        spec = obter_cache_figuras().obter(chave, construir)
+    with diagnostico.secao(f'envio:{tipo}'):
+        exibir_figura(spec)
+
+def enviar(caminho, corpo, mensagem_sucesso):
+    """POST ao backend; em caso de sucesso a próxima leitura já inclui a escrita"""
+    try:
+        response = obter_cliente().post(caminho, json=corpo)
+    except requests.RequestException as e:
+        return False, f"❌ Erro de conexão: {str(e)}"
+    if response.status_code != 200:
+        return False, f"❌ Erro: {response.text}"
+    corpo = response.json()
+    obter_replica().registrar_escrita(corpo['versao'], corpo['epoca'])
+    return True, mensagem_sucesso
+
+# Callbacks dos formulários: gravam antes da reexecução, que já mostra os
+# dados atualizados sem pausa nem st.rerun
+def enviar_venda():
+    estado = st.session_state
+    estado['resultado_venda'] = enviar(
+        '/api/vendas',
+        {
+            'data': estado['venda_data'].strftime('%Y-%m-%d'),
+            'produto': estado['venda_produto'],
+            'filial': estado['venda_filial'],
+            'quantidade': int(estado['venda_quantidade'])
+        },
+        "✅ Venda registrada com sucesso!"
+    )
+
+def enviar_produto():
+    estado = st.session_state
+    atualizar = estado['produto_opcao'] == "Atualizar Produto Existente"
+    sufixo = 'atualizar' if atualizar else 'novo'
+    if f'produto_nome_{sufixo}' not in estado:
+        # A opção mudou neste envio: os campos dela só aparecem agora
+        return
+    nome = estado[f'produto_nome_{sufixo}']
+    if not atualizar and nome in obter_replica().snapshot_atual().produtos:
+        estado['resultado_produto'] = (False, "❌ Este produto já existe!")
+        return
+    estado['resultado_produto'] = enviar(
+        '/api/produtos',
+        {
+            'nome': nome,
+            'preco': float(estado[f'produto_preco_{sufixo}']),
+            'estoque': int(estado[f'produto_quantidade_{sufixo}']),
+            'atualizar': atualizar
+        },
+        "✅ Operação realizada com sucesso!"
+    )
+
+def importar_arquivo():
+    estado = st.session_state
+    arquivo = estado.get('importacao_arquivo')
+    estado['rejeitadas_importacao'] = None
+    if arquivo is None:
+        estado['resultado_importacao'] = (False, "❌ Selecione um arquivo")
+        return
+    try:
+        response = obter_cliente().post(
+            '/api/vendas/importar',
+            files={'arquivo': (arquivo.name, arquivo.getvalue())}
+        )
+        corpo = response.json()
+    except requests.RequestException as e:
+        estado['resultado_importacao'] = (False, f"❌ Erro de conexão: {str(e)}")
+        return
+    except ValueError:
+        estado['resultado_importacao'] = (False, f"❌ Erro: {response.text}")
+        return
+    if response.status_code != 200:
+        estado['resultado_importacao'] = (False, corpo.get('erro', f"❌ Erro: {response.text}"))
+        estado['rejeitadas_importacao'] = corpo.get('rejeitadas')
+        return
+    obter_replica().registrar_escrita(corpo['versao'], corpo['epoca'])
+    estado['resultado_importacao'] = (True, corpo['mensagem'])
+
+def limpar_previa_catalogo():
+    st.session_state['previa_catalogo'] = None
+
+def postar_catalogo(previa):
+    """Envia o arquivo de catálogo ao backend; retorna o corpo da resposta ou None"""
+    estado = st.session_state
+    arquivo = estado.get('catalogo_arquivo')
+    if arquivo is None:
+        estado['resultado_catalogo'] = (False, "❌ Selecione um arquivo")
+        return None, None
+    try:
+        response = obter_cliente().post(
+            '/api/produtos/importar',
+            params={'previa': 1} if previa else None,
+            files={'arquivo': (arquivo.name, arquivo.getvalue())}
+        )
+        return response, response.json()
+    except requests.RequestException as e:
+        estado['resultado_catalogo'] = (False, f"❌ Erro de conexão: {str(e)}")
+    except ValueError:
+        estado['resultado_catalogo'] = (False, f"❌ Erro: {response.text}")
+    return None, None
+
+def previsualizar_catalogo():
+    estado = st.session_state
+    limpar_previa_catalogo()
+    response, corpo = postar_catalogo(previa=True)
+    if response is None:
+        return
+    if response.status_code != 200:
+        estado['resultado_catalogo'] = (False, corpo.get('erro', f"❌ Erro: {response.text}"))
+        return
+    estado['previa_catalogo'] = pd.DataFrame(corpo['previa'], columns=COLUNAS_PREVIA)
+
+def aplicar_catalogo():
+    estado = st.session_state
+    response, corpo = postar_catalogo(previa=False)
+    if response is None:
+        return
+    if response.status_code != 200:
+        estado['resultado_catalogo'] = (False, corpo.get('erro', f"❌ Erro: {response.text}"))
+        if 'previa' in corpo:
+            estado['previa_catalogo'] = pd.DataFrame(corpo['previa'], columns=COLUNAS_PREVIA)
+        return
+    obter_replica().registrar_escrita(corpo['versao'], corpo['epoca'])
+    estado['resultado_catalogo'] = (True, corpo['mensagem'])
+    limpar_previa_catalogo()
+
+def mostrar_resultado(chave):
+    """Mensagem da última gravação de um formulário, exibida uma vez"""
+    resultado = st.session_state.pop(chave, None)
+    if resultado is not None:
+        sucesso, mensagem = resultado
+        if sucesso:
+            st.success(mensagem)
+        else:
+            st.error(mensagem)
+
+# Linhas rejeitadas exibidas na tela; o relatório completo vai no download
+LINHAS_RELATORIO = 1000
+
+def mostrar_rejeitadas():
+    """Relatório da última importação rejeitada, mantido até a próxima"""
+    rejeitadas = st.session_state.get('rejeitadas_importacao')
+    if rejeitadas is not None and len(rejeitadas['linha']):
+        relatorio = pd.DataFrame(rejeitadas)
+        if len(relatorio) > LINHAS_RELATORIO:
+            st.caption(f"Primeiras {LINHAS_RELATORIO:,} de {len(relatorio):,} linhas rejeitadas")
+        st.dataframe(relatorio.head(LINHAS_RELATORIO), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Baixar relatório de rejeições",
+            relatorio.to_csv(index=False).encode('utf-8'),
+            file_name="vendas_rejeitadas.csv",
+            mime="text/csv"
+        )
+
+def mostrar_previa_catalogo():
+    """Resumo e linhas da prévia da importação de catálogo"""
+    previa = st.session_state.get('previa_catalogo')
+    if previa is None:
+        return
+    resumo = resumo_previa(previa)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Inserções", f"{resumo['inserir']:,}")
+    with col2:
+        st.metric("Atualizações", f"{resumo['atualizar']:,}")
+    with col3:
+        st.metric("Conflitos", f"{resumo['conflito']:,}")
+    if resumo['conflito']:
+        st.warning("Corrija os conflitos no arquivo antes de aplicar.")
+        previa = previa[previa['acao'] == 'conflito']
+    if len(previa) > LINHAS_RELATORIO:
+        st.caption(f"Primeiras {LINHAS_RELATORIO:,} de {len(previa):,} linhas")
+    st.dataframe(previa.head(LINHAS_RELATORIO), use_container_width=True, hide_index=True)
+
+def barra_filtros(cubo):
+    """
+    Filtros do Dashboard na barra lateral. Retorna (inicio, fim, filiais,
+    produtos), com dias ordinais e tuplas de nomes, e None onde não há
+    restrição, para que a visão sem filtros use o caminho mais rápido.
+    """
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Filtros")
+    inicio = fim = None
+    intervalo = cubo.intervalo_dias()
+    if intervalo is not None:
+        primeiro, ultimo = (np.datetime64(dia, 'D').item() for dia in intervalo)
+        periodo = st.sidebar.date_input(
+            "Período",
+            value=(primeiro, ultimo),
+            min_value=primeiro,
+            max_value=ultimo,
+            key="filtro_periodo"
+        )
+        # Durante a escolha do intervalo o widget devolve só a data inicial
+        if len(periodo) == 2 and tuple(periodo) != (primeiro, ultimo):
+            inicio, fim = dia_ordinal(periodo[0]), dia_ordinal(periodo[1])
+    filiais = st.sidebar.multiselect("Filiais", list(cubo.filiais), key="filtro_filiais",
+                                     placeholder="Todas as filiais")
+    produtos = st.sidebar.multiselect("Produtos", list(cubo.produtos), key="filtro_produtos",
+                                      placeholder="Todos os produtos")
+    filtros = (inicio, fim, tuple(filiais) or None, tuple(produtos) or None)
+    if intervalo is not None and cubo.intervalo_dias(*filtros) is None:
+        st.sidebar.warning("Nenhuma venda para os filtros selecionados.")
+    return filtros
 
 # Cabeçalho
 st.title("🏢 Dashboard Panut Brasil")
@@ -54,298 +297,363 @@ st.markdown("### *Empresa Alemã de produtos automotivos e indústria Química*"
 st.sidebar.title("Navegação")
 pagina = st.sidebar.radio(
     "Selecione:",
-    ["Dashboard", "Adicionar Venda", "Gerenciar Produtos e Estoque"]
+    ["Dashboard", "Adicionar Venda", "Gerenciar Produtos e Estoque"] + (["Diagnóstico"] if diagnostico.ativo else [])
 )
+execucao = pagina
 
 if pagina == "Dashboard":
-    tab1, tab2, tab3 = st.tabs(["📊 Vendas", "📦 Estoque", "🏢 Filiais"])
+    # Seletor no lugar de st.tabs: só a visão escolhida é calculada e desenhada
+    aba = st.radio(
+        "Visão",
+        ["📊 Vendas", "📦 Estoque", "🏢 Filiais"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="aba_dashboard"
+    )
+    execucao = f"Dashboard/{aba.split(' ', 1)[1]}"
     
-    with tab1:
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Faturamento Total", f"R$ {dados['analytics']['faturamento_total']:,.2f}")
-        with col2:
-            st.metric("Produto Mais Vendido", dados['analytics']['produto_mais_vendido'])
-        with col3:
-            st.metric("Faturamento Fevereiro", f"R$ {dados['analytics']['faturamento_fevereiro']:,.2f}")
+    # Período, filiais e produtos escolhidos na barra lateral
+    with diagnostico.secao('filtros'):
+        filtros = barra_filtros(dados.cubo)
+    inicio, fim, filiais, produtos = filtros
+    
+    if aba == "📊 Vendas":
+        with diagnostico.secao('metricas:vendas'):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Faturamento Total", f"R$ {dados.analytics['faturamento_total']:,.2f}")
+            with col2:
+                st.metric("Produto Mais Vendido", dados.cubo.produto_mais_vendido(*filtros) or "Sem vendas")
+            with col3:
+                st.metric("Faturamento Fevereiro", f"R$ {dados.analytics['faturamento_fevereiro']:,.2f}")
         
-        if dados['vendas']:
-            df_vendas = pd.DataFrame(dados['vendas'])
-            df_vendas['data'] = pd.to_datetime(df_vendas['data'])
+            # Períodos até hoje, comparados ao mesmo período do ano anterior
+            hoje = np.datetime64('today', 'D')
+            periodos = [
+                ("Faturamento do Mês", mes_ate_hoje(hoje)),
+                ("Faturamento do Trimestre", trimestre_ate_hoje(hoje)),
+                ("Faturamento do Ano", ano_ate_hoje(hoje))
+            ]
+            for coluna, (rotulo, periodo) in zip(st.columns(3), periodos):
+                atual, anterior = dados.indice.comparar_ano_anterior(*periodo)
+                with coluna:
+                    st.metric(
+                        rotulo,
+                        f"R$ {atual:,.2f}",
+                        f"{atual / anterior - 1:+.1%} vs. ano anterior" if anterior else None
+                    )
+        
+        if dados.cubo.intervalo_dias(*filtros) is not None:
+            def figura_linha():
+                # Período e número de pontos adaptados ao histórico
+                datas, valores, balde = serie_faturamento(dados.cubo, inicio, fim, filiais=filiais, produtos=produtos)
+                
+                fig_linha = px.line(
+                    x=datas,
+                    y=valores,
+                    labels={'x': 'data', 'y': 'valor'},
+                    title='Evolução de Vendas' + SUFIXOS_BALDE[balde],
+                    template='plotly_dark',
+                    render_mode=modo_renderizacao(len(datas))
+                )
+                return fig_linha
             
-            fig_linha = px.line(
-                df_vendas.groupby('data')['valor'].sum().reset_index(),
-                x='data',
-                y='valor',
-                title='Evolução de Vendas',
+            mostrar_figura('linha', figura_linha, *filtros)
+    
+    elif aba == "📦 Estoque":
+        def figura_pizza():
+            nomes, estoques, outros = maiores_estoques(dados.produtos)
+            produtos_df = pd.DataFrame({'produto': nomes, 'estoque': estoques})
+            if outros:
+                produtos_df.loc[len(produtos_df)] = ["Outros", outros]
+            fig_pizza = px.pie(
+                produtos_df,
+                values='estoque',
+                names='produto',
+                title='Distribuição de Estoque',
                 template='plotly_dark'
             )
-            st.plotly_chart(fig_linha, use_container_width=True)
-    
-    with tab2:
-        produtos_df = pd.DataFrame([(k, v['estoque']) for k, v in dados['produtos'].items()], 
-                                columns=['produto', 'estoque'])
-        fig_pizza = px.pie(
-            produtos_df,
-            values='estoque',
-            names='produto',
-            title='Distribuição de Estoque',
-            template='plotly_dark'
-        )
-        st.plotly_chart(fig_pizza, use_container_width=True)
+            return fig_pizza
+        
+        mostrar_figura('pizza', figura_pizza)
     
-    with tab3:
-        if dados['vendas']:
-            df_vendas = pd.DataFrame(dados['vendas'])
-            df_vendas['data'] = pd.to_datetime(df_vendas['data'])
-            
-            cores_filiais = {
-                'Brasil': '#00FF00',
-                'EUA': '#0000FF',
-                'Alemanha': '#FF0000'
-            }
-            
-            df_grouped = df_vendas.groupby(['data', 'filial'])['valor'].agg([
-                ('min', 'min'),
-                ('max', 'max'),
-                ('open', 'first'),
-                ('close', 'last')
-            ]).reset_index()
-            
-            fig_candle = go.Figure()
+    elif aba == "🏢 Filiais":
+        if dados.cubo.intervalo_dias(*filtros) is not None:
+            cubo = dados.cubo
             
-            for filial in ['Brasil', 'Alemanha', 'EUA']:
-                filial_data = df_grouped[df_grouped['filial'] == filial]
+            def figura_candle():
+                cores_filiais = {
+                    'Brasil': '#00FF00',
+                    'EUA': '#0000FF',
+                    'Alemanha': '#FF0000'
+                }
+                
+                ohlc, balde = ohlc_adaptativo(cubo, inicio, fim, filiais=filiais, produtos=produtos)
+                
+                fig_candle = go.Figure()
+                
+                for filial in ['Brasil', 'Alemanha', 'EUA']:
+                    if filial not in cubo.filiais:
+                        continue
+                    linhas = ohlc['filial'] == cubo.filiais.index(filial)
                 
-                if not filial_data.empty:
-                    fig_candle.add_trace(
-                        go.Candlestick(
-                            x=filial_data['data'],
-                            open=filial_data['open'],
-                            high=filial_data['max'],
-                            low=filial_data['min'],
-                            close=filial_data['close'],
-                            name=filial,
-                            increasing_line_color=cores_filiais[filial],
-                            decreasing_line_color=cores_filiais[filial],
-                            showlegend=True
+                    if linhas.any():
+                        fig_candle.add_trace(
+                            go.Candlestick(
+                                x=ohlc['data'][linhas],
+                                open=ohlc['open'][linhas],
+                                high=ohlc['max'][linhas],
+                                low=ohlc['min'][linhas],
+                                close=ohlc['close'][linhas],
+                                name=filial,
+                                increasing_line_color=cores_filiais[filial],
+                                decreasing_line_color=cores_filiais[filial],
+                                showlegend=True
+                            )
                         )
+                
+                fig_candle.update_layout(
+                    title='Análise de Vendas por Filial' + SUFIXOS_BALDE[balde],
+                    template='plotly_dark',
+                    xaxis_title='Data',
+                    yaxis_title='Valor (R$)',
+                    showlegend=True,
+                    legend_title='Filiais',
+                    height=600,
+                    xaxis_rangeslider_visible=False,
+                    yaxis_tickprefix='R$ ',
+                    legend=dict(
+                        yanchor="top",
+                        y=0.99,
+                        xanchor="left",
+                        x=0.01
                     )
-            
-            fig_candle.update_layout(
-                title='Análise de Vendas por Filial',
-                template='plotly_dark',
-                xaxis_title='Data',
-                yaxis_title='Valor (R$)',
-                showlegend=True,
-                legend_title='Filiais',
-                height=600,
-                xaxis_rangeslider_visible=False,
-                yaxis_tickprefix='R$ ',
-                legend=dict(
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="left",
-                    x=0.01
                 )
-            )
+                return fig_candle
             
-            st.plotly_chart(fig_candle, use_container_width=True)
+            mostrar_figura('candle', figura_candle, *filtros)
             
-            col1, col2, col3 = st.columns(3)
-            vendas_por_filial = df_vendas.groupby('filial')['valor'].sum()
+            with diagnostico.secao('metricas:filiais'):
+                col1, col2, col3 = st.columns(3)
+                vendas_por_filial = cubo.faturamento_por_filial(*filtros)
             
-            with col1:
-                st.metric(
-                    "Brasil 🇧🇷",
-                    f"R$ {vendas_por_filial.get('Brasil', 0):,.2f}",
-                    "Líder em vendas"
-                )
-            with col2:
-                st.metric(
-                    "EUA 🇺🇸",
-                    f"R$ {vendas_por_filial.get('EUA', 0):,.2f}"
-                )
-            with col3:
-                st.metric(
-                    "Alemanha 🇩🇪",
-                    f"R$ {vendas_por_filial.get('Alemanha', 0):,.2f}"
-                )
+                with col1:
+                    st.metric(
+                        "Brasil 🇧🇷",
+                        f"R$ {vendas_por_filial.get('Brasil', 0):,.2f}",
+                        "Líder em vendas"
+                    )
+                with col2:
+                    st.metric(
+                        "EUA 🇺🇸",
+                        f"R$ {vendas_por_filial.get('EUA', 0):,.2f}"
+                    )
+                with col3:
+                    st.metric(
+                        "Alemanha 🇩🇪",
+                        f"R$ {vendas_por_filial.get('Alemanha', 0):,.2f}"
+                    )
 
 elif pagina == "Adicionar Venda":
     st.header("Registrar Nova Venda")
     
-    with st.form(key="form_venda"):
-        produtos_disponiveis = list(dados.get('produtos', {}).keys())
-        produto = st.selectbox(
-            "Produto",
-            options=produtos_disponiveis,
-            index=0 if produtos_disponiveis else None
-        )
+    # Fragmento: um envio do formulário reexecuta só esta seção
+    @st.fragment
+    def secao_venda():
+        # Lida a cada execução do fragmento, que pode rodar sozinho
+        dados = carregar_dados()
         
-        filiais = ['Brasil', 'Alemanha', 'EUA']
-        filial = st.selectbox(
-            "Filial",
-            options=filiais,
-            index=0
-        )
-        
-        quantidade = st.number_input(
-            "Quantidade",
-            min_value=1,
-            value=1
-        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Vendas Registradas", dados.analytics['total_vendas'])
+        with col2:
+            st.metric("Faturamento Total", f"R$ {dados.analytics['faturamento_total']:,.2f}")
         
-        data_venda = st.date_input("Data da Venda")
+        with st.form(key="form_venda"):
+            produtos_disponiveis = list(dados.produtos.keys())
+            st.selectbox(
+                "Produto",
+                options=produtos_disponiveis,
+                index=0 if produtos_disponiveis else None,
+                key="venda_produto"
+            )
+            
+            filiais = ['Brasil', 'Alemanha', 'EUA']
+            st.selectbox(
+                "Filial",
+                options=filiais,
+                index=0,
+                key="venda_filial"
+            )
+            
+            st.number_input(
+                "Quantidade",
+                min_value=1,
+                value=1,
+                key="venda_quantidade"
+            )
+            
+            st.date_input("Data da Venda", key="venda_data")
+            
+            st.form_submit_button("Registrar Venda", on_click=enviar_venda)
         
-        submit_button = st.form_submit_button("Registrar Venda")
+        mostrar_resultado('resultado_venda')
         
-        if submit_button:
-            try:
-                venda_data = {
-                    'data': data_venda.strftime('%Y-%m-%d'),
-                    'produto': produto,
-                    'filial': filial,
-                    'quantidade': int(quantidade)
-                }
-                
-                response = requests.post(
-                    'http://127.0.0.1:5000/api/vendas',
-                    json=venda_data,
-                    headers={'Content-Type': 'application/json'}
-                )
-                
-                if response.status_code == 200:
-                    st.success("✅ Venda registrada com sucesso!")
-                    time.sleep(1)
-                    st.rerun()
-                else:
-                    st.error(f"❌ Erro ao registrar venda: {response.text}")
-                    
-            except Exception as e:
-                st.error(f"❌ Erro de conexão: {str(e)}")
+        st.subheader("Importar Vendas em Lote")
+        st.caption(
+            "Arquivo CSV ou Parquet com as colunas data (AAAA-MM-DD), produto, filial e quantidade. "
+            "As vendas só são registradas se todas as linhas forem válidas e houver estoque para o total "
+            "de cada produto."
+        )
+        st.file_uploader("Arquivo de vendas", type=['csv', 'parquet'], key="importacao_arquivo")
+        st.button("Importar Vendas", on_click=importar_arquivo)
+        mostrar_resultado('resultado_importacao')
+        mostrar_rejeitadas()
+    
+    secao_venda()
 
 elif pagina == "Gerenciar Produtos e Estoque":
     st.header("Gestão de Estoque")
     
-    tab_estoque, tab_adicionar = st.tabs(["📦 Estoque Atual", "➕ Adicionar/Atualizar Produtos"])
-    
-    with tab_estoque:
-        st.subheader("Estoque Disponível")
-        
-        estoque_df = pd.DataFrame([
-            {
-                'Produto': produto,
-                'Preço': f'R$ {dados["produtos"][produto]["preco"]:.2f}',
-                'Estoque': dados["produtos"][produto]["estoque"],
-                'Valor Total': f'R$ {dados["produtos"][produto]["preco"] * dados["produtos"][produto]["estoque"]:.2f}'
-            }
-            for produto in dados["produtos"]
-        ])
-        
-        st.dataframe(
-            estoque_df,
-            column_config={
-                "Produto": st.column_config.TextColumn("Produto", width="medium"),
-                "Preço": st.column_config.TextColumn("Preço", width="small"),
-                "Estoque": st.column_config.NumberColumn("Quantidade", width="small"),
-                "Valor Total": st.column_config.TextColumn("Valor Total", width="medium")
-            },
-            hide_index=True,
-            use_container_width=True
-        )
+    # Fragmento: um envio do formulário reexecuta só esta seção
+    @st.fragment
+    def secao_estoque():
+        dados = carregar_dados()
         
-        fig_estoque = px.bar(
-            estoque_df,
-            x='Produto',
-            y='Estoque',
-            title='Quantidade em Estoque por Produto',
-            template='plotly_dark',
-            color='Estoque',
-            color_continuous_scale='Viridis'
+        tab_estoque, tab_adicionar, tab_importar = st.tabs(
+            ["📦 Estoque Atual", "➕ Adicionar/Atualizar Produtos", "📥 Importar Catálogo"]
         )
-        st.plotly_chart(fig_estoque, use_container_width=True)
-    
-    with tab_adicionar:
-        st.subheader("Adicionar Novo Produto ou Atualizar Estoque")
         
-        with st.form(key="form_produto"):
-            opcao = st.radio(
-                "Escolha uma opção:",
-                ["Atualizar Produto Existente", "Adicionar Novo Produto"]
-            )
+        with tab_estoque:
+            st.subheader("Estoque Disponível")
             
-            if opcao == "Atualizar Produto Existente":
-                produto = st.selectbox(
-                    "Selecione o Produto",
-                    list(dados["produtos"].keys())
-                )
-                nova_quantidade = st.number_input(
-                    "Quantidade a Adicionar",
-                    min_value=1,
-                    value=1
-                )
-                novo_preco = st.number_input(
-                    "Atualizar Preço (opcional)",
-                    min_value=0.0,
-                    value=float(dados["produtos"][produto]["preco"]),
-                    format="%.2f"
-                )
-            else:
-                produto = st.text_input("Nome do Novo Produto")
-                nova_quantidade = st.number_input(
-                    "Quantidade Inicial",
-                    min_value=1,
-                    value=1
+            with diagnostico.secao('tabela_estoque'):
+                estoque_df = pd.DataFrame([
+                    {
+                        'Produto': produto,
+                        'Preço': f'R$ {dados.produtos[produto]["preco"]:.2f}',
+                        'Estoque': dados.produtos[produto]["estoque"],
+                        'Valor Total': f'R$ {dados.produtos[produto]["preco"] * dados.produtos[produto]["estoque"]:.2f}'
+                    }
+                    for produto in dados.produtos
+                ])
+            
+                st.dataframe(
+                    estoque_df,
+                    column_config={
+                        "Produto": st.column_config.TextColumn("Produto", width="medium"),
+                        "Preço": st.column_config.TextColumn("Preço", width="small"),
+                        "Estoque": st.column_config.NumberColumn("Quantidade", width="small"),
+                        "Valor Total": st.column_config.TextColumn("Valor Total", width="medium")
+                    },
+                    hide_index=True,
+                    use_container_width=True
                 )
-                novo_preco = st.number_input(
-                    "Preço do Produto",
-                    min_value=0.01,
-                    value=1.0,
-                    format="%.2f"
+            
+            def figura_estoque():
+                nomes, estoques, _ = maiores_estoques(dados.produtos)
+                fig_estoque = px.bar(
+                    pd.DataFrame({'Produto': nomes, 'Estoque': estoques}),
+                    x='Produto',
+                    y='Estoque',
+                    title='Quantidade em Estoque por Produto' + (
+                        f' ({len(nomes)} maiores)' if len(nomes) < len(dados.produtos) else ''
+                    ),
+                    template='plotly_dark',
+                    color='Estoque',
+                    color_continuous_scale='Viridis'
                 )
+                return fig_estoque
             
-            submit_button = st.form_submit_button("Salvar")
+            mostrar_figura('estoque', figura_estoque, snapshot=dados)
+        
+        with tab_adicionar:
+            st.subheader("Adicionar Novo Produto ou Atualizar Estoque")
             
-            if submit_button:
-                try:
-                    if opcao == "Atualizar Produto Existente":
-                        response = requests.post(
-                            'http://127.0.0.1:5000/api/produtos',
-                            json={
-                                'nome': produto,
-                                'preco': novo_preco,
-                                'estoque': nova_quantidade,
-                                'atualizar': True
-                            }
-                        )
-                    else:
-                        if produto in dados["produtos"]:
-                            st.error("❌ Este produto já existe!")
-                        else:
-                            response = requests.post(
-                                'http://127.0.0.1:5000/api/produtos',
-                                json={
-                                    'nome': produto,
-                                    'preco': novo_preco,
-                                    'estoque': nova_quantidade,
-                                    'atualizar': False
-                                }
-                            )
-                    
-                    if response.status_code == 200:
-                        st.success("✅ Operação realizada com sucesso!")
-                        time.sleep(1)
-                        st.rerun()
-                    else:
-                        st.error(f"❌ Erro: {response.text}")
-                        
-                except Exception as e:
-                    st.error(f"❌ Erro de conexão: {str(e)}")
+            with st.form(key="form_produto"):
+                opcao = st.radio(
+                    "Escolha uma opção:",
+                    ["Atualizar Produto Existente", "Adicionar Novo Produto"],
+                    key="produto_opcao"
+                )
+                
+                if opcao == "Atualizar Produto Existente":
+                    produto = st.selectbox(
+                        "Selecione o Produto",
+                        list(dados.produtos.keys()),
+                        key="produto_nome_atualizar"
+                    )
+                    st.number_input(
+                        "Quantidade a Adicionar",
+                        min_value=1,
+                        value=1,
+                        key="produto_quantidade_atualizar"
+                    )
+                    st.number_input(
+                        "Atualizar Preço (opcional)",
+                        min_value=0.01,
+                        value=float(dados.produtos[produto]["preco"]),
+                        format="%.2f",
+                        key="produto_preco_atualizar"
+                    )
+                else:
+                    st.text_input("Nome do Novo Produto", key="produto_nome_novo")
+                    st.number_input(
+                        "Quantidade Inicial",
+                        min_value=1,
+                        value=1,
+                        key="produto_quantidade_novo"
+                    )
+                    st.number_input(
+                        "Preço do Produto",
+                        min_value=0.01,
+                        value=1.0,
+                        format="%.2f",
+                        key="produto_preco_novo"
+                    )
+                
+                st.form_submit_button("Salvar", on_click=enviar_produto)
+            
+            mostrar_resultado('resultado_produto')
+        
+        with tab_importar:
+            st.subheader("Importar Catálogo ou Reposição")
+            st.caption(
+                "Arquivo CSV ou Parquet com as colunas produto, preco e estoque. Produtos existentes recebem o "
+                "novo preço (vazio mantém o atual) e têm o estoque somado; produtos novos são inseridos. "
+                "Confira a prévia antes de aplicar: a importação é tudo ou nada."
+            )
+            st.file_uploader(
+                "Arquivo de catálogo",
+                type=['csv', 'parquet'],
+                key="catalogo_arquivo",
+                on_change=limpar_previa_catalogo
+            )
+            previa = st.session_state.get('previa_catalogo')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.button("Pré-visualizar", on_click=previsualizar_catalogo, use_container_width=True)
+            with col2:
+                st.button(
+                    "Aplicar Importação",
+                    on_click=aplicar_catalogo,
+                    disabled=previa is None or resumo_previa(previa)['conflito'] > 0,
+                    use_container_width=True
+                )
+            mostrar_resultado('resultado_catalogo')
+            mostrar_previa_catalogo()
+    
+    secao_estoque()
+
+# Página - Diagnóstico (só com PANUT_DIAGNOSTICO ligado)
+elif pagina == "Diagnóstico":
+    mostrar_diagnostico(diagnostico, obter_cache_figuras(), latencias=obter_cliente().resumo_latencias())
 
 # Rodapé
 st.markdown("""
 ---
 Desenvolvido orgulhosamente por Cezi Cola Tecnologia  
 Tecnologia puramente em Python – Todos os direitos reservados 2025.
-""")
\ No newline at end of file
+""")
+
+diagnostico.observar(f'execucao:{execucao}', time.perf_counter() - inicio_execucao)
@@ -0,0 +1,17 @@
+"""Núcleo de dados do Dashboard Panut Brasil, compartilhado pelos apps Streamlit."""
+
+from panut.analytics import AnalyticsIncremental
+from panut.cliente_http import ClienteAPI
+from panut.compartilhada import LojaCompartilhada, abrir_loja_compartilhada
+from panut.cubo import CuboVendas
+from panut.dados_iniciais import gerar_dados_iniciais
+from panut.diagnostico import Diagnostico
+from panut.eventos import LogEventos
+from panut.figuras import CacheFiguras, exibir_figura
+from panut.indice import IndiceFaturamento
+from panut.ledger import LedgerVendas, dia_ordinal, dias_ordinais, data_texto
+from panut.loja import LojaDados, SnapshotLoja, abrir_loja
+from panut.metricas import HistogramaLatencia
+from panut.persistencia import PersistenciaCompartilhada, PersistenciaSQLite
+from panut.publicacao import LeitorLedger, PublicadorLedger
+from panut.sincronizacao import ReplicaDados
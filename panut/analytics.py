@@ -0,0 +1,182 @@
+import numpy as np
+
+# Fevereiro no índice de meses do calendário (0 = janeiro)
+FEVEREIRO = 1
+
+# Tolerância relativa de `verificar`: cobre só o arredondamento de somas
+# feitas em outra ordem (a padrão do NumPy, 1e-5, esconderia 1.0 em 100 mil)
+TOLERANCIA = 1e-9
+
+
+def mes_do_dia(dia):
+    """Índice do mês (meses desde 1970-01) de um dia ordinal"""
+    return int(np.datetime64(int(dia), 'D').astype('datetime64[M]').astype(np.int64))
+
+
+class AnalyticsIncremental:
+    """
+    Agregados das vendas mantidos a cada escrita.
+
+    `registrar` custa O(1) por venda, de modo que `resumo` devolve as
+    métricas do Dashboard em tempo constante, independente do tamanho do
+    ledger. `de_ledger` recalcula tudo do zero e `verificar` compara o
+    estado incremental com esse recálculo para detectar divergências.
+    """
+
+    def __init__(self):
+        self.total_vendas = 0
+        self.faturamento_total = 0.0
+        self.quantidade_por_produto = np.zeros(16, dtype=np.int64)
+        self.faturamento_por_mes = {}
+        self.faturamento_mes_calendario = np.zeros(12, dtype=np.float64)
+        self.produto_lider = None
+
+    @classmethod
+    def de_ledger(cls, ledger):
+        """Reconstrói os agregados varrendo o ledger inteiro"""
+        analytics = cls()
+        if not len(ledger):
+            return analytics
+
+        analytics.total_vendas = len(ledger)
+        analytics.faturamento_total = float(ledger.valor.sum())
+        analytics.quantidade_por_produto = ledger.quantidade_por_produto().astype(np.int64)
+        analytics.produto_lider = int(np.argmax(analytics.quantidade_por_produto))
+
+        meses = ledger.dia.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        indices, inverso = np.unique(meses, return_inverse=True)
+        totais = np.bincount(inverso, weights=ledger.valor, minlength=len(indices))
+        analytics.faturamento_por_mes = dict(zip(indices.tolist(), totais.tolist()))
+        analytics.faturamento_mes_calendario = np.bincount(
+            meses % 12, weights=ledger.valor, minlength=12
+        )
+        return analytics
+
+    @classmethod
+    def de_resumo_mensal(cls, meses, produtos, vendas, quantidades, valores):
+        """
+        Reconstrói os agregados a partir de totais por (mês, produto), como os
+        guardados pela persistência, sem precisar das vendas individuais.
+        """
+        analytics = cls()
+        if not len(meses):
+            return analytics
+
+        meses = np.asarray(meses, dtype=np.int64)
+        valores = np.asarray(valores, dtype=np.float64)
+        analytics.total_vendas = int(np.sum(vendas))
+        analytics.faturamento_total = float(valores.sum())
+        analytics.quantidade_por_produto = np.bincount(
+            produtos, weights=quantidades, minlength=len(analytics.quantidade_por_produto)
+        ).astype(np.int64)
+        analytics.produto_lider = int(np.argmax(analytics.quantidade_por_produto))
+
+        indices, inverso = np.unique(meses, return_inverse=True)
+        totais = np.bincount(inverso, weights=valores, minlength=len(indices))
+        analytics.faturamento_por_mes = dict(zip(indices.tolist(), totais.tolist()))
+        analytics.faturamento_mes_calendario = np.bincount(meses % 12, weights=valores, minlength=12)
+        return analytics
+
+    def registrar(self, dia, produto, quantidade, valor):
+        """Atualiza os agregados com uma venda (produto é o código do ledger)"""
+        self.total_vendas += 1
+        self.faturamento_total += valor
+
+        if produto >= len(self.quantidade_por_produto):
+            tamanho = max(produto + 1, 2 * len(self.quantidade_por_produto))
+            ampliado = np.zeros(tamanho, dtype=np.int64)
+            ampliado[:len(self.quantidade_por_produto)] = self.quantidade_por_produto
+            self.quantidade_por_produto = ampliado
+        self.quantidade_por_produto[produto] += quantidade
+
+        # As quantidades só crescem, então basta comparar com o líder atual
+        if (self.produto_lider is None or
+                self.quantidade_por_produto[produto] > self.quantidade_por_produto[self.produto_lider]):
+            self.produto_lider = int(produto)
+
+        mes = mes_do_dia(dia)
+        self.faturamento_por_mes[mes] = self.faturamento_por_mes.get(mes, 0.0) + valor
+        self.faturamento_mes_calendario[mes % 12] += valor
+
+    def registrar_ledger(self, ledger, inicio):
+        """Versão vetorizada de `registrar` para as vendas do ledger a partir da linha `inicio`"""
+        produtos = ledger.produto[inicio:].astype(np.int64)
+        if not len(produtos):
+            return
+        valores = ledger.valor[inicio:]
+        self.total_vendas += len(produtos)
+        self.faturamento_total += float(valores.sum())
+
+        tamanho = max(int(produtos.max()) + 1, len(self.quantidade_por_produto))
+        quantidades = np.bincount(produtos, weights=ledger.quantidade[inicio:], minlength=tamanho)
+        quantidades[:len(self.quantidade_por_produto)] += self.quantidade_por_produto
+        self.quantidade_por_produto = quantidades.astype(np.int64)
+
+        # Em caso de empate o líder atual continua, como em `registrar`
+        lider = int(np.argmax(self.quantidade_por_produto))
+        if (self.produto_lider is None or
+                self.quantidade_por_produto[lider] > self.quantidade_por_produto[self.produto_lider]):
+            self.produto_lider = lider
+
+        meses = ledger.dia[inicio:].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        indices, inverso = np.unique(meses, return_inverse=True)
+        totais = np.bincount(inverso, weights=valores, minlength=len(indices))
+        for mes, total in zip(indices.tolist(), totais.tolist()):
+            self.faturamento_por_mes[mes] = self.faturamento_por_mes.get(mes, 0.0) + total
+        self.faturamento_mes_calendario += np.bincount(meses % 12, weights=valores, minlength=12)
+
+    def faturamento_mes(self, ano, mes):
+        """Faturamento de um mês específico (mes de 1 a 12)"""
+        return self.faturamento_por_mes.get((ano - 1970) * 12 + mes - 1, 0.0)
+
+    def resumo(self, nomes_produtos):
+        """Métricas no formato retornado por calcular_analytics"""
+        if not self.total_vendas:
+            return {
+                'total_vendas': 0,
+                'faturamento_total': 0,
+                'produto_mais_vendido': "Sem vendas",
+                'faturamento_fevereiro': 0
+            }
+
+        return {
+            'total_vendas': self.total_vendas,
+            'faturamento_total': self.faturamento_total,
+            'produto_mais_vendido': nomes_produtos[self.produto_lider],
+            'faturamento_fevereiro': float(self.faturamento_mes_calendario[FEVEREIRO])
+        }
+
+    def verificar(self, ledger):
+        """Lista as divergências entre o estado incremental e um recálculo completo"""
+        referencia = AnalyticsIncremental.de_ledger(ledger)
+        divergencias = []
+
+        if self.total_vendas != referencia.total_vendas:
+            divergencias.append(f"total_vendas: {self.total_vendas} != {referencia.total_vendas}")
+        if not np.isclose(self.faturamento_total, referencia.faturamento_total, rtol=TOLERANCIA):
+            divergencias.append(
+                f"faturamento_total: {self.faturamento_total} != {referencia.faturamento_total}"
+            )
+
+        n = len(referencia.quantidade_por_produto)
+        atual = self.quantidade_por_produto[:n]
+        if len(atual) < n or not np.array_equal(atual, referencia.quantidade_por_produto) \
+                or self.quantidade_por_produto[n:].any():
+            divergencias.append("quantidade_por_produto difere do ledger")
+
+        # Em caso de empate qualquer produto com a quantidade máxima é válido
+        if referencia.produto_lider is not None and (
+                self.produto_lider is None or
+                self.quantidade_por_produto[self.produto_lider] != referencia.quantidade_por_produto.max()):
+            divergencias.append(f"produto_lider: {self.produto_lider} != {referencia.produto_lider}")
+
+        meses = set(self.faturamento_por_mes) | set(referencia.faturamento_por_mes)
+        for mes in sorted(meses):
+            if not np.isclose(self.faturamento_por_mes.get(mes, 0.0),
+                              referencia.faturamento_por_mes.get(mes, 0.0), rtol=TOLERANCIA):
+                divergencias.append(f"faturamento do mês {mes} difere do ledger")
+        if not np.allclose(self.faturamento_mes_calendario, referencia.faturamento_mes_calendario,
+                           rtol=TOLERANCIA):
+            divergencias.append("faturamento_mes_calendario difere do ledger")
+
+        return divergencias
@@ -0,0 +1,80 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from panut.metricas import HistogramaLatencia
+
+# Timeout (s) de conexão e de leitura de cada chamada
+TIMEOUT_PADRAO = (3.05, 10)
+
+# Conexões keep-alive mantidas por host
+CONEXOES_PADRAO = 32
+
+# Leituras idempotentes são repetidas em falhas de rede e nestes status
+METODOS_IDEMPOTENTES = frozenset({'GET', 'HEAD', 'OPTIONS'})
+STATUS_REPETIVEIS = (502, 503, 504)
+
+
+class ClienteAPI:
+    """
+    Cliente HTTP do backend, um por processo.
+
+    Usa uma única `requests.Session` com pool de conexões keep-alive, aplica
+    timeout a toda chamada e repete leituras idempotentes com espera
+    exponencial (escritas só são repetidas se a conexão nem chegou a ser
+    aberta). Cada chamada alimenta um histograma de latência por endpoint.
+
+    Oferece `get`/`post` compatíveis com `requests.Session`, aceitando tanto
+    URLs completas quanto caminhos relativos a `url_base`.
+    """
+
+    def __init__(self, url_base, conexoes=CONEXOES_PADRAO, tentativas=3, espera_base=0.2,
+                 timeout=TIMEOUT_PADRAO):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+
+        tentativas_leitura = Retry(
+            total=tentativas,
+            backoff_factor=espera_base,
+            status_forcelist=STATUS_REPETIVEIS,
+            allowed_methods=METODOS_IDEMPOTENTES,
+            raise_on_status=False
+        )
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=conexoes, max_retries=tentativas_leitura)
+        self.sessao = requests.Session()
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+
+        self.latencias = {}
+        self._lock = threading.Lock()
+
+    def _histograma(self, endpoint):
+        histograma = self.latencias.get(endpoint)
+        if histograma is None:
+            with self._lock:
+                histograma = self.latencias.setdefault(endpoint, HistogramaLatencia())
+        return histograma
+
+    def requisitar(self, metodo, caminho, **kwargs):
+        """Executa uma chamada com timeout, registrando a latência do endpoint"""
+        url = caminho if '://' in caminho else self.url_base + caminho
+        kwargs.setdefault('timeout', self.timeout)
+        inicio = time.perf_counter()
+        try:
+            return self.sessao.request(metodo, url, **kwargs)
+        finally:
+            self._histograma(f'{metodo} {urlsplit(url).path}').observar(time.perf_counter() - inicio)
+
+    def get(self, caminho, **kwargs):
+        return self.requisitar('GET', caminho, **kwargs)
+
+    def post(self, caminho, **kwargs):
+        return self.requisitar('POST', caminho, **kwargs)
+
+    def resumo_latencias(self):
+        """Resumo (chamadas, média e quantis em ms) por endpoint"""
+        return {endpoint: histograma.resumo() for endpoint, histograma in sorted(self.latencias.items())}
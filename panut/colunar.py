@@ -0,0 +1,58 @@
+import json
+
+from panut.ledger import TIPOS_COLUNAS, LedgerVendas
+
+# Tipo de mídia de um stream IPC do Arrow
+TIPO_ARROW = 'application/vnd.apache.arrow.stream'
+
+
+def importar_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Formato Arrow requer o pacote pyarrow") from None
+    return pa
+
+
+def arrow_disponivel():
+    try:
+        importar_pyarrow()
+    except ValueError:
+        return False
+    return True
+
+
+def lote_vendas(ledger, metadados=None):
+    """
+    Record batch do Arrow com as colunas do ledger, sem copiá-las. Os nomes
+    de produtos e filiais (na ordem dos códigos) vão nos metadados do
+    esquema, junto com `metadados` ({chave: texto})
+    """
+    pa = importar_pyarrow()
+    esquema = pa.schema(
+        [(nome, pa.from_numpy_dtype(tipo)) for nome, tipo in TIPOS_COLUNAS.items()],
+        metadata={'produtos': json.dumps(list(ledger.produtos)), 'filiais': json.dumps(list(ledger.filiais)),
+                  **(metadados or {})}
+    )
+    return pa.record_batch([pa.array(getattr(ledger, nome)) for nome in TIPOS_COLUNAS], schema=esquema)
+
+
+def ledger_do_lote(lote):
+    """Ledger somente leitura cujas colunas são visões do record batch, sem cópia"""
+    metadados = lote.schema.metadata
+    colunas = {nome: lote.column(nome).to_numpy(zero_copy_only=True) for nome in TIPOS_COLUNAS}
+    return LedgerVendas.de_colunas(colunas, json.loads(metadados[b'produtos']), json.loads(metadados[b'filiais']))
+
+
+def serializar_arrow(lote, compressao=None):
+    """Stream IPC com um record batch; `compressao` ('lz4' ou 'zstd') comprime os buffers das colunas"""
+    pa = importar_pyarrow()
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, lote.schema, options=pa.ipc.IpcWriteOptions(compression=compressao)) as escritor:
+        escritor.write_batch(lote)
+    return saida.getvalue().to_pybytes()
+
+
+def ler_arrow(corpo):
+    """Record batch de um stream IPC gerado por `serializar_arrow`"""
+    return importar_pyarrow().ipc.open_stream(corpo).read_next_batch()
@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from panut.dados_iniciais import gerar_dados_iniciais
+from panut.importacao import comparar_catalogo, juntar_relatorios, resumo_previa, validar_estoque
+from panut.ledger import LedgerVendas, dia_ordinal
+from panut.loja import LojaDados, preco_valido
+from panut.persistencia import PersistenciaCompartilhada
+from panut.publicacao import INTERVALO_PUBLICACAO, LeitorLedger, PublicadorLedger
+
+# Intervalo (s) entre verificações de escritas de outros processos
+INTERVALO_NOTIFICACAO = 0.05
+
+# Até este número de vendas novas a sincronização registra venda a venda,
+# mais barato que os caminhos vetorizados para lotes pequenos
+VENDAS_POR_REGISTRO_UNITARIO = 32
+
+
+class LojaCompartilhada(LojaDados):
+    """
+    Loja de um entre vários processos que compartilham o mesmo banco SQLite
+    (ex.: workers do Streamlit atrás de um balanceador).
+
+    O banco é a fonte da verdade: cada escrita é uma transação em
+    `PersistenciaCompartilhada`, que confere o estoque no próprio banco, de
+    modo que processos diferentes nunca vendem além do estoque. A memória do
+    processo é uma réplica do banco, atualizada só por `sincronizar`, que
+    traz as vendas e os produtos gravados por qualquer processo na ordem do
+    banco. Ela roda logo após cada escrita deste processo (que vê a própria
+    escrita na reexecução seguinte) e, para as escritas dos outros, numa
+    thread que confere `PRAGMA data_version` a cada `intervalo` segundos.
+
+    Leituras (`snapshot`, `alteracoes`) funcionam como em `LojaDados`. O log
+    de eventos de estoque, que é de um único processo, não é usado.
+
+    Com um `publicador` (ver `panut.publicacao`), só o processo que assumiu
+    a publicação guarda as linhas do ledger e as publica como snapshot Arrow
+    a cada `intervalo_publicacao` segundos. Os demais não guardam linhas: o
+    `vendas` dos seus snapshots é o ledger publicado, mapeado sem cópia, que
+    pode estar até um intervalo atrás das métricas e do cubo. Se o
+    publicador cair, outro processo assume e relê as linhas do banco.
+    """
+
+    def __init__(self, banco, produtos, filiais, vendas, analytics, cubo, intervalo=INTERVALO_NOTIFICACAO,
+                 publicador=None, janela_dias=None, intervalo_publicacao=INTERVALO_PUBLICACAO):
+        super().__init__(produtos, filiais, vendas, analytics=analytics, cubo=cubo)
+        self._banco = banco
+        self.intervalo = intervalo
+        self._publicador = publicador
+        self._leitor = LeitorLedger(publicador.diretorio) if publicador is not None else None
+        self._janela_dias = janela_dias
+        self.intervalo_publicacao = intervalo_publicacao
+        self._ultima_publicacao = 0.0
+        if publicador is not None:
+            # Antes de atender: o publicador grava a primeira versão e os demais a mapeiam
+            self._acompanhar_publicacao()
+        self._versao_banco = banco.versao_dados()
+        self._parar = threading.Event()
+        threading.Thread(target=self._acompanhar, name='panut-notificacao', daemon=True).start()
+
+    @property
+    def _guarda_linhas(self):
+        return self._publicador is None or self._publicador.ativo
+
+    def _acompanhar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                versao = self._banco.versao_dados()
+                if versao != self._versao_banco:
+                    self._versao_banco = versao
+                    self.sincronizar()
+                if self._publicador is not None:
+                    self._acompanhar_publicacao()
+            except (sqlite3.Error, OSError):
+                # Banco ocupado ou fechado, ou falha ao gravar a publicação; a próxima verificação tenta de novo
+                pass
+
+    def _acompanhar_publicacao(self):
+        if not self._publicador.ativo and self._publicador.assumir():
+            # O publicador anterior caiu: as linhas voltam do banco
+            with self._lock:
+                self._vendas = self._banco.ler_ledger(self._vendas.produtos, self._vendas.filiais, self._janela_dias)
+                self._publicar()
+
+        if self._publicador.ativo:
+            if time.monotonic() - self._ultima_publicacao >= self.intervalo_publicacao:
+                with self._lock:
+                    ledger = self._vendas.congelar()
+                # Fora do lock: a gravação não atrasa as escritas deste processo
+                if self._publicador.publicar(ledger):
+                    self._ultima_publicacao = time.monotonic()
+        elif self._leitor.atualizar():
+            with self._lock:
+                self._publicar()
+
+    def _congelar_vendas(self):
+        if self._guarda_linhas or self._leitor.ledger is None:
+            return self._vendas.congelar()
+        return self._leitor.ledger
+
+    def sincronizar(self):
+        """Traz para a memória o que qualquer processo gravou desde a última vez. Retorna se algo mudou."""
+        with self._lock:
+            filiais, produtos, vendas = self._banco.novidades(len(self._vendas.produtos), len(self._vendas.filiais))
+            if not filiais and not produtos and vendas is None:
+                return False
+
+            for nome in filiais:
+                self._vendas.codigo_filial(nome)
+                if nome not in self._filiais:
+                    self._filiais.append(nome)
+            for codigo, nome, preco, estoque in produtos:
+                if nome not in self._produtos:
+                    # Os códigos do ledger são os do banco
+                    self._vendas.codigo_produto(nome)
+                self._produtos[nome] = {'preco': preco, 'estoque': estoque}
+                self._produto_alterado(nome)
+            if vendas is not None:
+                # Sem as linhas na memória, o lote passa por um ledger temporário
+                ledger = self._vendas if self._guarda_linhas else LedgerVendas(capacidade=len(vendas[0]))
+                inicio = ledger.estender(*vendas)
+                if len(ledger) - inicio <= VENDAS_POR_REGISTRO_UNITARIO:
+                    for dia, produto, filial, quantidade, valor in zip(*(coluna.tolist() for coluna in vendas)):
+                        self._analytics.registrar(dia, produto, quantidade, valor)
+                        self._cubo.registrar(dia, filial, produto, quantidade, valor)
+                        self._indice.registrar(dia, filial, produto, valor)
+                else:
+                    self._analytics.registrar_ledger(ledger, inicio)
+                    self._cubo.registrar_ledger(ledger, inicio)
+                    self._indice.registrar_ledger(ledger, inicio)
+            self._publicar()
+            return True
+
+    def adicionar_venda(self, data, produto, filial, quantidade):
+        """Adiciona uma nova venda, conferindo e descontando o estoque no banco"""
+        with self._banco.transacao():
+            dados = self._banco.catalogo([produto]).get(produto)
+            if dados is None:
+                return False, "❌ Produto não encontrado"
+            if dados['estoque'] < quantidade:
+                return False, "❌ Estoque insuficiente"
+            self._banco.ajustar_estoques([produto], [-quantidade])
+            self._banco.gravar_vendas([dia_ordinal(data)], [produto], [filial], [quantidade],
+                                      [dados['preco'] * quantidade])
+        self.sincronizar()
+        return True, "✅ Venda registrada com sucesso!"
+
+    def importar_vendas(self, lote):
+        """
+        Registra todas as vendas de um `LoteVendas` ou nenhuma, com a demanda
+        de cada produto conferida com o estoque do banco na mesma transação
+        """
+        with self._banco.transacao():
+            catalogo = self._banco.catalogo()
+            nomes, inverso, demanda, sem_estoque = validar_estoque(lote, catalogo)
+            rejeitadas = juntar_relatorios(lote.rejeitadas, sem_estoque)
+            if len(rejeitadas['linha']):
+                return False, f"❌ {len(rejeitadas['linha']):,} linha(s) rejeitada(s); nenhuma venda foi importada", \
+                    rejeitadas
+            if not len(lote):
+                return False, "❌ Nenhuma venda no arquivo", rejeitadas
+
+            valores = np.array([catalogo[nome]['preco'] for nome in nomes.tolist()])[inverso] * lote.quantidades
+            self._banco.ajustar_estoques(nomes.tolist(), -demanda)
+            self._banco.gravar_vendas(lote.dias, lote.produtos, lote.filiais, lote.quantidades, valores)
+        self.sincronizar()
+        return True, f"✅ {len(lote):,} vendas importadas com sucesso!", rejeitadas
+
+    def importar_produtos(self, lote):
+        """Insere e atualiza os produtos de um `LoteProdutos`, comparados com o catálogo do banco"""
+        with self._banco.transacao():
+            previa = comparar_catalogo(lote, self._banco.catalogo())
+            resumo = resumo_previa(previa)
+            if resumo['conflito']:
+                return False, f"❌ {resumo['conflito']:,} conflito(s); nenhum produto foi alterado", previa
+            if not len(previa):
+                return False, "❌ Nenhum produto no arquivo", previa
+
+            self._banco.gravar_produtos({
+                nome: (preco, int(estoque)) for nome, preco, estoque in zip(
+                    previa['produto'].tolist(), previa['preco_novo'].tolist(), previa['estoque_novo'].tolist())
+            })
+        self.sincronizar()
+        return True, (f"✅ {resumo['inserir']:,} produto(s) inserido(s) e {resumo['atualizar']:,} "
+                      f"atualizado(s)"), previa
+
+    def gerenciar_produto(self, nome, preco, estoque, atualizar=False):
+        """Adiciona ou atualiza um produto"""
+        if not preco_valido(preco):
+            return False, "❌ Preço deve ser um número positivo"
+        with self._banco.transacao():
+            atual = self._banco.catalogo([nome]).get(nome)
+            if atualizar:
+                if atual is None:
+                    return False, "❌ Produto não encontrado"
+                self._banco.gravar_produtos({nome: (preco, atual['estoque'] + estoque)})
+                mensagem = "✅ Produto atualizado com sucesso!"
+            else:
+                if atual is not None:
+                    return False, "❌ Este produto já existe!"
+                self._banco.gravar_produtos({nome: (preco, estoque)})
+                mensagem = "✅ Produto adicionado com sucesso!"
+        self.sincronizar()
+        return True, mensagem
+
+    def fechar(self):
+        self._parar.set()
+        if self._publicador is not None:
+            self._publicador.fechar()
+        self._banco.fechar()
+
+
+def abrir_loja_compartilhada(caminho_banco, janela_dias=None, intervalo=INTERVALO_NOTIFICACAO, publicacao=None,
+                             intervalo_publicacao=INTERVALO_PUBLICACAO):
+    """
+    Abre a loja de um processo que compartilha `caminho_banco` com outros.
+    Só o primeiro processo a abrir um banco vazio grava os dados de
+    demonstração. Com `publicacao` (diretório), o ledger é publicado ali por
+    um dos processos e mapeado pelos demais (ver `LojaCompartilhada`).
+    """
+    banco = PersistenciaCompartilhada(caminho_banco)
+    if banco.vazio():
+        banco.importar(*gerar_dados_iniciais(), se_vazio=True)
+    publicador = PublicadorLedger(publicacao) if publicacao else None
+    # Quem não publica não lê as linhas do banco
+    linhas = publicador is None or publicador.assumir()
+    produtos, filiais, vendas, analytics, cubo = banco.carregar(janela_dias=janela_dias, linhas=linhas)
+    return LojaCompartilhada(banco, produtos, filiais, vendas, analytics, cubo, intervalo=intervalo,
+                             publicador=publicador, janela_dias=janela_dias,
+                             intervalo_publicacao=intervalo_publicacao)
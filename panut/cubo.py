@@ -0,0 +1,356 @@
+import numpy as np
+
+from panut.filtros import IndiceFiltros
+from panut.ledger import CAPACIDADE_INICIAL
+from panut.resolucao import inicio_do_balde
+
+# Colunas de cada célula (dia, filial, produto) do cubo
+TIPOS_COLUNAS = {
+    'dia': np.int32,
+    'filial': np.int16,
+    'produto': np.int32,
+    'vendas': np.int64,
+    'quantidade': np.int64,
+    'valor': np.float64,
+    'minimo': np.float64,
+    'maximo': np.float64,
+    'primeira': np.int64,
+    'abertura': np.float64,
+    'ultima': np.int64,
+    'fechamento': np.float64
+}
+
+
+def _chave(dia, filial, produto):
+    """Empacota (dia, filial, produto) em um único inteiro"""
+    return (int(dia) << 40) | (int(filial) << 24) | int(produto)
+
+
+def _grupos(chaves_ordenadas):
+    """Início e fim (inclusive) de cada sequência de chaves iguais"""
+    inicios = np.flatnonzero(np.r_[True, chaves_ordenadas[1:] != chaves_ordenadas[:-1]])
+    fins = np.r_[inicios[1:], len(chaves_ordenadas)] - 1
+    return inicios, fins
+
+
+def _agregar(ledger, inicio):
+    """
+    Células das vendas do ledger a partir da linha `inicio`, com `primeira`
+    e `ultima` contadas a partir dessa linha.
+    """
+    dias = ledger.dia[inicio:]
+    filiais = ledger.filial[inicio:]
+    produtos = ledger.produto[inicio:]
+    chaves = (dias.astype(np.int64) << 40) | (filiais.astype(np.int64) << 24) | produtos.astype(np.int64)
+    ordem = np.argsort(chaves, kind='stable')
+    inicios, fins = _grupos(chaves[ordem])
+    valores = ledger.valor[inicio:][ordem]
+    primeiras, ultimas = ordem[inicios], ordem[fins]
+    return {
+        'dia': dias[primeiras],
+        'filial': filiais[primeiras],
+        'produto': produtos[primeiras],
+        'vendas': fins - inicios + 1,
+        'quantidade': np.add.reduceat(ledger.quantidade[inicio:][ordem].astype(np.int64), inicios),
+        'valor': np.add.reduceat(valores, inicios),
+        'minimo': np.minimum.reduceat(valores, inicios),
+        'maximo': np.maximum.reduceat(valores, inicios),
+        'primeira': primeiras,
+        'abertura': valores[inicios],
+        'ultima': ultimas,
+        'fechamento': valores[fins]
+    }
+
+
+class CuboVendas:
+    """
+    Agregado das vendas por dia × filial × produto.
+
+    Cada célula guarda quantidade, faturamento, número de vendas, menor e
+    maior ticket e o primeiro/último ticket com seu número de sequência.
+    `registrar` atualiza uma célula em O(1) a cada venda, e os widgets do
+    Dashboard leem fatias do cubo, cujo tamanho acompanha o número de dias
+    (e combinações filial × produto vendidas), não o número de vendas.
+
+    `produtos` e `filiais` são as mesmas listas de nomes do ledger, de modo
+    que os códigos coincidem.
+    """
+
+    def __init__(self, produtos=(), filiais=(), capacidade=CAPACIDADE_INICIAL):
+        self.produtos = produtos
+        self.filiais = filiais
+        self.sequencia = 0
+        self._celulas = {}
+        self._n = 0
+        self._somente_leitura = False
+        self._indice_filtros = None
+        self._colunas = {
+            nome: np.empty(max(capacidade, 1), dtype=tipo)
+            for nome, tipo in TIPOS_COLUNAS.items()
+        }
+
+    @classmethod
+    def de_ledger(cls, ledger):
+        """Monta o cubo a partir de todas as vendas de um ledger"""
+        cubo = cls(ledger.produtos, ledger.filiais)
+        if len(ledger):
+            cubo._carregar_colunas(_agregar(ledger, 0))
+            cubo.sequencia = len(ledger)
+        return cubo
+
+    @classmethod
+    def de_colunas(cls, colunas, produtos=(), filiais=()):
+        """Monta o cubo a partir de células já agregadas (ex.: lidas do banco)"""
+        cubo = cls(produtos, filiais, capacidade=len(colunas['dia']))
+        if len(colunas['dia']):
+            cubo._carregar_colunas(colunas)
+            cubo.sequencia = int(np.max(colunas['ultima'])) + 1
+        return cubo
+
+    def _carregar_colunas(self, colunas):
+        n = len(colunas['dia'])
+        self._colunas = {
+            nome: np.asarray(colunas[nome], dtype=tipo).copy()
+            for nome, tipo in TIPOS_COLUNAS.items()
+        }
+        self._n = n
+        self._indice_filtros = None
+        self._celulas = {
+            _chave(d, f, p): i
+            for i, (d, f, p) in enumerate(zip(colunas['dia'].tolist(), colunas['filial'].tolist(),
+                                              colunas['produto'].tolist()))
+        }
+
+    def __len__(self):
+        return self._n
+
+    def coluna(self, nome):
+        return self._colunas[nome][:self._n]
+
+    # Escrita
+    def _garantir_capacidade(self, extra):
+        necessario = self._n + extra
+        capacidade = len(self._colunas['dia'])
+        if necessario <= capacidade:
+            return
+        while capacidade < necessario:
+            capacidade *= 2
+        for nome, coluna in self._colunas.items():
+            nova = np.empty(capacidade, dtype=coluna.dtype)
+            nova[:self._n] = coluna[:self._n]
+            self._colunas[nome] = nova
+
+    def registrar(self, dia, filial, produto, quantidade, valor):
+        """Acrescenta uma venda (códigos do ledger) à sua célula"""
+        if self._somente_leitura:
+            raise ValueError("Cubo congelado é somente leitura")
+        sequencia = self.sequencia
+        self.sequencia += 1
+        colunas = self._colunas
+        chave = _chave(dia, filial, produto)
+        i = self._celulas.get(chave)
+
+        if i is None:
+            self._garantir_capacidade(1)
+            colunas = self._colunas
+            i = self._n
+            self._n += 1
+            self._indice_filtros = None
+            self._celulas[chave] = i
+            colunas['dia'][i] = dia
+            colunas['filial'][i] = filial
+            colunas['produto'][i] = produto
+            colunas['vendas'][i] = 1
+            colunas['quantidade'][i] = quantidade
+            colunas['valor'][i] = valor
+            colunas['minimo'][i] = valor
+            colunas['maximo'][i] = valor
+            colunas['primeira'][i] = sequencia
+            colunas['abertura'][i] = valor
+        else:
+            colunas['vendas'][i] += 1
+            colunas['quantidade'][i] += quantidade
+            colunas['valor'][i] += valor
+            if valor < colunas['minimo'][i]:
+                colunas['minimo'][i] = valor
+            if valor > colunas['maximo'][i]:
+                colunas['maximo'][i] = valor
+        colunas['ultima'][i] = sequencia
+        colunas['fechamento'][i] = valor
+
+    def registrar_ledger(self, ledger, inicio):
+        """
+        Registra as vendas do ledger a partir da linha `inicio`. O lote é
+        agregado por célula de uma vez e depois somado às células existentes
+        ou acrescentado como células novas, sem passar venda a venda.
+        """
+        if self._somente_leitura:
+            raise ValueError("Cubo congelado é somente leitura")
+        n = len(ledger) - inicio
+        if n <= 0:
+            return
+        lote = _agregar(ledger, inicio)
+        lote['primeira'] = lote['primeira'] + self.sequencia
+        lote['ultima'] = lote['ultima'] + self.sequencia
+        self.sequencia += n
+
+        chaves = ((lote['dia'].astype(np.int64) << 40) | (lote['filial'].astype(np.int64) << 24)
+                  | lote['produto'].astype(np.int64)).tolist()
+        posicoes = np.array([self._celulas.get(chave, -1) for chave in chaves], dtype=np.int64)
+        existentes = posicoes >= 0
+
+        # Células já existentes: o lote vem depois de tudo o que elas têm
+        i, j = posicoes[existentes], np.flatnonzero(existentes)
+        colunas = self._colunas
+        for nome in ('vendas', 'quantidade', 'valor'):
+            colunas[nome][i] += lote[nome][j]
+        colunas['minimo'][i] = np.minimum(colunas['minimo'][i], lote['minimo'][j])
+        colunas['maximo'][i] = np.maximum(colunas['maximo'][i], lote['maximo'][j])
+        colunas['ultima'][i] = lote['ultima'][j]
+        colunas['fechamento'][i] = lote['fechamento'][j]
+
+        novas = np.flatnonzero(~existentes)
+        if len(novas):
+            self._garantir_capacidade(len(novas))
+            colunas = self._colunas
+            inicio_novas = self._n
+            for nome, coluna in colunas.items():
+                coluna[inicio_novas:inicio_novas + len(novas)] = lote[nome][novas]
+            for k, posicao in enumerate(novas.tolist()):
+                self._celulas[chaves[posicao]] = inicio_novas + k
+            self._n += len(novas)
+            self._indice_filtros = None
+
+    def congelar(self):
+        """
+        Cópia somente leitura das células atuais. Ao contrário do ledger, as
+        células mudam a cada venda, então a cópia é real, mas proporcional
+        ao número de células.
+        """
+        congelado = object.__new__(CuboVendas)
+        congelado.produtos = tuple(self.produtos)
+        congelado.filiais = tuple(self.filiais)
+        congelado.sequencia = self.sequencia
+        congelado._celulas = None
+        congelado._n = self._n
+        congelado._somente_leitura = True
+        congelado._indice_filtros = None
+        congelado._colunas = {}
+        for nome, coluna in self._colunas.items():
+            copia = coluna[:self._n].copy()
+            copia.flags.writeable = False
+            congelado._colunas[nome] = copia
+        return congelado
+
+    # Fatias usadas pelo Dashboard
+    def indice_filtros(self):
+        """
+        Índice de filtros das células, montado na primeira consulta filtrada
+        e descartado quando uma venda cria uma célula nova.
+        """
+        if self._indice_filtros is None:
+            self._indice_filtros = IndiceFiltros(self.coluna('dia'), self.coluna('filial'),
+                                                 self.coluna('produto'), len(self.filiais), len(self.produtos))
+        return self._indice_filtros
+
+    @staticmethod
+    def _codigos(nomes, todos):
+        if nomes is None:
+            return None
+        posicoes = {nome: codigo for codigo, nome in enumerate(todos)}
+        return [posicoes[nome] for nome in nomes if nome in posicoes]
+
+    def _selecao(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """
+        Células entre os dias ordinais `inicio` e `fim` (inclusive) e, se
+        informadas, das filiais e produtos (nomes) escolhidos.
+        """
+        if inicio is None and fim is None and filiais is None and produtos is None:
+            return slice(None)
+        return self.indice_filtros().linhas(inicio, fim, self._codigos(filiais, self.filiais),
+                                            self._codigos(produtos, self.produtos))
+
+    def intervalo_dias(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """Primeiro e último dia com vendas no período, ou None se não houver"""
+        dias = self.coluna('dia')[self._selecao(inicio, fim, filiais, produtos)]
+        if not len(dias):
+            return None
+        return int(dias.min()), int(dias.max())
+
+    def faturamento_por_dia(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """Retorna (datas, faturamento) ordenados por dia"""
+        return self.faturamento_por_periodo('D', inicio, fim, filiais, produtos)
+
+    def faturamento_por_periodo(self, balde='D', inicio=None, fim=None, filiais=None, produtos=None):
+        """
+        Retorna (datas, faturamento) por dia ('D'), semana ('W') ou mês
+        ('M'), com a data de início de cada período.
+        """
+        selecao = self._selecao(inicio, fim, filiais, produtos)
+        periodos, inverso = np.unique(inicio_do_balde(self.coluna('dia')[selecao], balde), return_inverse=True)
+        totais = np.bincount(inverso, weights=self.coluna('valor')[selecao], minlength=len(periodos))
+        return periodos.astype('datetime64[D]'), totais
+
+    def faturamento_por_filial(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """Faturamento indexado pelo nome da filial"""
+        selecao = self._selecao(inicio, fim, filiais, produtos)
+        totais = np.bincount(self.coluna('filial')[selecao], weights=self.coluna('valor')[selecao],
+                             minlength=len(self.filiais))
+        return dict(zip(self.filiais, totais.tolist()))
+
+    def quantidade_por_produto(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """Quantidade vendida por código de produto"""
+        selecao = self._selecao(inicio, fim, filiais, produtos)
+        return np.bincount(self.coluna('produto')[selecao], weights=self.coluna('quantidade')[selecao],
+                           minlength=len(self.produtos))
+
+    def produto_mais_vendido(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """Nome do produto com maior quantidade vendida, ou None sem vendas"""
+        quantidades = self.quantidade_por_produto(inicio, fim, filiais, produtos)
+        if not len(quantidades) or not quantidades.any():
+            return None
+        return self.produtos[int(np.argmax(quantidades))]
+
+    def ohlc_por_dia_filial(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """
+        Mínimo, máximo, primeiro e último ticket por (dia, filial), no mesmo
+        formato de `LedgerVendas.ohlc_por_dia_filial`.
+        """
+        return self.ohlc_por_periodo_filial('D', inicio, fim, filiais, produtos)
+
+    def ohlc_por_periodo_filial(self, balde='D', inicio=None, fim=None, filiais=None, produtos=None):
+        """
+        OHLC por (período, filial), com períodos de um dia ('D'), uma semana
+        ('W') ou um mês ('M'). A abertura é o primeiro ticket do dia mais
+        antigo do período e o fechamento o último do dia mais recente.
+        """
+        selecao = self._selecao(inicio, fim, filiais, produtos)
+        dias = self.coluna('dia')[selecao]
+        if not len(dias):
+            vazio = np.empty(0)
+            return {'data': vazio.astype('datetime64[D]'), 'filial': vazio.astype(np.int16),
+                    'min': vazio, 'max': vazio, 'open': vazio, 'close': vazio}
+
+        codigos_filiais = self.coluna('filial')[selecao]
+        periodos = inicio_do_balde(dias, balde)
+        chaves = periodos * max(len(self.filiais), 1) + codigos_filiais
+
+        # Abertura: célula do dia mais antigo com a menor sequência inicial
+        ordem = np.lexsort((self.coluna('primeira')[selecao], dias, chaves))
+        inicios, fins = _grupos(chaves[ordem])
+        minimos = self.coluna('minimo')[selecao][ordem]
+        maximos = self.coluna('maximo')[selecao][ordem]
+        abertura = self.coluna('abertura')[selecao][ordem][inicios]
+
+        # Fechamento: célula do dia mais recente com a maior sequência final
+        ordem_final = np.lexsort((self.coluna('ultima')[selecao], dias, chaves))
+        fechamento = self.coluna('fechamento')[selecao][ordem_final][fins]
+
+        return {
+            'data': periodos[ordem][inicios].astype('datetime64[D]'),
+            'filial': codigos_filiais[ordem][inicios],
+            'min': np.minimum.reduceat(minimos, inicios),
+            'max': np.maximum.reduceat(maximos, inicios),
+            'open': abertura,
+            'close': fechamento
+        }
@@ -0,0 +1,23 @@
+import numpy as np
+
+from panut.sintetico import ledger_sintetico
+
+# Catálogo e filiais de demonstração; 60% das vendas são no Brasil
+PRODUTOS_INICIAIS = {
+    'Graxas': {'preco': 50.00, 'estoque': 1000},
+    'Pastas': {'preco': 100.00, 'estoque': 5000},
+    'Óleos': {'preco': 200.00, 'estoque': 2000},
+    'Produtos de limpeza': {'preco': 200.00, 'estoque': 5000},
+    'Produtos de manutenção': {'preco': 100.00, 'estoque': 1000}
+}
+FILIAIS_INICIAIS = ['Brasil', 'Alemanha', 'EUA']
+PESOS_FILIAIS = [0.6, 0.2, 0.2]
+
+
+def gerar_dados_iniciais(vendas=50, semente=None):
+    """Gera os produtos, filiais e vendas de demonstração do dashboard (últimos 30 dias)"""
+    produtos = {nome: dict(dados) for nome, dados in PRODUTOS_INICIAIS.items()}
+    filiais = list(FILIAIS_INICIAIS)
+    ledger = ledger_sintetico(vendas, produtos, filiais, semente=semente, pesos_filiais=PESOS_FILIAIS,
+                              fim=np.datetime64('today', 'D'), dias=30)
+    return produtos, filiais, ledger
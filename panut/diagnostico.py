@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from panut.metricas import HistogramaLatencia, formatar_prometheus
+
+# Baldes das seções (s): mais finos que os das chamadas HTTP, já que boa
+# parte das seções de uma reexecução leva menos de 5 ms
+LIMITES_SECOES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Intervalo (s) entre gravações do arquivo de métricas
+INTERVALO_EXPORTACAO = 15.0
+
+TIPO_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Devolvido por `secao` com o diagnóstico desligado: nenhum relógio é lido
+_NULO = nullcontext()
+
+
+class _Secao:
+    __slots__ = ('_histograma', '_inicio')
+
+    def __init__(self, histograma):
+        self._histograma = histograma
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self._histograma.observar(time.perf_counter() - self._inicio)
+        return False
+
+
+class Diagnostico:
+    """
+    Tempos das seções dos apps, agregados por seção em histogramas
+    compartilhados por todas as sessões do processo.
+
+    Desligado, `secao` devolve um contexto vazio e `observar` retorna de
+    imediato, então os pontos de medição podem ficar no código. Ligado, exporta
+    os histogramas no formato texto do Prometheus: sob demanda (`prometheus`),
+    num arquivo regravado a cada `INTERVALO_EXPORTACAO` segundos e/ou em
+    GET /metrics numa porta local. Outros grupos de histogramas (ex.: as
+    latências HTTP do `ClienteAPI`) entram na exportação com `incluir`.
+    """
+
+    def __init__(self, ativo=False, arquivo=None, porta=None, host='127.0.0.1', limites=LIMITES_SECOES):
+        self.ativo = bool(ativo or arquivo or porta)
+        self.arquivo = arquivo
+        self.limites = tuple(limites)
+        self.histogramas = {}
+        self._grupos = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._servidor = None
+
+        if not self.ativo:
+            return
+        if arquivo:
+            threading.Thread(target=self._exportar_periodicamente, name='panut-diagnostico', daemon=True).start()
+        if porta:
+            self._servidor = ThreadingHTTPServer((host, int(porta)), _manipulador(self))
+            self._servidor.daemon_threads = True
+            threading.Thread(target=self._servidor.serve_forever, name='panut-metrics', daemon=True).start()
+
+    @classmethod
+    def do_ambiente(cls):
+        """
+        Configuração pelas variáveis PANUT_DIAGNOSTICO (1 liga),
+        PANUT_DIAGNOSTICO_ARQUIVO, PANUT_DIAGNOSTICO_PORTA e
+        PANUT_DIAGNOSTICO_HOST; arquivo e porta também ligam o diagnóstico
+        """
+        return cls(
+            ativo=os.getenv('PANUT_DIAGNOSTICO', '') not in ('', '0'),
+            arquivo=os.getenv('PANUT_DIAGNOSTICO_ARQUIVO') or None,
+            porta=os.getenv('PANUT_DIAGNOSTICO_PORTA') or None,
+            host=os.getenv('PANUT_DIAGNOSTICO_HOST', '127.0.0.1')
+        )
+
+    def _histograma(self, nome):
+        histograma = self.histogramas.get(nome)
+        if histograma is None:
+            with self._lock:
+                histograma = self.histogramas.setdefault(nome, HistogramaLatencia(self.limites))
+        return histograma
+
+    def secao(self, nome):
+        """Contexto que mede o tempo do bloco como uma observação da seção"""
+        if not self.ativo:
+            return _NULO
+        return _Secao(self._histograma(nome))
+
+    def observar(self, nome, segundos):
+        if self.ativo:
+            self._histograma(nome).observar(segundos)
+
+    def incluir(self, metrica, ajuda, rotulo, histogramas):
+        """Inclui na exportação um dicionário {valor do rótulo: HistogramaLatencia}"""
+        self._grupos.append((metrica, ajuda, rotulo, histogramas))
+
+    def resumo(self):
+        """Resumo (chamadas, total em s, média e quantis em ms) por seção"""
+        resumos = {}
+        for nome, histograma in sorted(self.histogramas.items()):
+            resumos[nome] = {'total_s': histograma.soma, **histograma.resumo()}
+        return resumos
+
+    def zerar(self):
+        with self._lock:
+            self.histogramas = {}
+
+    def prometheus(self):
+        partes = [formatar_prometheus('panut_secao_segundos', "Tempo das seções dos apps", 'secao',
+                                      dict(self.histogramas))]
+        for metrica, ajuda, rotulo, histogramas in self._grupos:
+            partes.append(formatar_prometheus(metrica, ajuda, rotulo, dict(histogramas)))
+        return ''.join(partes)
+
+    def exportar(self, caminho=None):
+        """Grava a exportação Prometheus de forma atômica (arquivo temporário e rename)"""
+        caminho = caminho or self.arquivo
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(self.prometheus())
+        os.replace(temporario, caminho)
+
+    def _exportar_periodicamente(self):
+        while not self._parar.wait(INTERVALO_EXPORTACAO):
+            try:
+                self.exportar()
+            except OSError:
+                pass
+
+    def fechar(self):
+        self._parar.set()
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+        if self.arquivo:
+            self.exportar()
+
+
+def _manipulador(diagnostico):
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            corpo = diagnostico.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', TIPO_PROMETHEUS)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    return Manipulador
+
+
+def _tabela_resumos(resumos, coluna):
+    import pandas as pd
+    colunas = [nome for nome in ('chamadas', 'total_s', 'media_ms', 'p50_ms', 'p95_ms', 'p99_ms')
+               if nome in next(iter(resumos.values()))]
+    tabela = pd.DataFrame.from_dict(resumos, orient='index')[colunas].rename_axis(coluna).reset_index()
+    return tabela.rename(columns={'chamadas': 'Chamadas', 'total_s': 'Total (s)', 'media_ms': 'Média (ms)',
+                                  'p50_ms': 'p50 (ms)', 'p95_ms': 'p95 (ms)', 'p99_ms': 'p99 (ms)'})
+
+
+def mostrar_diagnostico(diagnostico, cache_figuras=None, latencias=None):
+    """
+    Página de diagnóstico dos apps Streamlit: tempos por seção, uso do cache
+    de figuras, latências HTTP (resumo de `ClienteAPI.resumo_latencias`) e
+    download da exportação Prometheus
+    """
+    import streamlit as st
+
+    st.header("Diagnóstico")
+    st.caption(
+        "Tempos das seções desde a partida do processo, somando todas as sessões. Os quantis são "
+        "estimados pelo limite do balde do histograma. As seções 'montagem' e 'serializacao' só "
+        "contam figuras que não estavam no cache."
+    )
+    resumos = diagnostico.resumo()
+    if resumos:
+        tabela = _tabela_resumos(resumos, 'Seção').sort_values('Total (s)', ascending=False)
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+    else:
+        st.info("Nenhuma medição ainda.")
+
+    if cache_figuras is not None:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Figuras em cache", f"{len(cache_figuras):,}")
+        with col2:
+            consultas = cache_figuras.acertos + cache_figuras.falhas
+            st.metric("Acertos do cache", f"{cache_figuras.acertos / consultas:.0%}" if consultas else "-")
+        with col3:
+            st.metric("Memória do cache", f"{cache_figuras.bytes / 2 ** 20:,.1f} MB")
+
+    if latencias:
+        st.subheader("Chamadas ao backend")
+        st.dataframe(_tabela_resumos(latencias, 'Endpoint'), hide_index=True, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Baixar métricas (Prometheus)",
+            diagnostico.prometheus().encode('utf-8'),
+            file_name="panut_metricas.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+    with col2:
+        st.button("Zerar medições", on_click=diagnostico.zerar, use_container_width=True)
+
+
+# Diagnóstico desligado, usado quando nenhum é informado
+DESLIGADO = Diagnostico()
@@ -0,0 +1,206 @@
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from panut.ledger import data_texto, dia_ordinal
+
+# Tipos de evento
+CADASTRO = 1
+VENDA = 2
+REPOSICAO = 3
+PRECO = 4
+
+# Registro de tamanho fixo (29 bytes): o arquivo inteiro pode ser lido como
+# um array NumPy. `preco` NaN indica que o evento não muda o preço.
+REGISTRO = np.dtype([
+    ('momento', '<i8'),     # microssegundos desde 1970, não decrescente
+    ('tipo', 'u1'),
+    ('produto', '<i4'),
+    ('delta', '<i8'),       # variação do estoque
+    ('preco', '<f8')
+])
+
+# Eventos entre snapshots; a partida relê no máximo esse número de eventos
+EVENTOS_POR_SNAPSHOT = 100_000
+
+
+def momento_de_data(data):
+    """Momento (µs, horário local) do fim do dia `data`"""
+    dia = datetime.strptime(data_texto(dia_ordinal(data)), '%Y-%m-%d') + timedelta(days=1)
+    return int(dia.timestamp() * 1_000_000) - 1
+
+
+class LogEventos:
+    """
+    Log binário só de acréscimo com todos os eventos que alteram o estoque
+    ou o preço de um produto (cadastro, venda, reposição, mudança de preço).
+
+    Cada evento é um registro de tamanho fixo em `eventos.bin`; os nomes dos
+    produtos ficam em `produtos.jsonl`, um por linha na ordem dos códigos. A
+    cada `eventos_por_snapshot` eventos o estado é compactado num snapshot
+    (`snapshots/<eventos>-<momento>.npz`), de modo que `estado()` carrega o
+    último snapshot e aplica só os eventos seguintes, com custo limitado
+    qualquer que seja o tamanho do log.
+
+    Como os momentos não decrescem, o estado em qualquer instante passado
+    sai do snapshot anterior a ele mais uma busca binária no log.
+    """
+
+    def __init__(self, diretorio, eventos_por_snapshot=EVENTOS_POR_SNAPSHOT):
+        self.diretorio = diretorio
+        self.eventos_por_snapshot = eventos_por_snapshot
+        os.makedirs(os.path.join(diretorio, 'snapshots'), exist_ok=True)
+        self._caminho = os.path.join(diretorio, 'eventos.bin')
+        caminho_nomes = os.path.join(diretorio, 'produtos.jsonl')
+
+        # Um registro ou nome pela metade (queda durante a escrita) é descartado
+        tamanho = os.path.getsize(self._caminho) if os.path.exists(self._caminho) else 0
+        self._n = tamanho // REGISTRO.itemsize
+        if tamanho % REGISTRO.itemsize:
+            os.truncate(self._caminho, self._n * REGISTRO.itemsize)
+        self.produtos = []
+        if os.path.exists(caminho_nomes):
+            with open(caminho_nomes, 'rb') as arquivo:
+                conteudo = arquivo.read()
+            completo = conteudo[:conteudo.rfind(b'\n') + 1]
+            if len(completo) < len(conteudo):
+                os.truncate(caminho_nomes, len(completo))
+            self.produtos = [json.loads(linha) for linha in completo.decode('utf-8').splitlines()]
+        self._codigos = {nome: codigo for codigo, nome in enumerate(self.produtos)}
+
+        self._snapshots = sorted(
+            tuple(int(parte) for parte in os.path.basename(caminho)[:-len('.npz')].split('-'))
+            for caminho in glob.glob(os.path.join(diretorio, 'snapshots', '*.npz'))
+        )
+        # Snapshots além do fim do log (log truncado) não valem
+        self._snapshots = [(eventos, momento) for eventos, momento in self._snapshots if eventos <= self._n]
+        self._ultimo_momento = int(self._registros(self._n - 1, self._n)['momento'][0]) if self._n else 0
+
+        self._lock = threading.Lock()
+        self._arquivo = open(self._caminho, 'ab')
+        self._arquivo_nomes = open(caminho_nomes, 'a', encoding='utf-8')
+
+    def __len__(self):
+        return self._n
+
+    def _codigo(self, nome):
+        codigo = self._codigos.get(nome)
+        if codigo is None:
+            codigo = len(self.produtos)
+            self._arquivo_nomes.write(json.dumps(nome, ensure_ascii=False) + '\n')
+            self.produtos.append(nome)
+            self._codigos[nome] = codigo
+        return codigo
+
+    # Escrita
+    def registrar(self, tipo, produto, delta=0, preco=np.nan):
+        """Acrescenta um evento"""
+        self.registrar_lote(tipo, [produto], [delta], [preco])
+
+    def registrar_lote(self, tipos, produtos, deltas, precos=None):
+        """Acrescenta vários eventos de uma vez; `tipos` pode ser um só tipo ou um por evento"""
+        with self._lock:
+            registros = np.zeros(len(produtos), dtype=REGISTRO)
+            if not len(registros):
+                return
+            self._ultimo_momento = max(self._ultimo_momento, time.time_ns() // 1000)
+            registros['momento'] = self._ultimo_momento
+            registros['tipo'] = tipos
+            registros['produto'] = [self._codigo(nome) for nome in produtos]
+            registros['delta'] = deltas
+            registros['preco'] = np.nan if precos is None else precos
+
+            # Os nomes vão para o disco antes dos eventos que os usam
+            self._arquivo_nomes.flush()
+            self._arquivo.write(registros.tobytes())
+            self._arquivo.flush()
+            self._n += len(registros)
+
+            inicio_tail = self._snapshots[-1][0] if self._snapshots else 0
+            if self.eventos_por_snapshot and self._n - inicio_tail >= self.eventos_por_snapshot:
+                self._compactar()
+
+    def compactar(self):
+        """Grava um snapshot do estado atual"""
+        with self._lock:
+            self._compactar()
+
+    def _compactar(self):
+        if not self._n or (self._snapshots and self._snapshots[-1][0] == self._n):
+            return
+        estoques, precos, vistos = self._estado_codigos(self._n)
+        momento = self._ultimo_momento
+        caminho = os.path.join(self.diretorio, 'snapshots', f'{self._n:012d}-{momento}.npz')
+        with open(caminho + '.tmp', 'wb') as arquivo:
+            np.savez(arquivo, estoques=estoques, precos=precos, vistos=vistos)
+        os.replace(caminho + '.tmp', caminho)
+        self._snapshots.append((self._n, momento))
+
+    def fechar(self):
+        with self._lock:
+            self._arquivo.close()
+            self._arquivo_nomes.close()
+
+    # Leitura
+    def _registros(self, inicio, fim):
+        if fim <= inicio:
+            return np.zeros(0, dtype=REGISTRO)
+        return np.memmap(self._caminho, dtype=REGISTRO, mode='r', offset=inicio * REGISTRO.itemsize,
+                         shape=(fim - inicio,))
+
+    def _estado_codigos(self, fim, momento=None):
+        """
+        (estoques, precos, vistos) por código após os `fim` primeiros eventos,
+        ou só dos que ocorreram até `momento`
+        """
+        snapshots = [s for s in self._snapshots if s[0] <= fim and (momento is None or s[1] <= momento)]
+        if momento is not None:
+            # Os eventos até `momento` terminam antes do primeiro snapshot posterior a ele
+            fim = next((eventos for eventos, m in self._snapshots if eventos <= fim and m > momento), fim)
+        n_produtos = len(self.produtos)
+        estoques = np.zeros(n_produtos, dtype=np.int64)
+        precos = np.full(n_produtos, np.nan)
+        vistos = np.zeros(n_produtos, dtype=bool)
+        inicio = 0
+        if snapshots:
+            inicio, momento_snapshot = snapshots[-1]
+            with np.load(os.path.join(self.diretorio, 'snapshots',
+                                      f'{inicio:012d}-{momento_snapshot}.npz')) as snapshot:
+                k = len(snapshot['estoques'])
+                estoques[:k], precos[:k], vistos[:k] = snapshot['estoques'], snapshot['precos'], snapshot['vistos']
+
+        registros = self._registros(inicio, fim)
+        if momento is not None:
+            registros = registros[:np.searchsorted(registros['momento'], momento, side='right')]
+        produto = np.asarray(registros['produto'])
+        estoques += np.bincount(produto, weights=registros['delta'], minlength=n_produtos).astype(np.int64)
+        vistos[produto] = True
+        # Último preço informado de cada produto
+        com_preco = np.flatnonzero(~np.isnan(registros['preco']))
+        if len(com_preco):
+            codigos, ultimos = np.unique(produto[com_preco][::-1], return_index=True)
+            precos[codigos] = registros['preco'][com_preco[::-1][ultimos]]
+        return estoques, precos, vistos
+
+    def estado(self, momento=None):
+        """
+        Produtos no formato da loja ({nome: {'preco', 'estoque'}}) com o
+        estado atual ou o de um `momento` passado (µs desde 1970)
+        """
+        with self._lock:
+            fim = self._n
+        estoques, precos, vistos = self._estado_codigos(fim, momento)
+        return {
+            self.produtos[codigo]: {'preco': float(precos[codigo]), 'estoque': int(estoques[codigo])}
+            for codigo in np.flatnonzero(vistos).tolist()
+        }
+
+    def estoque_em(self, data):
+        """Estoque de cada produto ao fim do dia `data`"""
+        return {nome: dados['estoque'] for nome, dados in self.estado(momento_de_data(data)).items()}
+
@@ -0,0 +1,107 @@
+import json
+import threading
+from collections import OrderedDict
+
+from panut.diagnostico import DESLIGADO
+
+# Orçamento padrão de memória das figuras serializadas
+ORCAMENTO_PADRAO = 64 * 1024 * 1024
+
+# Mesma configuração que `st.plotly_chart` envia por padrão
+CONFIG_PLOTLY = json.dumps({'showLink': False, 'linkText': False})
+
+# Versões do Streamlit (maior, menor) em que `exibir_figura` foi conferida
+# contra `st.plotly_chart` (tests/test_figuras.py): o proto PlotlyChart com
+# a figura nos campos de primeiro nível e `st._main._enqueue`
+VERSOES_API_INTERNA = {(1, 37)}
+
+
+class CacheFiguras:
+    """
+    Figuras Plotly já serializadas em JSON, por chave, com descarte LRU.
+
+    A chave deve identificar o tipo da figura, os filtros e a versão dos
+    dados (ex.: `('linha', epoca, versao)`), de modo que reexecuções sem
+    escrita, como trocar de página no menu, reaproveitam o JSON pronto em
+    vez de montar e serializar a figura de novo. Quando o total de bytes
+    passa de `orcamento_bytes`, as figuras usadas há mais tempo saem.
+
+    Com um `Diagnostico` ligado, a montagem e a serialização de cada figura
+    são medidas nas seções 'montagem:<tipo>' e 'serializacao:<tipo>', com o
+    tipo tirado do primeiro elemento da chave.
+    """
+
+    def __init__(self, orcamento_bytes=ORCAMENTO_PADRAO, diagnostico=DESLIGADO):
+        self.orcamento_bytes = orcamento_bytes
+        self.diagnostico = diagnostico
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, construir):
+        """JSON da figura da chave, chamando `construir()` só em caso de falha"""
+        with self._lock:
+            spec = self._itens.get(chave)
+            if spec is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return spec
+            self.falhas += 1
+
+        # Monta fora do lock; duas sessões podem gerar a mesma figura, o que
+        # é inofensivo
+        import plotly.io
+        with self.diagnostico.secao(f'montagem:{chave[0]}'):
+            figura = construir()
+        with self.diagnostico.secao(f'serializacao:{chave[0]}'):
+            spec = plotly.io.to_json(figura, validate=False)
+
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            if len(spec) <= self.orcamento_bytes:
+                self._itens[chave] = spec
+                self.bytes += len(spec)
+                while self.bytes > self.orcamento_bytes:
+                    _, removido = self._itens.popitem(last=False)
+                    self.bytes -= len(removido)
+        return spec
+
+    def __len__(self):
+        return len(self._itens)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+
+def api_interna_disponivel():
+    """Se o Streamlit instalado é de uma versão em `VERSOES_API_INTERNA`"""
+    import streamlit as st
+    return tuple(int(parte) for parte in st.__version__.split('.')[:2]) in VERSOES_API_INTERNA
+
+
+def exibir_figura(spec, use_container_width=True):
+    """
+    Exibe no Streamlit uma figura já serializada, sem a validação e a nova
+    serialização que `st.plotly_chart` faria. Usa a API interna do Streamlit
+    só nas versões em `VERSOES_API_INTERNA`; nas outras, reconstrói a figura
+    e usa `st.plotly_chart`.
+    """
+    import streamlit as st
+    if not api_interna_disponivel():
+        import plotly.io
+        return st.plotly_chart(plotly.io.from_json(spec), use_container_width=use_container_width)
+
+    # Numa versão conferida, uma mudança na API interna deve falhar aqui, e não cair no caminho lento
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+    proto = PlotlyChart()
+    proto.use_container_width = use_container_width
+    proto.theme = 'streamlit'
+    proto.spec = spec
+    proto.config = CONFIG_PLOTLY
+    return st._main._enqueue('plotly_chart', proto)
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+def _listas_por_codigo(codigos, dias, categorias):
+    """
+    Listas de ids por código, cada uma ordenada por dia. Retorna (ids, dias,
+    bordas): os ids do código c ficam em ids[bordas[c]:bordas[c + 1]].
+    """
+    ordem = np.lexsort((dias, codigos))
+    bordas = np.zeros(categorias + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codigos, minlength=categorias), out=bordas[1:])
+    return ordem, dias[ordem], bordas
+
+
+class IndiceFiltros:
+    """
+    Índices para filtrar linhas (vendas do ledger ou células do cubo) por
+    período, filial e produto sem varrer todas elas.
+
+    As linhas ficam numa ordem por dia, onde um período vira um intervalo
+    achado por busca binária. Cada filial e cada produto tem sua lista de
+    ids, também ordenada por dia, então "filial X no período" é uma fatia
+    contígua. Com filtro nas duas dimensões parte-se da que tem menos linhas
+    no período e só essas linhas são conferidas na outra.
+    """
+
+    def __init__(self, dias, filiais, produtos, total_filiais=None, total_produtos=None):
+        self._filiais = np.asarray(filiais)
+        self._produtos = np.asarray(produtos)
+        dias = np.asarray(dias)
+        total_filiais = total_filiais or (int(self._filiais.max()) + 1 if len(dias) else 0)
+        total_produtos = total_produtos or (int(self._produtos.max()) + 1 if len(dias) else 0)
+
+        self._ordem = np.argsort(dias, kind='stable')
+        self._dias = dias[self._ordem]
+        self._por_filial = _listas_por_codigo(self._filiais, dias, total_filiais)
+        self._por_produto = _listas_por_codigo(self._produtos, dias, total_produtos)
+
+    def __len__(self):
+        return len(self._ordem)
+
+    @staticmethod
+    def _fatia(dias, inicio, fim, base=0, limite=None):
+        """Intervalo [a, b) de `dias` (ordenados) entre `inicio` e `fim`, inclusive"""
+        limite = len(dias) if limite is None else limite
+        trecho = dias[base:limite]
+        # O limite vai no tipo da coluna: com outro tipo o searchsorted
+        # converteria a coluna inteira a cada busca
+        a = base if inicio is None else int(np.searchsorted(trecho, trecho.dtype.type(inicio), 'left')) + base
+        b = limite if fim is None else int(np.searchsorted(trecho, trecho.dtype.type(fim), 'right')) + base
+        return a, b
+
+    def _fatias(self, listas, codigos, inicio, fim):
+        ids, dias, bordas = listas
+        fatias = []
+        for codigo in codigos:
+            if 0 <= codigo < len(bordas) - 1:
+                a, b = self._fatia(dias, inicio, fim, int(bordas[codigo]), int(bordas[codigo + 1]))
+                if b > a:
+                    fatias.append((a, b))
+        return fatias
+
+    def linhas(self, inicio=None, fim=None, filiais=None, produtos=None):
+        """
+        Ids das linhas no período (dias ordinais, inclusive) e nas filiais e
+        produtos informados (códigos). None em uma dimensão significa sem
+        filtro; uma lista vazia não seleciona nada.
+        """
+        if filiais is None and produtos is None:
+            a, b = self._fatia(self._dias, inicio, fim)
+            return self._ordem[a:b]
+
+        candidatas = []
+        if filiais is not None:
+            candidatas.append((self._fatias(self._por_filial, filiais, inicio, fim), self._por_filial,
+                               self._produtos, produtos))
+        if produtos is not None:
+            candidatas.append((self._fatias(self._por_produto, produtos, inicio, fim), self._por_produto,
+                               self._filiais, filiais))
+
+        # Parte da dimensão com menos linhas no período
+        fatias, listas, coluna_outra, codigos_outra = min(
+            candidatas, key=lambda candidata: sum(b - a for a, b in candidata[0]))
+        if not fatias:
+            return np.empty(0, dtype=np.int64)
+        ids = np.concatenate([listas[0][a:b] for a, b in fatias])
+
+        if filiais is not None and produtos is not None:
+            codigos_outra = np.asarray(codigos_outra, dtype=np.int64)
+            permitidos = np.zeros(max(int(coluna_outra.max()) + 1, int(codigos_outra.max(initial=0)) + 1),
+                                  dtype=bool)
+            permitidos[codigos_outra[codigos_outra >= 0]] = True
+            ids = ids[permitidos[coluna_outra[ids]]]
+        return ids
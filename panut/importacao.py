@@ -0,0 +1,317 @@
+import io
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Vendas lidas e validadas por vez
+LINHAS_POR_BLOCO = 50_000
+
+COLUNAS_VENDAS = ('data', 'produto', 'filial', 'quantidade')
+
+# No catálogo só o nome é obrigatório: preço vazio mantém o atual e estoque
+# vazio não altera o estoque
+COLUNAS_PRODUTOS = ('produto', 'preco', 'estoque')
+
+COLUNAS_PREVIA = ('linha', 'produto', 'acao', 'preco_atual', 'preco_novo', 'estoque_atual', 'estoque_novo',
+                  'motivo')
+
+
+def relatorio_vazio():
+    return {'linha': np.empty(0, dtype=np.int64), 'motivo': np.empty(0, dtype=object)}
+
+
+def juntar_relatorios(*relatorios):
+    """Concatena relatórios de rejeição, ordenados pela linha"""
+    ordem = np.argsort(np.concatenate([relatorio['linha'] for relatorio in relatorios]), kind='stable')
+    return {
+        coluna: np.concatenate([relatorio[coluna] for relatorio in relatorios])[ordem]
+        for coluna in relatorios[0]
+    }
+
+
+@dataclass
+class LoteVendas:
+    """
+    Vendas de um arquivo já convertidas para arrays, prontas para
+    `LojaDados.importar_vendas`, e as linhas rejeitadas na leitura.
+
+    `linhas` é a posição de cada venda no arquivo (1 = primeira venda);
+    `rejeitadas` tem as colunas 'linha' e 'motivo'.
+    """
+    linhas: np.ndarray
+    dias: np.ndarray
+    produtos: np.ndarray
+    filiais: np.ndarray
+    quantidades: np.ndarray
+    rejeitadas: dict
+
+    def __len__(self):
+        return len(self.linhas)
+
+
+def _blocos_csv(arquivo, linhas_por_bloco):
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = io.BytesIO(arquivo)
+    # Exportações de PDV costumam usar ';' como separador
+    inicio = arquivo.tell() if hasattr(arquivo, 'tell') else None
+    cabecalho = arquivo.readline()
+    if isinstance(cabecalho, bytes):
+        cabecalho = cabecalho.decode('utf-8-sig', errors='replace')
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    if inicio is not None:
+        arquivo.seek(inicio)
+    yield from pd.read_csv(arquivo, sep=separador, dtype=str, keep_default_na=False,
+                           chunksize=linhas_por_bloco, encoding='utf-8-sig')
+
+
+def _blocos_parquet(arquivo, linhas_por_bloco):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Leitura de Parquet requer o pacote pyarrow")
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = io.BytesIO(arquivo)
+    for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=linhas_por_bloco):
+        yield lote.to_pandas()
+
+
+def ler_blocos(arquivo, nome_arquivo='', linhas_por_bloco=LINHAS_POR_BLOCO, colunas=COLUNAS_VENDAS,
+               opcionais=()):
+    """
+    Lê um arquivo (CSV ou Parquet, pela extensão do nome) em blocos de
+    DataFrame com as `colunas` informadas; as `opcionais` ausentes no
+    arquivo vêm vazias.
+    """
+    if str(nome_arquivo).lower().endswith('.parquet'):
+        blocos = _blocos_parquet(arquivo, linhas_por_bloco)
+    else:
+        blocos = _blocos_csv(arquivo, linhas_por_bloco)
+    for bloco in blocos:
+        bloco.columns = [str(coluna).strip().lower() for coluna in bloco.columns]
+        for coluna in opcionais:
+            if coluna not in bloco.columns:
+                bloco[coluna] = ''
+        faltando = [coluna for coluna in colunas if coluna not in bloco.columns]
+        if faltando:
+            raise ValueError(f"Colunas ausentes no arquivo: {', '.join(faltando)}")
+        yield bloco[list(colunas)]
+
+
+def _validar_bloco(bloco, primeira_linha, produtos, filiais):
+    """Converte um bloco e marca as linhas inválidas com o primeiro motivo encontrado"""
+    n = len(bloco)
+    linhas = np.arange(primeira_linha, primeira_linha + n, dtype=np.int64)
+    motivos = np.full(n, None, dtype=object)
+    rejeitadas = np.zeros(n, dtype=bool)
+
+    def rejeitar(mascara, motivo):
+        novas = mascara & ~rejeitadas
+        motivos[novas] = motivo
+        rejeitadas[novas] = True
+
+    datas = pd.to_datetime(bloco['data'].astype(str).str.strip(), format='ISO8601', errors='coerce')
+    rejeitar(datas.isna().to_numpy(), "Data inválida")
+
+    quantidades = pd.to_numeric(bloco['quantidade'].astype(str).str.strip(), errors='coerce').to_numpy(np.float64)
+    with np.errstate(invalid='ignore'):
+        rejeitar(~((quantidades >= 1) & (quantidades == np.floor(quantidades)) & (quantidades < 2 ** 31)),
+                 "Quantidade inválida")
+
+    nomes_produtos = bloco['produto'].astype(str).str.strip()
+    rejeitar(~nomes_produtos.isin(produtos).to_numpy(), "Produto não encontrado")
+
+    nomes_filiais = bloco['filial'].astype(str).str.strip()
+    rejeitar(~nomes_filiais.isin(filiais).to_numpy(), "Filial não encontrada")
+
+    validas = ~rejeitadas
+    return LoteVendas(
+        linhas=linhas[validas],
+        dias=datas.to_numpy()[validas].astype('datetime64[D]').astype(np.int32),
+        produtos=nomes_produtos.to_numpy(dtype=object)[validas],
+        filiais=nomes_filiais.to_numpy(dtype=object)[validas],
+        quantidades=quantidades[validas].astype(np.int64),
+        rejeitadas={'linha': linhas[rejeitadas], 'motivo': motivos[rejeitadas]}
+    )
+
+
+def preparar_vendas(arquivo, produtos, filiais, nome_arquivo='', linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê e valida um arquivo de vendas bloco a bloco: datas, quantidades
+    inteiras positivas e produtos e filiais cadastrados. O estoque é
+    conferido depois, em `LojaDados.importar_vendas`, sob o lock da loja.
+    """
+    blocos = []
+    linha = 1
+    for bloco in ler_blocos(arquivo, nome_arquivo, linhas_por_bloco, COLUNAS_VENDAS):
+        blocos.append(_validar_bloco(bloco, linha, list(produtos), list(filiais)))
+        linha += len(bloco)
+
+    if not blocos:
+        return LoteVendas(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=object),
+                          np.empty(0, dtype=object), np.empty(0, dtype=np.int64), relatorio_vazio())
+    return LoteVendas(
+        linhas=np.concatenate([bloco.linhas for bloco in blocos]),
+        dias=np.concatenate([bloco.dias for bloco in blocos]),
+        produtos=np.concatenate([bloco.produtos for bloco in blocos]),
+        filiais=np.concatenate([bloco.filiais for bloco in blocos]),
+        quantidades=np.concatenate([bloco.quantidades for bloco in blocos]),
+        rejeitadas=juntar_relatorios(*(bloco.rejeitadas for bloco in blocos))
+    )
+
+
+def demanda_por_produto(lote):
+    """Produtos distintos do lote, índice de cada venda neles e quantidade total pedida"""
+    nomes, inverso = np.unique(lote.produtos.astype(str), return_inverse=True)
+    demanda = np.bincount(inverso, weights=lote.quantidades, minlength=len(nomes)).astype(np.int64)
+    return nomes, inverso, demanda
+
+
+def validar_estoque(lote, produtos):
+    """
+    Rejeita todas as vendas dos produtos cuja quantidade total no lote
+    passa do estoque. Retorna (nomes, inverso, demanda, rejeitadas).
+    """
+    nomes, inverso, demanda = demanda_por_produto(lote)
+    estoques = np.array([produtos[nome]['estoque'] for nome in nomes], dtype=np.int64)
+    faltando = demanda > estoques
+    if not faltando.any():
+        return nomes, inverso, demanda, relatorio_vazio()
+
+    motivos = np.array([
+        f"Estoque insuficiente: {demanda[i]} unidades de {nomes[i]} no arquivo, {estoques[i]} em estoque"
+        if faltando[i] else None
+        for i in range(len(nomes))
+    ], dtype=object)
+    rejeitadas = faltando[inverso]
+    return nomes, inverso, demanda, {'linha': lote.linhas[rejeitadas], 'motivo': motivos[inverso[rejeitadas]]}
+
+
+@dataclass
+class LoteProdutos:
+    """
+    Produtos de um arquivo de catálogo ou reposição. `precos` é NaN onde o
+    preço atual deve ser mantido e `estoques` é a quantidade a somar ao
+    estoque (o estoque inicial, para produtos novos).
+    """
+    linhas: np.ndarray
+    nomes: np.ndarray
+    precos: np.ndarray
+    estoques: np.ndarray
+    rejeitadas: dict
+
+    def __len__(self):
+        return len(self.linhas)
+
+
+def _validar_bloco_produtos(bloco, primeira_linha):
+    n = len(bloco)
+    linhas = np.arange(primeira_linha, primeira_linha + n, dtype=np.int64)
+    motivos = np.full(n, None, dtype=object)
+    rejeitadas = np.zeros(n, dtype=bool)
+
+    def rejeitar(mascara, motivo):
+        novas = mascara & ~rejeitadas
+        motivos[novas] = motivo
+        rejeitadas[novas] = True
+
+    nomes = bloco['produto'].astype(str).str.strip()
+    rejeitar((nomes == '').to_numpy(), "Produto sem nome")
+
+    texto_preco = bloco['preco'].astype(str).str.strip().str.replace(',', '.', regex=False)
+    precos = pd.to_numeric(texto_preco, errors='coerce').to_numpy(np.float64)
+    with np.errstate(invalid='ignore'):
+        rejeitar((texto_preco != '').to_numpy() & ~((precos >= 0) & (precos < np.inf)), "Preço inválido")
+
+    texto_estoque = bloco['estoque'].astype(str).str.strip()
+    estoques = pd.to_numeric(texto_estoque, errors='coerce').to_numpy(np.float64)
+    vazio = (texto_estoque == '').to_numpy()
+    with np.errstate(invalid='ignore'):
+        rejeitar(~vazio & ~((estoques == np.floor(estoques)) & (np.abs(estoques) < 2 ** 53)), "Estoque inválido")
+
+    validas = ~rejeitadas
+    return LoteProdutos(
+        linhas=linhas[validas],
+        nomes=nomes.to_numpy(dtype=object)[validas],
+        precos=precos[validas],
+        estoques=np.where(vazio, 0, np.nan_to_num(estoques))[validas].astype(np.int64),
+        rejeitadas={'linha': linhas[rejeitadas], 'produto': nomes.to_numpy(dtype=object)[rejeitadas],
+                    'motivo': motivos[rejeitadas]}
+    )
+
+
+def preparar_produtos(arquivo, nome_arquivo='', linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê e valida bloco a bloco um arquivo de catálogo com as colunas
+    `produto`, `preco` e `estoque` (as duas últimas podem faltar).
+    """
+    blocos = []
+    linha = 1
+    for bloco in ler_blocos(arquivo, nome_arquivo, linhas_por_bloco, COLUNAS_PRODUTOS, ('preco', 'estoque')):
+        blocos.append(_validar_bloco_produtos(bloco, linha))
+        linha += len(bloco)
+
+    if not blocos:
+        return LoteProdutos(np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0),
+                            np.empty(0, dtype=np.int64),
+                            {'linha': np.empty(0, dtype=np.int64), 'produto': np.empty(0, dtype=object),
+                             'motivo': np.empty(0, dtype=object)})
+    return LoteProdutos(
+        linhas=np.concatenate([bloco.linhas for bloco in blocos]),
+        nomes=np.concatenate([bloco.nomes for bloco in blocos]),
+        precos=np.concatenate([bloco.precos for bloco in blocos]),
+        estoques=np.concatenate([bloco.estoques for bloco in blocos]),
+        rejeitadas=juntar_relatorios(*(bloco.rejeitadas for bloco in blocos))
+    )
+
+
+def comparar_catalogo(lote, produtos):
+    """
+    Prévia da importação de um `LoteProdutos` sobre o catálogo `produtos`:
+    um DataFrame por linha do arquivo com a ação ('inserir', 'atualizar' ou
+    'conflito'), preço e estoque atuais e novos e o motivo dos conflitos.
+    """
+    nomes_catalogo = list(produtos)
+    posicoes = pd.Index(nomes_catalogo, dtype=object).get_indexer(lote.nomes)
+    existe = posicoes >= 0
+    precos_catalogo = np.fromiter((produtos[nome]['preco'] for nome in nomes_catalogo), np.float64,
+                                  len(nomes_catalogo))
+    estoques_catalogo = np.fromiter((produtos[nome]['estoque'] for nome in nomes_catalogo), np.int64,
+                                    len(nomes_catalogo))
+
+    preco_atual = np.where(existe, precos_catalogo[posicoes] if len(nomes_catalogo) else np.nan, np.nan)
+    estoque_atual = np.where(existe, estoques_catalogo[posicoes] if len(nomes_catalogo) else 0, 0)
+    preco_novo = np.where(np.isnan(lote.precos), preco_atual, lote.precos)
+    estoque_novo = estoque_atual + lote.estoques
+
+    motivos = np.full(len(lote), None, dtype=object)
+    motivos[estoque_novo < 0] = "Estoque ficaria negativo"
+    motivos[~existe & np.isnan(lote.precos)] = "Preço obrigatório para produto novo"
+    motivos[pd.Series(lote.nomes, dtype=object).duplicated(keep=False).to_numpy()] = "Produto repetido no arquivo"
+    conflito = pd.notna(motivos)
+
+    previa = pd.DataFrame({
+        'linha': lote.linhas,
+        'produto': lote.nomes,
+        'acao': np.where(conflito, 'conflito', np.where(existe, 'atualizar', 'inserir')),
+        'preco_atual': preco_atual,
+        'preco_novo': preco_novo,
+        'estoque_atual': pd.Series(estoque_atual, dtype='Int64').where(existe),
+        'estoque_novo': pd.Series(estoque_novo, dtype='Int64'),
+        'motivo': motivos
+    })
+    if len(lote.rejeitadas['linha']):
+        rejeitadas = pd.DataFrame({
+            'linha': lote.rejeitadas['linha'],
+            'produto': lote.rejeitadas['produto'],
+            'acao': 'conflito',
+            'motivo': lote.rejeitadas['motivo']
+        })
+        previa = pd.concat([previa, rejeitadas], ignore_index=True).sort_values('linha', ignore_index=True)
+    return previa
+
+
+def resumo_previa(previa):
+    """Número de linhas por ação da prévia"""
+    contagem = previa['acao'].value_counts()
+    return {acao: int(contagem.get(acao, 0)) for acao in ('inserir', 'atualizar', 'conflito')}
@@ -0,0 +1,272 @@
+import numpy as np
+
+from panut.ledger import dia_ordinal
+
+# Dias alocados de início; o eixo de dias dobra quando enche
+DIAS_INICIAIS = 64
+
+ACUMULADOS = ('_total', '_por_filial', '_por_produto')
+
+
+def mes_ate_hoje(hoje):
+    """Período (inicio, fim) do primeiro dia do mês até `hoje`, em dias ordinais"""
+    dia = np.datetime64(dia_ordinal(hoje), 'D')
+    return int(dia.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)), int(dia.astype(np.int64))
+
+
+def trimestre_ate_hoje(hoje):
+    """Período do primeiro dia do trimestre até `hoje`"""
+    dia = np.datetime64(dia_ordinal(hoje), 'D')
+    mes = dia.astype('datetime64[M]').astype(np.int64)
+    inicio = np.datetime64(int(mes - mes % 3), 'M').astype('datetime64[D]')
+    return int(inicio.astype(np.int64)), int(dia.astype(np.int64))
+
+
+def ano_ate_hoje(hoje):
+    """Período do primeiro dia do ano até `hoje`"""
+    dia = np.datetime64(dia_ordinal(hoje), 'D')
+    return int(dia.astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)), int(dia.astype(np.int64))
+
+
+def ano_anterior(inicio, fim):
+    """Mesmo período um ano antes (29/02 vira 28/02)"""
+    def recuar(dia):
+        data = np.datetime64(int(dia), 'D').item()
+        try:
+            data = data.replace(year=data.year - 1)
+        except ValueError:
+            data = data.replace(year=data.year - 1, day=28)
+        return dia_ordinal(data)
+    return recuar(inicio), recuar(fim)
+
+
+class IndiceFaturamento:
+    """
+    Somas acumuladas do faturamento por dia, no total, por filial e por
+    produto.
+
+    A linha k guarda o faturamento de todos os dias anteriores a
+    `dia_base + k`, então o faturamento de qualquer período é a diferença
+    de duas linhas: O(1), independente de quantos anos o período cobre.
+    `registrar` soma a venda da linha do seu dia em diante, o que custa O(1)
+    para vendas de hoje e cresce só com os dias posteriores em vendas
+    retroativas. A memória é de 8 bytes × dias × (1 + filiais + produtos).
+
+    `congelar` compartilha as linhas já fechadas com o índice congelado, sem
+    copiá-las; só uma venda retroativa, que alteraria essas linhas, copia os
+    acumulados antes da escrita.
+
+    `filiais` e `produtos` são as listas de nomes do ledger, com os mesmos
+    códigos.
+    """
+
+    def __init__(self, filiais=(), produtos=()):
+        self.filiais = filiais
+        self.produtos = produtos
+        self.dia_base = None
+        self._dias = 0
+        self._somente_leitura = False
+        # Linhas iniciais compartilhadas com índices congelados, que não podem mudar no lugar
+        self._compartilhadas = 0
+        # Num índice congelado, cópia da última linha de cada acumulado (ver `congelar`)
+        self._ultimas = None
+        self._total = np.zeros(DIAS_INICIAIS + 1)
+        self._por_filial = np.zeros((DIAS_INICIAIS + 1, max(len(filiais), 1)))
+        self._por_produto = np.zeros((DIAS_INICIAIS + 1, max(len(produtos), 1)))
+
+    @classmethod
+    def de_cubo(cls, cubo):
+        """Monta o índice a partir das células de um `CuboVendas`"""
+        indice = cls(cubo.filiais, cubo.produtos)
+        if not len(cubo):
+            return indice
+
+        dias, valores = cubo.coluna('dia'), cubo.coluna('valor')
+        base = int(dias.min())
+        n = int(dias.max()) - base + 1
+        deslocamento = dias.astype(np.int64) - base
+
+        def acumular(codigos, colunas):
+            diario = np.bincount(deslocamento * colunas + codigos, weights=valores, minlength=n * colunas)
+            acumulado = np.zeros((n + 1, colunas))
+            np.cumsum(diario.reshape(n, colunas), axis=0, out=acumulado[1:])
+            return acumulado
+
+        indice.dia_base = base
+        indice._dias = n
+        indice._total = acumular(np.zeros(len(dias), dtype=np.int64), 1)[:, 0].copy()
+        indice._por_filial = acumular(cubo.coluna('filial').astype(np.int64), max(len(cubo.filiais), 1))
+        indice._por_produto = acumular(cubo.coluna('produto').astype(np.int64), max(len(cubo.produtos), 1))
+        return indice
+
+    def __len__(self):
+        return self._dias
+
+    # Escrita
+    def _garantir_dia(self, dia):
+        """Estende o eixo de dias para incluir `dia` e retorna sua linha"""
+        if self.dia_base is None:
+            self.dia_base = dia
+        if dia < self.dia_base:
+            # Dias anteriores ao primeiro têm acumulado zero
+            extra = self.dia_base - dia
+            self._total = np.concatenate([np.zeros(extra), self._total])
+            self._por_filial = np.concatenate([np.zeros((extra, self._por_filial.shape[1])), self._por_filial])
+            self._por_produto = np.concatenate([np.zeros((extra, self._por_produto.shape[1])), self._por_produto])
+            self._compartilhadas = 0
+            self._dias += extra
+            self.dia_base = dia
+        elif dia >= self.dia_base + self._dias:
+            dias = dia - self.dia_base + 1
+            if dias + 1 > len(self._total):
+                linhas = max(dias + 1, 2 * len(self._total))
+                self._total = self._crescer(self._total, linhas)
+                self._por_filial = self._crescer(self._por_filial, linhas)
+                self._por_produto = self._crescer(self._por_produto, linhas)
+                self._compartilhadas = 0
+            # Dias novos sem vendas repetem o último acumulado
+            for acumulado in (self._total, self._por_filial, self._por_produto):
+                acumulado[self._dias + 1:dias + 1] = acumulado[self._dias]
+            self._dias = dias
+        return dia - self.dia_base
+
+    def _crescer(self, acumulado, linhas):
+        novo = np.zeros((linhas,) + acumulado.shape[1:])
+        novo[:self._dias + 1] = acumulado[:self._dias + 1]
+        return novo
+
+    def _alterar_a_partir_de(self, linha):
+        """Copia os acumulados antes de alterar, a partir de `linha`, linhas compartilhadas com índices congelados"""
+        if linha < self._compartilhadas:
+            for nome in ACUMULADOS:
+                setattr(self, nome, getattr(self, nome).copy())
+            self._compartilhadas = 0
+
+    def _garantir_coluna(self, acumulado, codigo):
+        if codigo < acumulado.shape[1]:
+            return acumulado
+        novo = np.zeros((acumulado.shape[0], max(codigo + 1, 2 * acumulado.shape[1])))
+        novo[:, :acumulado.shape[1]] = acumulado
+        return novo
+
+    def registrar(self, dia, filial, produto, valor):
+        """Soma uma venda (códigos do ledger) ao índice"""
+        if self._somente_leitura:
+            raise ValueError("Índice congelado é somente leitura")
+        linha = self._garantir_dia(int(dia)) + 1
+        self._por_filial = self._garantir_coluna(self._por_filial, filial)
+        self._por_produto = self._garantir_coluna(self._por_produto, produto)
+        self._alterar_a_partir_de(linha)
+        fim = self._dias + 1
+        self._total[linha:fim] += valor
+        self._por_filial[linha:fim, filial] += valor
+        self._por_produto[linha:fim, produto] += valor
+
+    def registrar_ledger(self, ledger, inicio):
+        """
+        Registra as vendas do ledger a partir da linha `inicio` de uma vez:
+        soma os valores por dia e acrescenta o acumulado ao índice, com custo
+        proporcional aos dias indexados e não ao número de vendas.
+        """
+        if self._somente_leitura:
+            raise ValueError("Índice congelado é somente leitura")
+        dias = ledger.dia[inicio:]
+        if not len(dias):
+            return
+        filiais = ledger.filial[inicio:].astype(np.int64)
+        produtos = ledger.produto[inicio:].astype(np.int64)
+        valores = ledger.valor[inicio:]
+
+        self._garantir_dia(int(dias.min()))
+        self._garantir_dia(int(dias.max()))
+        self._por_filial = self._garantir_coluna(self._por_filial, int(filiais.max()))
+        self._por_produto = self._garantir_coluna(self._por_produto, int(produtos.max()))
+
+        # Uma venda do dia d entra nas linhas a partir de d - dia_base + 1
+        linhas = dias.astype(np.int64) - self.dia_base + 1
+        primeira = int(linhas.min())
+        fim = self._dias + 1
+        self._alterar_a_partir_de(primeira)
+
+        def somar(acumulado, codigos):
+            colunas = acumulado.shape[1]
+            diario = np.bincount(linhas * colunas + codigos, weights=valores, minlength=fim * colunas)
+            acumulado[primeira:fim] += np.cumsum(diario.reshape(fim, colunas), axis=0)[primeira:]
+
+        somar(self._total[:, np.newaxis], np.zeros(len(dias), dtype=np.int64))
+        somar(self._por_filial, filiais)
+        somar(self._por_produto, produtos)
+
+    def congelar(self):
+        """
+        Cópia somente leitura do estado atual. As linhas até o penúltimo dia
+        são visões dos acumulados, sem cópia: vendas do último dia ou de dias
+        novos só alteram a última linha em diante, e essa vai copiada.
+        """
+        congelado = object.__new__(IndiceFaturamento)
+        congelado.filiais = tuple(self.filiais)
+        congelado.produtos = tuple(self.produtos)
+        congelado.dia_base = self.dia_base
+        congelado._dias = self._dias
+        congelado._somente_leitura = True
+        congelado._compartilhadas = 0
+        congelado._ultimas = {}
+        for nome in ACUMULADOS:
+            visao = getattr(self, nome)[:self._dias]
+            visao.flags.writeable = False
+            setattr(congelado, nome, visao)
+            congelado._ultimas[nome] = np.array(self._linha(nome, self._dias))
+        self._compartilhadas = max(self._compartilhadas, self._dias)
+        return congelado
+
+    # Consultas O(1)
+    def _linha(self, nome, k):
+        """Linha `k` do acumulado `nome`"""
+        acumulado = getattr(self, nome)
+        if k < len(acumulado):
+            return acumulado[k]
+        return self._ultimas[nome]
+
+    def _linhas(self, inicio, fim):
+        """Linhas do acumulado que delimitam o período, recortado aos dias indexados"""
+        if self.dia_base is None:
+            return 0, 0
+        a = min(max(dia_ordinal(inicio) - self.dia_base, 0), self._dias)
+        b = min(max(dia_ordinal(fim) - self.dia_base + 1, 0), self._dias)
+        return a, max(a, b)
+
+    def faturamento(self, inicio, fim, filial=None, produto=None):
+        """
+        Faturamento entre `inicio` e `fim` (inclusive), no total ou de uma
+        filial ou de um produto (códigos do ledger).
+        """
+        a, b = self._linhas(inicio, fim)
+        if filial is not None:
+            if filial >= self._por_filial.shape[1]:
+                return 0.0
+            return float(self._linha('_por_filial', b)[filial] - self._linha('_por_filial', a)[filial])
+        if produto is not None:
+            if produto >= self._por_produto.shape[1]:
+                return 0.0
+            return float(self._linha('_por_produto', b)[produto] - self._linha('_por_produto', a)[produto])
+        return float(self._linha('_total', b) - self._linha('_total', a))
+
+    def comparar_ano_anterior(self, inicio, fim, filial=None, produto=None):
+        """Faturamento do período e do mesmo período um ano antes"""
+        anterior = ano_anterior(dia_ordinal(inicio), dia_ordinal(fim))
+        return (self.faturamento(inicio, fim, filial, produto),
+                self.faturamento(*anterior, filial=filial, produto=produto))
+
+    def faturamento_por_filial(self, inicio, fim):
+        """Faturamento do período indexado pelo nome da filial"""
+        a, b = self._linhas(inicio, fim)
+        totais = self._linha('_por_filial', b) - self._linha('_por_filial', a)
+        return {nome: float(totais[codigo]) if codigo < len(totais) else 0.0
+                for codigo, nome in enumerate(self.filiais)}
+
+    def faturamento_por_produto(self, inicio, fim):
+        """Faturamento do período indexado pelo nome do produto"""
+        a, b = self._linhas(inicio, fim)
+        totais = self._linha('_por_produto', b) - self._linha('_por_produto', a)
+        return {nome: float(totais[codigo]) if codigo < len(totais) else 0.0
+                for codigo, nome in enumerate(self.produtos)}
@@ -0,0 +1,306 @@
+import numpy as np
+from datetime import date, datetime
+
+# Capacidade inicial dos arrays; dobra sempre que o ledger enche
+CAPACIDADE_INICIAL = 1024
+
+# Tipos das colunas: 22 bytes por venda
+TIPOS_COLUNAS = {
+    'dia': np.int32,
+    'produto': np.int32,
+    'filial': np.int16,
+    'quantidade': np.int32,
+    'valor': np.float64
+}
+
+
+def dia_ordinal(data):
+    """Converte 'YYYY-MM-DD', date ou datetime em dias desde 1970-01-01"""
+    if isinstance(data, (int, np.integer)):
+        return int(data)
+    if isinstance(data, datetime):
+        data = data.date()
+    if isinstance(data, date):
+        return int(np.datetime64(data, 'D').astype(np.int64))
+    return int(np.datetime64(str(data)[:10], 'D').astype(np.int64))
+
+
+def dias_ordinais(datas):
+    """Versão vetorizada de dia_ordinal para uma sequência de datas"""
+    return np.asarray(datas, dtype='datetime64[D]').astype(np.int32)
+
+
+def data_texto(dia):
+    """Converte um dia ordinal de volta para 'YYYY-MM-DD'"""
+    return str(np.datetime64(int(dia), 'D'))
+
+
+class LedgerVendas:
+    """
+    Registro colunar das vendas.
+
+    Cada coluna é um array NumPy tipado que cresce por dobramento. As datas
+    ficam como dias ordinais (int32) e produto/filial como códigos inteiros
+    de um dicionário, de modo que gráficos e métricas operam direto sobre
+    os arrays, sem montar um DataFrame a cada reexecução.
+    """
+
+    def __init__(self, produtos=(), filiais=(), capacidade=CAPACIDADE_INICIAL):
+        self._somente_leitura = False
+        self.produtos = []
+        self.filiais = []
+        self._codigos_produto = {}
+        self._codigos_filial = {}
+        for nome in produtos:
+            self.codigo_produto(nome)
+        for nome in filiais:
+            self.codigo_filial(nome)
+
+        self._n = 0
+        self._colunas = {
+            nome: np.empty(max(capacidade, 1), dtype=tipo)
+            for nome, tipo in TIPOS_COLUNAS.items()
+        }
+
+    @classmethod
+    def de_registros(cls, registros, produtos=(), filiais=()):
+        """Cria um ledger a partir da lista de dicionários usada antes"""
+        registros = list(registros)
+        ledger = cls(produtos, filiais, capacidade=max(len(registros), CAPACIDADE_INICIAL))
+        ledger.estender_registros(registros)
+        return ledger
+
+    @classmethod
+    def de_colunas(cls, colunas, produtos, filiais):
+        """
+        Ledger somente leitura sobre arrays já existentes (ex.: mapeados de
+        um arquivo), sem copiá-los
+        """
+        ledger = object.__new__(cls)
+        ledger.produtos = tuple(produtos)
+        ledger.filiais = tuple(filiais)
+        ledger._codigos_produto = {nome: codigo for codigo, nome in enumerate(ledger.produtos)}
+        ledger._codigos_filial = {nome: codigo for codigo, nome in enumerate(ledger.filiais)}
+        ledger._n = len(colunas['dia'])
+        ledger._somente_leitura = True
+        ledger._colunas = {}
+        for nome in TIPOS_COLUNAS:
+            visao = colunas[nome].view()
+            visao.flags.writeable = False
+            ledger._colunas[nome] = visao
+        return ledger
+
+    # Dicionários de categorias
+    def codigo_produto(self, nome):
+        """Retorna o código do produto, registrando-o se for novo"""
+        codigo = self._codigos_produto.get(nome)
+        if codigo is None:
+            if self._somente_leitura:
+                raise KeyError(nome)
+            codigo = len(self.produtos)
+            self.produtos.append(nome)
+            self._codigos_produto[nome] = codigo
+        return codigo
+
+    def codigo_filial(self, nome):
+        """Retorna o código da filial, registrando-a se for nova"""
+        codigo = self._codigos_filial.get(nome)
+        if codigo is None:
+            if self._somente_leitura:
+                raise KeyError(nome)
+            codigo = len(self.filiais)
+            self.filiais.append(nome)
+            self._codigos_filial[nome] = codigo
+        return codigo
+
+    def congelar(self):
+        """
+        Retorna uma cópia somente leitura das linhas atuais sem copiar os
+        arrays. O ledger só cresce no fim, então as linhas já gravadas nunca
+        mudam e a visão continua válida enquanto o original recebe vendas.
+        """
+        congelado = object.__new__(LedgerVendas)
+        congelado.produtos = tuple(self.produtos)
+        congelado.filiais = tuple(self.filiais)
+        congelado._codigos_produto = dict(self._codigos_produto)
+        congelado._codigos_filial = dict(self._codigos_filial)
+        congelado._n = self._n
+        congelado._somente_leitura = True
+        congelado._colunas = {}
+        for nome, coluna in self._colunas.items():
+            visao = coluna[:self._n]
+            visao.flags.writeable = False
+            congelado._colunas[nome] = visao
+        return congelado
+
+    # Escrita
+    def _garantir_capacidade(self, extra):
+        if self._somente_leitura:
+            raise ValueError("Ledger congelado é somente leitura")
+        necessario = self._n + extra
+        capacidade = len(self._colunas['dia'])
+        if necessario <= capacidade:
+            return
+        while capacidade < necessario:
+            capacidade *= 2
+        for nome, coluna in self._colunas.items():
+            nova = np.empty(capacidade, dtype=coluna.dtype)
+            nova[:self._n] = coluna[:self._n]
+            self._colunas[nome] = nova
+
+    def adicionar(self, data, produto, filial, quantidade, valor):
+        """Acrescenta uma venda e retorna o índice da linha"""
+        self._garantir_capacidade(1)
+        i = self._n
+        self._colunas['dia'][i] = dia_ordinal(data)
+        self._colunas['produto'][i] = self.codigo_produto(produto)
+        self._colunas['filial'][i] = self.codigo_filial(filial)
+        self._colunas['quantidade'][i] = quantidade
+        self._colunas['valor'][i] = valor
+        self._n += 1
+        return i
+
+    def estender(self, dias, produtos, filiais, quantidades, valores):
+        """Acrescenta várias vendas já codificadas de uma só vez"""
+        dias = np.asarray(dias, dtype=np.int32)
+        extra = len(dias)
+        self._garantir_capacidade(extra)
+        inicio, fim = self._n, self._n + extra
+        self._colunas['dia'][inicio:fim] = dias
+        self._colunas['produto'][inicio:fim] = produtos
+        self._colunas['filial'][inicio:fim] = filiais
+        self._colunas['quantidade'][inicio:fim] = quantidades
+        self._colunas['valor'][inicio:fim] = valores
+        self._n = fim
+        return inicio
+
+    def estender_registros(self, registros):
+        """Acrescenta vendas no formato de dicionário (ex.: vindas de uma API JSON)"""
+        if not registros:
+            return self._n
+        return self.estender(
+            dias_ordinais([v['data'] for v in registros]),
+            [self.codigo_produto(v['produto']) for v in registros],
+            [self.codigo_filial(v['filial']) for v in registros],
+            [v['quantidade'] for v in registros],
+            [v['valor'] for v in registros]
+        )
+
+    # Leitura: visões sem cópia das linhas preenchidas
+    def __len__(self):
+        return self._n
+
+    def __bool__(self):
+        return self._n > 0
+
+    @property
+    def dia(self):
+        return self._colunas['dia'][:self._n]
+
+    @property
+    def produto(self):
+        return self._colunas['produto'][:self._n]
+
+    @property
+    def filial(self):
+        return self._colunas['filial'][:self._n]
+
+    @property
+    def quantidade(self):
+        return self._colunas['quantidade'][:self._n]
+
+    @property
+    def valor(self):
+        return self._colunas['valor'][:self._n]
+
+    def fatia(self, inicio, fim=None):
+        """Ledger somente leitura com as linhas [inicio:fim], sem cópia"""
+        return LedgerVendas.de_colunas({nome: coluna[:self._n][inicio:fim] for nome, coluna in self._colunas.items()},
+                                       self.produtos, self.filiais)
+
+    def nbytes(self):
+        """Memória ocupada pelas linhas preenchidas"""
+        return sum(coluna[:self._n].nbytes for coluna in self._colunas.values())
+
+    # Agregações usadas pelo Dashboard
+    def faturamento_por_dia(self):
+        """Retorna (datas, faturamento) ordenados por dia"""
+        dias, inverso = np.unique(self.dia, return_inverse=True)
+        totais = np.bincount(inverso, weights=self.valor, minlength=len(dias))
+        return dias.astype('datetime64[D]'), totais
+
+    def faturamento_por_filial(self):
+        """Faturamento total indexado pelo nome da filial"""
+        totais = np.bincount(self.filial, weights=self.valor, minlength=len(self.filiais))
+        return dict(zip(self.filiais, totais.tolist()))
+
+    def quantidade_por_produto(self):
+        """Quantidade vendida por código de produto"""
+        return np.bincount(self.produto, weights=self.quantidade, minlength=len(self.produtos))
+
+    def ohlc_por_dia_filial(self):
+        """
+        Mínimo, máximo, primeiro e último valor de venda por (dia, filial),
+        na ordem em que as vendas foram registradas.
+        """
+        if not self._n:
+            vazio = np.empty(0)
+            return {'data': vazio.astype('datetime64[D]'), 'filial': vazio.astype(np.int16),
+                    'min': vazio, 'max': vazio, 'open': vazio, 'close': vazio}
+
+        chave = self.dia.astype(np.int64) * max(len(self.filiais), 1) + self.filial
+        ordem = np.argsort(chave, kind='stable')
+        chave_ordenada = chave[ordem]
+        valores = self.valor[ordem]
+        inicios = np.flatnonzero(np.r_[True, chave_ordenada[1:] != chave_ordenada[:-1]])
+        fins = np.r_[inicios[1:], len(chave_ordenada)] - 1
+
+        return {
+            'data': self.dia[ordem[inicios]].astype('datetime64[D]'),
+            'filial': self.filial[ordem[inicios]],
+            'min': np.minimum.reduceat(valores, inicios),
+            'max': np.maximum.reduceat(valores, inicios),
+            'open': valores[inicios],
+            'close': valores[fins]
+        }
+
+    # Exportação
+    def registro(self, i):
+        """Retorna a venda da linha i no formato de dicionário original"""
+        return {
+            'data': data_texto(self._colunas['dia'][i]),
+            'produto': self.produtos[self._colunas['produto'][i]],
+            'filial': self.filiais[self._colunas['filial'][i]],
+            'quantidade': int(self._colunas['quantidade'][i]),
+            'valor': float(self._colunas['valor'][i])
+        }
+
+    def para_registros(self, inicio=0, fim=None):
+        """Lista de dicionários, para APIs JSON e exportação"""
+        fim = self._n if fim is None else min(fim, self._n)
+        produtos = np.asarray(self.produtos, dtype=object)
+        filiais = np.asarray(self.filiais, dtype=object)
+        fatia = slice(inicio, fim)
+        return [
+            {'data': d, 'produto': p, 'filial': f, 'quantidade': q, 'valor': v}
+            for d, p, f, q, v in zip(
+                self.dia[fatia].astype('datetime64[D]').astype(str).tolist(),
+                produtos[self.produto[fatia]].tolist(),
+                filiais[self.filial[fatia]].tolist(),
+                self.quantidade[fatia].tolist(),
+                self.valor[fatia].tolist()
+            )
+        ]
+
+    # Serialização (st.cache_data faz pickle do retorno)
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        estado['_colunas'] = {nome: coluna[:self._n].copy() for nome, coluna in self._colunas.items()}
+        return estado
+
+    def __setstate__(self, estado):
+        estado.setdefault('_somente_leitura', False)
+        self.__dict__.update(estado)
+        if self._n == 0:
+            self._colunas = {nome: np.empty(CAPACIDADE_INICIAL, dtype=tipo)
+                             for nome, tipo in TIPOS_COLUNAS.items()}
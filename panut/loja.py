@@ -0,0 +1,402 @@
+import math
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+
+from panut.analytics import AnalyticsIncremental
+from panut.cubo import CuboVendas
+from panut.dados_iniciais import gerar_dados_iniciais
+from panut.eventos import CADASTRO, PRECO, REPOSICAO, VENDA, LogEventos
+from panut.importacao import comparar_catalogo, juntar_relatorios, resumo_previa, validar_estoque
+from panut.indice import IndiceFaturamento
+from panut.ledger import LedgerVendas
+from panut.persistencia import PersistenciaSQLite
+
+# Travas do estoque; cada produto usa a de índice hash(nome) % TRAVAS_ESTOQUE
+TRAVAS_ESTOQUE = 64
+
+
+def preco_valido(preco):
+    """Preço finito e positivo (NaN, infinito, zero e negativos não valem)"""
+    return math.isfinite(preco) and preco > 0
+
+
+@dataclass(frozen=True)
+class SnapshotLoja:
+    """Visão imutável dos dados da loja em uma versão"""
+    versao: int
+    produtos: MappingProxyType
+    filiais: tuple
+    vendas: LedgerVendas
+    analytics: dict
+    cubo: CuboVendas
+    indice: IndiceFaturamento
+    # Distingue versões de processos diferentes do backend
+    epoca: str = ''
+
+
+class LojaDados:
+    """
+    Produtos, filiais e vendas compartilhados por todas as sessões do processo.
+
+    As escritas são serializadas por um lock e incrementam `versao`. Os
+    leitores recebem um `SnapshotLoja` imutável, reaproveitado até a próxima
+    escrita, de modo que a memória não cresce com o número de sessões.
+
+    `alteracoes` implementa um feed de mudanças: um cursor
+    `epoca:versao:linhas` identifica o que o cliente já tem e a resposta traz
+    só as vendas novas e os produtos alterados desde então. A `epoca` muda a
+    cada processo, invalidando cursores antigos.
+
+    Com `persistencia`, cada escrita também é enviada ao backend durável
+    (ver `PersistenciaSQLite`). Nesse caso o ledger pode conter só a janela
+    recente e `analytics` e `cubo` devem vir do histórico completo. Com
+    `eventos`, cada mudança de estoque ou preço é acrescentada ao
+    `LogEventos`, de onde sai o estoque em qualquer data passada.
+
+    O `cubo` (dia × filial × produto) é atualizado a cada venda e alimenta
+    os gráficos do Dashboard; o `indice` de somas acumuladas, derivado dele,
+    responde o faturamento de qualquer período em O(1).
+
+    O estoque de cada produto tem também uma trava própria (distribuída
+    entre `TRAVAS_ESTOQUE` travas): uma venda primeiro reserva o estoque
+    com `reservar_estoque`, que confere e desconta o saldo atomicamente, e
+    só depois entra no lock das escritas. Quem altera o estoque com o lock
+    das escritas adquirido trava também o estoque, sempre nessa ordem.
+    """
+
+    def __init__(self, produtos, filiais, vendas=None, analytics=None, persistencia=None, cubo=None,
+                 eventos=None):
+        self._lock = threading.RLock()
+        self._travas_estoque = [threading.Lock() for _ in range(TRAVAS_ESTOQUE)]
+        self._produtos = {nome: dict(dados) for nome, dados in produtos.items()}
+        self._filiais = list(filiais)
+        self._vendas = vendas if vendas is not None else LedgerVendas(self._produtos, self._filiais)
+        self._analytics = analytics if analytics is not None else AnalyticsIncremental.de_ledger(self._vendas)
+        self._cubo = cubo if cubo is not None else CuboVendas.de_ledger(self._vendas)
+        self._indice = IndiceFaturamento.de_cubo(self._cubo)
+        self._persistencia = persistencia
+        self._eventos = eventos
+        self.epoca = uuid.uuid4().hex[:8]
+        self.versao = 0
+        self._snapshot = None
+        # Produtos ordenados pela versão da última alteração
+        self._versoes_produto = OrderedDict((nome, 0) for nome in self._produtos)
+
+    def snapshot(self):
+        """Retorna o snapshot da versão atual, criando-o só após escritas"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = SnapshotLoja(
+                    versao=self.versao,
+                    produtos=MappingProxyType({
+                        nome: MappingProxyType(dict(dados)) for nome, dados in self._produtos.items()
+                    }),
+                    filiais=tuple(self._filiais),
+                    vendas=self._congelar_vendas(),
+                    analytics=self._analytics.resumo(self._vendas.produtos),
+                    cubo=self._cubo.congelar(),
+                    indice=self._indice.congelar(),
+                    epoca=self.epoca
+                )
+            return self._snapshot
+
+    def _congelar_vendas(self):
+        return self._vendas.congelar()
+
+    def _publicar(self):
+        """Chamado com o lock adquirido após cada escrita bem-sucedida"""
+        self.versao += 1
+        self._snapshot = None
+
+    def cursor(self, snapshot):
+        """Cursor do feed de mudanças correspondente a um snapshot"""
+        return f'{self.epoca}:{snapshot.versao}:{len(snapshot.vendas)}'
+
+    def alteracoes(self, cursor, registros=True):
+        """
+        Mudanças desde `cursor`: vendas novas, produtos alterados, filiais e
+        analytics atuais. Retorna None se o cursor for de outra época ou
+        inválido, caso em que o cliente deve recarregar tudo. Com
+        `registros=False` as vendas novas vêm como fatia do ledger, sem a
+        conversão para dicionários.
+        """
+        try:
+            epoca, versao, linhas = cursor.split(':')
+            versao, linhas = int(versao), int(linhas)
+        except (AttributeError, ValueError):
+            return None
+
+        snapshot = self.snapshot()
+        if epoca != self.epoca or versao > snapshot.versao or not 0 <= linhas <= len(snapshot.vendas):
+            return None
+
+        alterados = []
+        with self._lock:
+            for nome in reversed(self._versoes_produto):
+                if self._versoes_produto[nome] <= versao:
+                    break
+                alterados.append(nome)
+
+        return {
+            'cursor': self.cursor(snapshot),
+            'produtos': {
+                nome: dict(snapshot.produtos[nome]) for nome in reversed(alterados) if nome in snapshot.produtos
+            },
+            'filiais': list(snapshot.filiais),
+            'vendas': snapshot.vendas.para_registros(linhas) if registros else snapshot.vendas.fatia(linhas),
+            'analytics': snapshot.analytics
+        }
+
+    def _produto_alterado(self, nome, salvar=True):
+        """
+        Chamado com o lock adquirido sempre que um produto muda. Com
+        `salvar=False` quem chama grava o produto junto com o resto do lote.
+        """
+        self._versoes_produto[nome] = self.versao + 1
+        self._versoes_produto.move_to_end(nome)
+        if salvar and self._persistencia is not None:
+            self._persistencia.salvar_produto(nome, **self._produtos[nome])
+
+    def _trava_estoque(self, nome):
+        return self._travas_estoque[hash(nome) % len(self._travas_estoque)]
+
+    def _travar_estoques(self):
+        """Trava o estoque de todos os produtos (usado com o lock das escritas adquirido)"""
+        pilha = ExitStack()
+        for trava in self._travas_estoque:
+            pilha.enter_context(trava)
+        return pilha
+
+    def reservar_estoque(self, produto, quantidade):
+        """
+        Desconta `quantidade` do estoque de `produto` se houver saldo, numa
+        única operação atômica. Retorna None ou a mensagem de erro.
+        """
+        with self._trava_estoque(produto):
+            dados = self._produtos.get(produto)
+            if dados is None:
+                return "❌ Produto não encontrado"
+            if dados['estoque'] < quantidade:
+                return "❌ Estoque insuficiente"
+            dados['estoque'] -= quantidade
+            return None
+
+    def devolver_estoque(self, produto, quantidade):
+        """Desfaz uma reserva de `reservar_estoque`"""
+        with self._lock:
+            with self._trava_estoque(produto):
+                self._produtos[produto]['estoque'] += quantidade
+            # Um snapshot criado durante a reserva mostraria o estoque descontado
+            self._produto_alterado(produto)
+            self._publicar()
+
+    def adicionar_venda(self, data, produto, filial, quantidade):
+        """Adiciona uma nova venda"""
+        erro = self.reservar_estoque(produto, quantidade)
+        if erro is not None:
+            return False, erro
+
+        with self._lock:
+            try:
+                valor = self._produtos[produto]['preco'] * quantidade
+                i = self._vendas.adicionar(data, produto, filial, quantidade, valor)
+            except Exception:
+                # Nada além da reserva foi alterado: basta devolvê-la
+                self.devolver_estoque(produto, quantidade)
+                raise
+
+            # Daqui em diante a venda está no ledger e o estoque descontado fica
+            # com ela (a persistência devolve à fila uma venda que não gravou).
+            # Uma falha não interrompe as demais escritas e só é propagada no
+            # fim, com a venda publicada
+            dia, codigo_filial, codigo_produto = self._vendas.dia[i], self._vendas.filial[i], self._vendas.produto[i]
+            if filial not in self._filiais:
+                self._filiais.append(filial)
+            escritas = [
+                lambda: self._analytics.registrar(dia, codigo_produto, quantidade, valor),
+                lambda: self._cubo.registrar(dia, codigo_filial, codigo_produto, quantidade, valor),
+                lambda: self._indice.registrar(dia, codigo_filial, codigo_produto, valor),
+            ]
+            if self._persistencia is not None:
+                escritas.append(lambda: self._persistencia.registrar_venda(dia, produto, filial, quantidade, valor))
+            if self._eventos is not None:
+                escritas.append(lambda: self._eventos.registrar(VENDA, produto, -quantidade))
+            escritas.append(lambda: self._produto_alterado(produto))
+
+            erros = []
+            for escrita in escritas:
+                try:
+                    escrita()
+                except Exception as erro:
+                    erros.append(erro)
+            self._publicar()
+            if erros:
+                raise erros[0]
+            return True, "✅ Venda registrada com sucesso!"
+
+    def importar_vendas(self, lote):
+        """
+        Registra todas as vendas de um `LoteVendas` ou nenhuma.
+
+        A demanda total de cada produto é conferida com o estoque sob o lock,
+        de modo que vendas concorrentes não passam entre a validação e a
+        gravação. Se alguma linha do arquivo foi rejeitada, nada é gravado.
+        Retorna (sucesso, mensagem, rejeitadas), com as linhas rejeitadas e
+        o motivo de cada uma.
+        """
+        with self._lock, self._travar_estoques():
+            nomes, inverso, demanda, sem_estoque = validar_estoque(lote, self._produtos)
+            rejeitadas = juntar_relatorios(lote.rejeitadas, sem_estoque)
+            if len(rejeitadas['linha']):
+                return False, f"❌ {len(rejeitadas['linha']):,} linha(s) rejeitada(s); nenhuma venda foi importada", \
+                    rejeitadas
+            if not len(lote):
+                return False, "❌ Nenhuma venda no arquivo", rejeitadas
+
+            codigos_produto = np.array([self._vendas.codigo_produto(nome) for nome in nomes.tolist()])[inverso]
+            valores = np.array([self._produtos[nome]['preco'] for nome in nomes.tolist()])[inverso] * lote.quantidades
+            filiais, inverso_filial = np.unique(lote.filiais.astype(str), return_inverse=True)
+            codigos_filial = np.array([self._vendas.codigo_filial(nome) for nome in filiais.tolist()])[inverso_filial]
+            for filial in filiais.tolist():
+                if filial not in self._filiais:
+                    self._filiais.append(filial)
+
+            inicio = self._vendas.estender(lote.dias, codigos_produto, codigos_filial, lote.quantidades, valores)
+            self._analytics.registrar_ledger(self._vendas, inicio)
+            self._cubo.registrar_ledger(self._vendas, inicio)
+            self._indice.registrar_ledger(self._vendas, inicio)
+            for nome, quantidade in zip(nomes.tolist(), demanda.tolist()):
+                self._produtos[nome]['estoque'] -= quantidade
+                self._produto_alterado(nome, salvar=False)
+            if self._eventos is not None:
+                # Um evento por produto com a demanda total do arquivo
+                self._eventos.registrar_lote(VENDA, nomes.tolist(), -demanda)
+            if self._persistencia is not None:
+                # Vendas e estoques entram juntos na fila, que o descarregamento
+                # periódico não consegue gravar pela metade
+                estados = {nome: (self._produtos[nome]['preco'], self._produtos[nome]['estoque'])
+                           for nome in nomes.tolist()}
+                self._persistencia.registrar_vendas(lote.dias, lote.produtos, lote.filiais, lote.quantidades,
+                                                    valores, estados=estados)
+            self._publicar()
+            return True, f"✅ {len(lote):,} vendas importadas com sucesso!", rejeitadas
+
+    def importar_produtos(self, lote):
+        """
+        Insere e atualiza os produtos de um `LoteProdutos` de uma vez, ou
+        nenhum se houver conflito. A comparação com o catálogo é refeita sob
+        o lock, já que ele pode ter mudado desde a prévia, e só a aplicação
+        segura o lock. Retorna (sucesso, mensagem, previa).
+        """
+        with self._lock, self._travar_estoques():
+            previa = comparar_catalogo(lote, self._produtos)
+            resumo = resumo_previa(previa)
+            if resumo['conflito']:
+                return False, f"❌ {resumo['conflito']:,} conflito(s); nenhum produto foi alterado", previa
+            if not len(previa):
+                return False, "❌ Nenhum produto no arquivo", previa
+
+            for nome, preco, estoque in zip(previa['produto'].tolist(), previa['preco_novo'].tolist(),
+                                            previa['estoque_novo'].tolist()):
+                if nome in self._produtos:
+                    self._produtos[nome]['preco'] = preco
+                    self._produtos[nome]['estoque'] = int(estoque)
+                else:
+                    self._produtos[nome] = {'preco': preco, 'estoque': int(estoque)}
+                    self._vendas.codigo_produto(nome)
+                self._produto_alterado(nome, salvar=False)
+            if self._eventos is not None:
+                deltas = (previa['estoque_novo'] - previa['estoque_atual'].fillna(0)).to_numpy(np.int64)
+                tipos = np.where(previa['acao'] == 'inserir', CADASTRO, np.where(deltas == 0, PRECO, REPOSICAO))
+                self._eventos.registrar_lote(tipos, previa['produto'].tolist(), deltas,
+                                             previa['preco_novo'].to_numpy(np.float64))
+            if self._persistencia is not None:
+                # Todos entram na fila de uma vez, e o descarregamento periódico
+                # não grava só parte deles
+                self._persistencia.salvar_produtos({nome: (self._produtos[nome]['preco'],
+                                                           self._produtos[nome]['estoque'])
+                                                    for nome in previa['produto'].tolist()})
+            self._publicar()
+            return True, (f"✅ {resumo['inserir']:,} produto(s) inserido(s) e {resumo['atualizar']:,} "
+                          f"atualizado(s)"), previa
+
+    def gerenciar_produto(self, nome, preco, estoque, atualizar=False):
+        """Adiciona ou atualiza um produto"""
+        # Um preço inválido seria recusado pelo banco depois de já estar na memória
+        if not preco_valido(preco):
+            return False, "❌ Preço deve ser um número positivo"
+        with self._lock:
+            if atualizar:
+                if nome not in self._produtos:
+                    return False, "❌ Produto não encontrado"
+
+                with self._trava_estoque(nome):
+                    self._produtos[nome]['estoque'] += estoque
+                self._produtos[nome]['preco'] = preco
+                self._produto_alterado(nome)
+                if self._eventos is not None:
+                    self._eventos.registrar(REPOSICAO if estoque else PRECO, nome, estoque, preco)
+                self._publicar()
+                return True, "✅ Produto atualizado com sucesso!"
+            else:
+                if nome in self._produtos:
+                    return False, "❌ Este produto já existe!"
+
+                self._produtos[nome] = {
+                    'preco': preco,
+                    'estoque': estoque
+                }
+                self._vendas.codigo_produto(nome)
+                self._produto_alterado(nome)
+                if self._eventos is not None:
+                    self._eventos.registrar(CADASTRO, nome, estoque, preco)
+                self._publicar()
+                return True, "✅ Produto adicionado com sucesso!"
+
+    def estoque_em(self, data):
+        """Estoque de cada produto ao fim de uma data passada, ou None sem log de eventos"""
+        if self._eventos is None:
+            return None
+        return self._eventos.estoque_em(data)
+
+
+def abrir_loja(caminho_banco, janela_dias=None, diretorio_eventos=None):
+    """
+    Abre o banco SQLite (populado com os dados de demonstração na primeira
+    vez) e cria a loja com as vendas da janela recente.
+
+    Com `diretorio_eventos`, o estoque e os preços vêm do log de eventos
+    (último snapshot mais os eventos seguintes), que prevalece sobre a
+    tabela de produtos; um log novo começa com o cadastro dos produtos do
+    banco.
+    """
+    persistencia = PersistenciaSQLite(caminho_banco)
+    if persistencia.vazio():
+        persistencia.importar(*gerar_dados_iniciais())
+
+    produtos, filiais, vendas, analytics, cubo = persistencia.carregar(janela_dias=janela_dias)
+
+    eventos = None
+    if diretorio_eventos is not None:
+        eventos = LogEventos(diretorio_eventos)
+        if len(eventos):
+            for nome, dados in eventos.estado().items():
+                if produtos.get(nome) != dados:
+                    produtos[nome] = dados
+                    persistencia.salvar_produto(nome, **dados)
+        else:
+            eventos.registrar_lote(CADASTRO, list(produtos), [dados['estoque'] for dados in produtos.values()],
+                                   [dados['preco'] for dados in produtos.values()])
+
+    return LojaDados(produtos, filiais, vendas, analytics=analytics, persistencia=persistencia, cubo=cubo,
+                     eventos=eventos)
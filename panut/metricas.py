@@ -0,0 +1,81 @@
+import bisect
+import threading
+
+# Limites (s) dos baldes de latência, no estilo dos histogramas do Prometheus
+LIMITES_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class HistogramaLatencia:
+    """
+    Histograma de latências com baldes fixos.
+
+    Registrar uma observação custa uma busca binária e um incremento, então
+    pode ficar em caminhos quentes. Os quantis são estimados pelo limite
+    superior do balde em que caem.
+    """
+
+    def __init__(self, limites=LIMITES_PADRAO):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, segundos):
+        balde = bisect.bisect_left(self.limites, segundos)
+        with self._lock:
+            self.contagens[balde] += 1
+            self.soma += segundos
+            self.total += 1
+
+    def quantil(self, q):
+        """Estimativa do quantil q (0 a 1), em segundos"""
+        with self._lock:
+            contagens, total = list(self.contagens), self.total
+        if not total:
+            return 0.0
+        alvo = q * total
+        acumulado = 0
+        for limite, contagem in zip(self.limites, contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+    def estado(self):
+        """(contagens por balde, soma, total) lidos de uma vez"""
+        with self._lock:
+            return list(self.contagens), self.soma, self.total
+
+    def resumo(self):
+        """Chamadas, média e quantis em milissegundos"""
+        return {
+            'chamadas': self.total,
+            'media_ms': self.soma / self.total * 1000 if self.total else 0.0,
+            'p50_ms': self.quantil(0.50) * 1000,
+            'p95_ms': self.quantil(0.95) * 1000,
+            'p99_ms': self.quantil(0.99) * 1000
+        }
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def formatar_prometheus(nome, ajuda, rotulo, histogramas):
+    """
+    Histogramas ({valor do rótulo: HistogramaLatencia}) no formato texto do
+    Prometheus, como uma métrica `nome` do tipo histogram
+    """
+    linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+    for valor, histograma in sorted(histogramas.items()):
+        contagens, soma, total = histograma.estado()
+        prefixo = f'{rotulo}="{_rotulo(valor)}"'
+        acumulado = 0
+        for limite, contagem in zip(histograma.limites, contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{{{prefixo},le="{limite}"}} {acumulado}')
+        linhas.append(f'{nome}_bucket{{{prefixo},le="+Inf"}} {total}')
+        linhas.append(f'{nome}_sum{{{prefixo}}} {soma}')
+        linhas.append(f'{nome}_count{{{prefixo}}} {total}')
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,656 @@
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from panut.analytics import AnalyticsIncremental, mes_do_dia
+from panut.cubo import TIPOS_COLUNAS, CuboVendas
+from panut.ledger import LedgerVendas, dia_ordinal
+
+# Vendas por commit e intervalo máximo (s) que uma venda espera na fila
+LOTE_PADRAO = 256
+INTERVALO_PADRAO = 1.0
+
+# Linhas lidas por vez ao carregar vendas
+LINHAS_POR_LEITURA = 100_000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS produtos (
+    codigo INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL UNIQUE,
+    preco REAL NOT NULL,
+    estoque INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS filiais (
+    codigo INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS vendas (
+    id INTEGER PRIMARY KEY,
+    dia INTEGER NOT NULL,
+    produto INTEGER NOT NULL,
+    filial INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL,
+    valor REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vendas_dia ON vendas (dia);
+CREATE INDEX IF NOT EXISTS idx_vendas_filial ON vendas (filial, dia);
+CREATE INDEX IF NOT EXISTS idx_vendas_produto ON vendas (produto, dia);
+CREATE TABLE IF NOT EXISTS resumo_mensal (
+    mes INTEGER NOT NULL,
+    produto INTEGER NOT NULL,
+    vendas INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (mes, produto)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS resumo_diario (
+    dia INTEGER NOT NULL,
+    filial INTEGER NOT NULL,
+    produto INTEGER NOT NULL,
+    vendas INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    minimo REAL NOT NULL,
+    maximo REAL NOT NULL,
+    primeira INTEGER NOT NULL,
+    abertura REAL NOT NULL,
+    ultima INTEGER NOT NULL,
+    fechamento REAL NOT NULL,
+    PRIMARY KEY (dia, filial, produto)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alteracoes_produto (
+    codigo INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alteracoes_seq ON alteracoes_produto (seq);
+"""
+
+UPSERT_PRODUTO = """
+INSERT INTO produtos (codigo, nome, preco, estoque) VALUES (?, ?, ?, ?)
+ON CONFLICT (nome) DO UPDATE SET preco = excluded.preco, estoque = excluded.estoque
+"""
+
+UPSERT_RESUMO = """
+INSERT INTO resumo_mensal (mes, produto, vendas, quantidade, valor) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (mes, produto) DO UPDATE SET
+    vendas = vendas + excluded.vendas,
+    quantidade = quantidade + excluded.quantidade,
+    valor = valor + excluded.valor
+"""
+
+# `primeira` e `ultima` são ids de `vendas`; a abertura de uma célula nunca
+# muda depois de gravada
+UPSERT_DIARIO = """
+INSERT INTO resumo_diario (dia, filial, produto, vendas, quantidade, valor, minimo, maximo,
+                           primeira, abertura, ultima, fechamento)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dia, filial, produto) DO UPDATE SET
+    vendas = vendas + excluded.vendas,
+    quantidade = quantidade + excluded.quantidade,
+    valor = valor + excluded.valor,
+    minimo = MIN(minimo, excluded.minimo),
+    maximo = MAX(maximo, excluded.maximo),
+    ultima = excluded.ultima,
+    fechamento = excluded.fechamento
+"""
+
+# Preenche o resumo diário de bancos criados antes dele existir
+RECONSTRUIR_DIARIO = """
+WITH celulas AS (
+    SELECT dia, filial, produto, COUNT(*) AS vendas, SUM(quantidade) AS quantidade,
+           SUM(valor) AS valor, MIN(valor) AS minimo, MAX(valor) AS maximo,
+           MIN(id) AS primeira, MAX(id) AS ultima
+    FROM vendas GROUP BY dia, filial, produto
+)
+INSERT INTO resumo_diario
+SELECT c.dia, c.filial, c.produto, c.vendas, c.quantidade, c.valor, c.minimo, c.maximo,
+       c.primeira, a.valor, c.ultima, f.valor
+FROM celulas c
+JOIN vendas a ON a.id = c.primeira
+JOIN vendas f ON f.id = c.ultima
+"""
+
+
+def _inicio_janela(janela_dias, hoje=None):
+    """Primeiro dia ordinal da janela de vendas carregada (todas, sem janela)"""
+    if janela_dias is None:
+        return -2 ** 31
+    return dia_ordinal(hoje if hoje is not None else np.datetime64('today', 'D')) - janela_dias
+
+
+class PersistenciaSQLite:
+    """
+    Grava produtos e vendas em um banco SQLite local no modo WAL.
+
+    As escritas entram numa fila e são confirmadas em lote (a cada `lote`
+    vendas ou `intervalo` segundos), o que mantém a latência de cada venda
+    no custo de um append em memória. Além das vendas é mantido um resumo
+    por mês e produto, suficiente para reconstruir as métricas do Dashboard,
+    e um resumo por dia, filial e produto, que recria o `CuboVendas` dos
+    gráficos, ambos sem ler o histórico inteiro na inicialização.
+    """
+
+    def __init__(self, caminho, lote=LOTE_PADRAO, intervalo=INTERVALO_PADRAO):
+        self.caminho = caminho
+        self.lote = lote
+        self.intervalo = intervalo
+
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript(ESQUEMA)
+        if (self._conexao.execute("SELECT 1 FROM resumo_diario LIMIT 1").fetchone() is None
+                and self._conexao.execute("SELECT 1 FROM vendas LIMIT 1").fetchone() is not None):
+            with self._conexao:
+                self._conexao.execute("BEGIN IMMEDIATE")
+                self._conexao.execute(RECONSTRUIR_DIARIO)
+
+        self._lock = threading.Lock()
+        self._vendas_pendentes = []
+        self._produtos_pendentes = {}
+        # Itens que o banco recusou (ex.: preço nulo), tirados da fila: ([vendas], {produtos})
+        self.recusados = []
+        self._recarregar_codigos()
+        self._fechado = threading.Event()
+        # Última venda e última alteração de produto já lidas (ver `carregar`)
+        self.ultima_venda = 0
+        self.ultima_alteracao = 0
+
+        threading.Thread(target=self._descarregar_periodicamente, daemon=True).start()
+        atexit.register(self.fechar)
+
+    def _recarregar_codigos(self):
+        self._codigos_produto = dict(self._conexao.execute("SELECT nome, codigo FROM produtos"))
+        self._codigos_filial = dict(self._conexao.execute("SELECT nome, codigo FROM filiais"))
+
+    def vazio(self):
+        """Indica se o banco ainda não tem nenhum produto"""
+        return self._conexao.execute("SELECT 1 FROM produtos LIMIT 1").fetchone() is None
+
+    def _codigo(self, codigos, nome):
+        codigo = codigos.get(nome)
+        if codigo is None:
+            codigo = len(codigos)
+            codigos[nome] = codigo
+        return codigo
+
+    # Escrita
+    def salvar_produto(self, nome, preco, estoque):
+        """Agenda a gravação do estado atual de um produto"""
+        with self._lock:
+            self._produtos_pendentes[nome] = (preco, estoque)
+            self._descarregar_se_necessario()
+
+    def salvar_produtos(self, estados):
+        """
+        Grava de uma vez o estado de vários produtos ({nome: (preco,
+        estoque)}), numa única transação com o que já estiver na fila
+        """
+        with self._lock:
+            self._produtos_pendentes.update(estados)
+            self._descarregar()
+
+    def registrar_venda(self, data, produto, filial, quantidade, valor):
+        """Agenda a gravação de uma venda"""
+        with self._lock:
+            self._vendas_pendentes.append((dia_ordinal(data), produto, filial, quantidade, valor))
+            self._descarregar_se_necessario()
+
+    def registrar_vendas(self, dias, produtos, filiais, quantidades, valores, estados=None):
+        """
+        Grava um lote de vendas (ex.: importado de um arquivo) de uma vez,
+        numa única transação com o que já estiver na fila e com `estados`
+        ({nome: (preco, estoque)}), o estado dos produtos após o lote. Só se
+        o banco recusar algum item o lote é regravado item a item (ver
+        `_descarregar`).
+        """
+        with self._lock:
+            if estados:
+                self._produtos_pendentes.update(estados)
+            self._vendas_pendentes.extend(zip(
+                np.asarray(dias).tolist(), list(produtos), list(filiais),
+                np.asarray(quantidades).tolist(), np.asarray(valores).tolist()
+            ))
+            self._descarregar()
+
+    def _descarregar_se_necessario(self):
+        if len(self._vendas_pendentes) >= self.lote:
+            self._descarregar()
+
+    def descarregar(self):
+        """Confirma imediatamente tudo o que está na fila"""
+        with self._lock:
+            self._descarregar()
+
+    def _descarregar(self):
+        if not self._vendas_pendentes and not self._produtos_pendentes:
+            return
+        vendas, self._vendas_pendentes = self._vendas_pendentes, []
+        produtos, self._produtos_pendentes = self._produtos_pendentes, {}
+
+        try:
+            self._gravar_transacao(vendas, produtos)
+        except sqlite3.IntegrityError:
+            # Um item que o banco recusa falharia em toda nova tentativa e
+            # travaria a fila: o lote é regravado item a item e os recusados
+            # ficam de fora
+            self._gravar_separando(vendas, produtos)
+        except sqlite3.Error:
+            # Devolve o lote à fila para a próxima tentativa
+            self._devolver(vendas, produtos)
+            raise
+
+    def _devolver(self, vendas, produtos):
+        self._vendas_pendentes = vendas + self._vendas_pendentes
+        self._produtos_pendentes = {**produtos, **self._produtos_pendentes}
+
+    def _gravar_transacao(self, vendas, produtos):
+        try:
+            with self._conexao:
+                self._conexao.execute("BEGIN IMMEDIATE")
+                for venda in vendas:
+                    if venda[1] not in self._codigos_produto and venda[1] not in produtos:
+                        # Sem o produto no banco a venda deixaria um código sem nome
+                        raise sqlite3.IntegrityError(f"Venda de produto fora do banco: {venda[1]}")
+                self._gravar(vendas, produtos)
+        except sqlite3.Error:
+            # Códigos atribuídos na transação desfeita voltam a ficar livres,
+            # para que os do banco continuem contíguos (ver `_ledger_vazio`)
+            self._recarregar_codigos()
+            raise
+
+    def _gravar_separando(self, vendas, produtos):
+        # Produtos antes das vendas, como na gravação do lote inteiro
+        itens = [([], {nome: dados}) for nome, dados in produtos.items()] + [([venda], {}) for venda in vendas]
+        for i, (venda, produto) in enumerate(itens):
+            try:
+                self._gravar_transacao(venda, produto)
+            except sqlite3.IntegrityError:
+                self.recusados.append((venda, produto))
+            except sqlite3.Error:
+                for venda, produto in reversed(itens[i:]):
+                    self._devolver(venda, produto)
+                raise
+
+    def _codigo_produto(self, nome):
+        return self._codigo(self._codigos_produto, nome)
+
+    def _codigo_filial(self, nome):
+        return self._codigo(self._codigos_filial, nome)
+
+    def _gravar(self, vendas, produtos):
+        """
+        Grava vendas (dia, produto, filial, quantidade, valor) e produtos
+        ({nome: (preco, estoque)}) com os resumos, na transação já aberta
+        """
+        # Produtos novos recebem código antes dos das vendas, na ordem de cadastro
+        for nome in produtos:
+            self._codigo_produto(nome)
+        filiais = {}
+        linhas = []
+        resumo = {}
+        diario = {}
+        for i, (dia, produto, filial, quantidade, valor) in enumerate(vendas):
+            codigo_produto = self._codigo_produto(produto)
+            filiais[filial] = self._codigo_filial(filial)
+            linhas.append((dia, codigo_produto, filiais[filial], quantidade, valor))
+
+            chave = (mes_do_dia(dia), codigo_produto)
+            acumulado = resumo.get(chave, (0, 0, 0.0))
+            resumo[chave] = (acumulado[0] + 1, acumulado[1] + quantidade, acumulado[2] + valor)
+
+            # Células do resumo diário; `i` vira id depois do INSERT
+            celula = diario.get((dia, filiais[filial], codigo_produto))
+            if celula is None:
+                diario[(dia, filiais[filial], codigo_produto)] = [1, quantidade, valor, valor, valor,
+                                                                  i, valor, i, valor]
+            else:
+                celula[0] += 1
+                celula[1] += quantidade
+                celula[2] += valor
+                celula[3] = min(celula[3], valor)
+                celula[4] = max(celula[4], valor)
+                celula[7] = i
+                celula[8] = valor
+
+        self._conexao.executemany(
+            UPSERT_PRODUTO,
+            [(self._codigo_produto(nome), nome, preco, estoque) for nome, (preco, estoque) in produtos.items()]
+        )
+        self._conexao.executemany(
+            "INSERT OR IGNORE INTO filiais (codigo, nome) VALUES (?, ?)",
+            [(codigo, nome) for nome, codigo in filiais.items()]
+        )
+        self._conexao.executemany(
+            "INSERT INTO vendas (dia, produto, filial, quantidade, valor) VALUES (?, ?, ?, ?, ?)",
+            linhas
+        )
+        self._conexao.executemany(
+            UPSERT_RESUMO,
+            [(mes, produto) + acumulado for (mes, produto), acumulado in resumo.items()]
+        )
+        if linhas:
+            primeiro_id = self._ultimo_id() - len(linhas) + 1
+            self._conexao.executemany(
+                UPSERT_DIARIO,
+                [chave + (n, q, v, minimo, maximo, primeiro_id + p, abertura, primeiro_id + u, fechamento)
+                 for chave, (n, q, v, minimo, maximo, p, abertura, u, fechamento) in diario.items()]
+            )
+
+    def _ultimo_id(self):
+        # Dentro do BEGIN IMMEDIATE os ids de um executemany são consecutivos
+        return self._conexao.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def _descarregar_periodicamente(self):
+        while not self._fechado.wait(self.intervalo):
+            try:
+                self.descarregar()
+            except sqlite3.Error:
+                # A fila é mantida e a próxima tentativa grava o que faltou
+                pass
+
+    def importar(self, produtos, filiais, vendas, se_vazio=False):
+        """
+        Grava de uma vez um catálogo e um ledger completos (carga inicial).
+        Com `se_vazio`, só grava se o banco ainda estiver vazio dentro da
+        transação (vários processos podem tentar a mesma carga inicial).
+        Retorna se gravou.
+        """
+        with self._lock:
+            self._descarregar()
+            for nome in produtos:
+                self._codigo(self._codigos_produto, nome)
+            for nome in list(filiais) + list(vendas.filiais):
+                self._codigo(self._codigos_filial, nome)
+
+            # Códigos do ledger convertidos para os códigos do banco
+            mapa_produto = np.array([self._codigo(self._codigos_produto, nome) for nome in vendas.produtos],
+                                    dtype=np.int64)
+            mapa_filial = np.array([self._codigos_filial[nome] for nome in vendas.filiais], dtype=np.int64)
+            codigos_produto = mapa_produto[vendas.produto]
+            codigos_filial = mapa_filial[vendas.filial]
+
+            # Resumo mensal agrupado por (mês, produto)
+            meses = vendas.dia.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            chaves, inverso = np.unique(
+                np.stack([meses, codigos_produto], axis=1), axis=0, return_inverse=True
+            )
+            inverso = inverso.reshape(-1)
+            contagens = np.bincount(inverso, minlength=len(chaves))
+            quantidades = np.bincount(inverso, weights=vendas.quantidade, minlength=len(chaves))
+            valores = np.bincount(inverso, weights=vendas.valor, minlength=len(chaves))
+
+            # Resumo diário com as células do cubo, nos códigos do banco
+            cubo = CuboVendas.de_ledger(vendas)
+
+            with self._conexao:
+                self._conexao.execute("BEGIN IMMEDIATE")
+                if se_vazio and not self.vazio():
+                    # Os códigos atribuídos acima não valem para o banco de outro processo
+                    self._recarregar_codigos()
+                    return False
+                self._conexao.executemany(
+                    UPSERT_PRODUTO,
+                    [(self._codigos_produto[nome], nome, dados['preco'], dados['estoque'])
+                     for nome, dados in produtos.items()]
+                )
+                self._conexao.executemany(
+                    "INSERT OR IGNORE INTO filiais (codigo, nome) VALUES (?, ?)",
+                    [(codigo, nome) for nome, codigo in self._codigos_filial.items()]
+                )
+                self._conexao.executemany(
+                    "INSERT INTO vendas (dia, produto, filial, quantidade, valor) VALUES (?, ?, ?, ?, ?)",
+                    zip(vendas.dia.tolist(), codigos_produto.tolist(), codigos_filial.tolist(),
+                        vendas.quantidade.tolist(), vendas.valor.tolist())
+                )
+                self._conexao.executemany(
+                    UPSERT_RESUMO,
+                    zip(chaves[:, 0].tolist(), chaves[:, 1].tolist(), contagens.tolist(),
+                        quantidades.astype(np.int64).tolist(), valores.tolist())
+                )
+                if len(vendas):
+                    primeiro_id = self._ultimo_id() - len(vendas) + 1
+                    self._conexao.executemany(
+                        UPSERT_DIARIO,
+                        zip(cubo.coluna('dia').tolist(),
+                            mapa_filial[cubo.coluna('filial')].tolist(),
+                            mapa_produto[cubo.coluna('produto')].tolist(),
+                            *(cubo.coluna(nome).tolist() for nome in ('vendas', 'quantidade', 'valor',
+                                                                      'minimo', 'maximo')),
+                            (cubo.coluna('primeira') + primeiro_id).tolist(),
+                            cubo.coluna('abertura').tolist(),
+                            (cubo.coluna('ultima') + primeiro_id).tolist(),
+                            cubo.coluna('fechamento').tolist())
+                    )
+        return True
+
+    # Leitura
+    def _marcar_leitura(self):
+        (self.ultima_venda,) = self._conexao.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()
+        (self.ultima_alteracao,) = self._conexao.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM alteracoes_produto").fetchone()
+
+    def _ler_vendas(self, ledger, consulta, parametros):
+        cursor = self._conexao.execute(consulta, parametros)
+        while True:
+            linhas = cursor.fetchmany(LINHAS_POR_LEITURA)
+            if not linhas:
+                break
+            dias, produtos, filiais, quantidades, valores = zip(*linhas)
+            ledger.estender(dias, produtos, filiais, quantidades, valores)
+        return ledger
+
+    def _ledger_vazio(self, capacidade):
+        # O ledger recebe as categorias na ordem dos códigos do banco, de modo
+        # que os códigos lidos de `vendas` valem sem conversão
+        nomes_produtos = [nome for (nome,) in self._conexao.execute("SELECT nome FROM produtos ORDER BY codigo")]
+        nomes_filiais = [nome for (nome,) in self._conexao.execute("SELECT nome FROM filiais ORDER BY codigo")]
+        return LedgerVendas(nomes_produtos, nomes_filiais, capacidade=max(capacidade, 1))
+
+    def carregar(self, janela_dias=None, hoje=None, linhas=True):
+        """
+        Retorna (produtos, filiais, vendas, analytics, cubo).
+
+        Só as vendas dos últimos `janela_dias` dias entram no ledger; as
+        métricas acumuladas vêm do resumo mensal e o cubo do resumo diário,
+        ambos cobrindo todo o histórico. Tudo é lido numa única transação, e
+        `ultima_venda` e `ultima_alteracao` marcam até onde a leitura foi.
+        Com `linhas=False` o ledger vem só com os nomes de produtos e filiais.
+        """
+        self.descarregar()
+
+        with self._lock:
+            self._conexao.execute("BEGIN")
+            try:
+                produtos = {
+                    nome: {'preco': preco, 'estoque': estoque}
+                    for nome, preco, estoque in self._conexao.execute(
+                        "SELECT nome, preco, estoque FROM produtos ORDER BY codigo")
+                }
+                filiais = [nome for (nome,) in self._conexao.execute("SELECT nome FROM filiais ORDER BY codigo")]
+
+                if linhas:
+                    inicio = _inicio_janela(janela_dias, hoje)
+                    (total,) = self._conexao.execute(
+                        "SELECT COUNT(*) FROM vendas WHERE dia >= ?", (inicio,)).fetchone()
+                    vendas = self._ler_vendas(
+                        self._ledger_vazio(total),
+                        "SELECT dia, produto, filial, quantidade, valor FROM vendas WHERE dia >= ? ORDER BY id",
+                        (inicio,)
+                    )
+                else:
+                    vendas = self._ledger_vazio(0)
+
+                resumo = self._conexao.execute(
+                    "SELECT mes, produto, vendas, quantidade, valor FROM resumo_mensal").fetchall()
+                if resumo:
+                    meses, codigos, contagens, quantidades, valores = (np.array(coluna) for coluna in zip(*resumo))
+                    analytics = AnalyticsIncremental.de_resumo_mensal(meses, codigos, contagens, quantidades, valores)
+                else:
+                    analytics = AnalyticsIncremental()
+
+                # O cubo compartilha as listas de nomes do ledger (mesmos códigos)
+                celulas = self._conexao.execute(
+                    f"SELECT {', '.join(TIPOS_COLUNAS)} FROM resumo_diario ORDER BY dia, filial, produto").fetchall()
+                matriz = np.array(celulas, dtype=np.float64).reshape(-1, len(TIPOS_COLUNAS))
+                colunas = {nome: matriz[:, j].astype(tipo) for j, (nome, tipo) in enumerate(TIPOS_COLUNAS.items())}
+                cubo = CuboVendas.de_colunas(colunas, vendas.produtos, vendas.filiais)
+                self._marcar_leitura()
+            finally:
+                self._conexao.execute("COMMIT")
+        return produtos, filiais, vendas, analytics, cubo
+
+    def carregar_periodo(self, inicio, fim):
+        """Ledger com as vendas entre duas datas (inclusive), para consultas ao histórico"""
+        inicio, fim = dia_ordinal(inicio), dia_ordinal(fim)
+        (total,) = self._conexao.execute(
+            "SELECT COUNT(*) FROM vendas WHERE dia BETWEEN ? AND ?", (inicio, fim)).fetchone()
+        return self._ler_vendas(
+            self._ledger_vazio(total),
+            "SELECT dia, produto, filial, quantidade, valor FROM vendas WHERE dia BETWEEN ? AND ? ORDER BY id",
+            (inicio, fim)
+        )
+
+    def fechar(self):
+        """Grava o que estiver pendente e encerra a conexão"""
+        if self._fechado.is_set():
+            return
+        self._fechado.set()
+        self.descarregar()
+        self._conexao.close()
+
+
+class PersistenciaCompartilhada(PersistenciaSQLite):
+    """
+    Banco SQLite compartilhado por vários processos (ex.: workers do
+    Streamlit atrás de um balanceador), que é a fonte da verdade da loja.
+
+    Ao contrário da classe base nada fica em fila: as escritas são feitas
+    dentro de `transacao` (BEGIN IMMEDIATE, que serializa os processos), com
+    o estoque conferido no próprio banco, e os códigos de produtos e filiais
+    novos são decididos pelo banco. Cada transação marca os produtos que
+    alterou com um número de sequência, e `novidades` devolve o que qualquer
+    processo gravou desde a leitura anterior.
+    """
+
+    @contextmanager
+    def transacao(self):
+        """Transação de escrita; é confirmada ao sair do bloco sem exceção"""
+        with self._lock:
+            # Próximo código livre de cada tabela, contando os atribuídos nesta transação
+            self._proximos = {}
+            try:
+                with self._conexao:
+                    self._conexao.execute("BEGIN IMMEDIATE")
+                    yield
+            except BaseException:
+                # Códigos atribuídos na transação desfeita não valem
+                self._recarregar_codigos()
+                raise
+
+    def _codigo_banco(self, tabela, codigos, nome):
+        # Outro processo pode ter criado o nome ou usado o próximo código
+        codigo = codigos.get(nome)
+        if codigo is None:
+            linha = self._conexao.execute(f"SELECT codigo FROM {tabela} WHERE nome = ?", (nome,)).fetchone()
+            if linha is None:
+                (proximo,) = self._conexao.execute(f"SELECT COALESCE(MAX(codigo) + 1, 0) FROM {tabela}").fetchone()
+                linha = (max(proximo, self._proximos.get(tabela, 0)),)
+                self._proximos[tabela] = linha[0] + 1
+            codigo = codigos[nome] = linha[0]
+        return codigo
+
+    def _codigo_produto(self, nome):
+        return self._codigo_banco('produtos', self._codigos_produto, nome)
+
+    def _codigo_filial(self, nome):
+        return self._codigo_banco('filiais', self._codigos_filial, nome)
+
+    def _marcar_alterados(self, codigos):
+        (seq,) = self._conexao.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM alteracoes_produto").fetchone()
+        self._conexao.executemany(
+            "INSERT INTO alteracoes_produto (codigo, seq) VALUES (?, ?) "
+            "ON CONFLICT (codigo) DO UPDATE SET seq = excluded.seq",
+            [(codigo, seq) for codigo in codigos]
+        )
+
+    # Operações dentro de `transacao`
+    def catalogo(self, nomes=None):
+        """Preço e estoque atuais de `nomes` (ou de todos os produtos), lidos do banco"""
+        if nomes is None:
+            linhas = self._conexao.execute("SELECT nome, preco, estoque FROM produtos")
+        else:
+            nomes = list(nomes)
+            linhas = self._conexao.execute(
+                f"SELECT nome, preco, estoque FROM produtos WHERE nome IN ({', '.join('?' * len(nomes))})", nomes)
+        return {nome: {'preco': preco, 'estoque': estoque} for nome, preco, estoque in linhas}
+
+    def ajustar_estoques(self, nomes, deltas):
+        """Soma `deltas` ao estoque dos produtos `nomes`"""
+        nomes = list(nomes)
+        self._conexao.executemany("UPDATE produtos SET estoque = estoque + ? WHERE nome = ?",
+                                  zip(np.asarray(deltas).tolist(), nomes))
+        self._marcar_alterados([self._codigo_produto(nome) for nome in nomes])
+
+    def gravar_produtos(self, produtos):
+        """Insere ou atualiza produtos ({nome: (preco, estoque)})"""
+        self._gravar([], produtos)
+        self._marcar_alterados([self._codigo_produto(nome) for nome in produtos])
+
+    def gravar_vendas(self, dias, produtos, filiais, quantidades, valores):
+        self._gravar(list(zip(np.asarray(dias).tolist(), list(produtos), list(filiais),
+                              np.asarray(quantidades).tolist(), np.asarray(valores).tolist())), {})
+
+    # Leitura
+    def ler_ledger(self, produtos, filiais, janela_dias=None, hoje=None):
+        """
+        Ledger com as vendas dos últimos `janela_dias` dias até a última
+        lida por `carregar` ou `novidades`, com os nomes de produtos e
+        filiais na ordem dos códigos do banco
+        """
+        inicio = _inicio_janela(janela_dias, hoje)
+        with self._lock:
+            (total,) = self._conexao.execute(
+                "SELECT COUNT(*) FROM vendas WHERE dia >= ? AND id <= ?", (inicio, self.ultima_venda)).fetchone()
+            return self._ler_vendas(
+                LedgerVendas(produtos, filiais, capacidade=max(total, 1)),
+                "SELECT dia, produto, filial, quantidade, valor FROM vendas WHERE dia >= ? AND id <= ? ORDER BY id",
+                (inicio, self.ultima_venda)
+            )
+
+    def versao_dados(self):
+        """Muda sempre que outra conexão, deste ou de outro processo, confirma uma escrita"""
+        with self._lock:
+            return self._conexao.execute("PRAGMA data_version").fetchone()[0]
+
+    def novidades(self, n_produtos, n_filiais):
+        """
+        O que foi gravado desde a leitura anterior, numa leitura consistente:
+        (filiais novas, produtos alterados, vendas novas). Filiais e produtos
+        novos vêm na ordem dos códigos, a partir de `n_produtos` e
+        `n_filiais` (os já conhecidos); os produtos alterados são tuplas
+        (codigo, nome, preco, estoque) e as vendas, colunas (dia, produto,
+        filial, quantidade, valor) com os códigos do banco.
+        """
+        with self._lock:
+            self._conexao.execute("BEGIN")
+            try:
+                filiais = [nome for (nome,) in self._conexao.execute(
+                    "SELECT nome FROM filiais WHERE codigo >= ? ORDER BY codigo", (n_filiais,))]
+                # Duas consultas, para que cada uma use o próprio índice
+                produtos = dict.fromkeys(self._conexao.execute(
+                    "SELECT codigo, nome, preco, estoque FROM produtos WHERE codigo IN "
+                    "(SELECT codigo FROM alteracoes_produto WHERE seq > ?)", (self.ultima_alteracao,)))
+                produtos.update(dict.fromkeys(self._conexao.execute(
+                    "SELECT codigo, nome, preco, estoque FROM produtos WHERE codigo >= ?", (n_produtos,))))
+                linhas = self._conexao.execute(
+                    "SELECT dia, produto, filial, quantidade, valor FROM vendas WHERE id > ? ORDER BY id",
+                    (self.ultima_venda,)).fetchall()
+                self._marcar_leitura()
+            finally:
+                self._conexao.execute("COMMIT")
+        vendas = tuple(np.array(coluna) for coluna in zip(*linhas)) if linhas else None
+        return filiais, sorted(produtos), vendas
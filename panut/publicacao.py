@@ -0,0 +1,145 @@
+import json
+import os
+
+from panut.colunar import importar_pyarrow, ledger_do_lote, lote_vendas
+from panut.ledger import TIPOS_COLUNAS
+
+# Arquivo com a versão publicada mais recente, trocado com rename
+PONTEIRO = 'ATUAL'
+TRAVA = 'publicador.lock'
+
+# Versões mantidas no diretório, para um leitor que leu o ponteiro pouco
+# antes da troca; um arquivo já mapeado continua válido depois de apagado
+VERSOES_MANTIDAS = 2
+
+# Intervalo mínimo (s) entre publicações
+INTERVALO_PUBLICACAO = 2.0
+
+
+def _nome_arquivo(versao):
+    return f'vendas-{versao:012d}.arrow'
+
+
+def ler_ponteiro(diretorio):
+    """(versão, arquivo) publicados mais recentes, ou None se nada foi publicado"""
+    try:
+        with open(os.path.join(diretorio, PONTEIRO), encoding='utf-8') as arquivo:
+            ponteiro = json.load(arquivo)
+    except FileNotFoundError:
+        return None
+    return ponteiro['versao'], ponteiro['arquivo']
+
+
+def mapear_ledger(caminho):
+    """Ledger somente leitura cujas colunas são visões de um arquivo publicado, sem cópia"""
+    pa = importar_pyarrow()
+    return ledger_do_lote(pa.ipc.open_file(pa.memory_map(caminho)).get_batch(0))
+
+
+def para_dataframe(ledger):
+    """DataFrame com as colunas do ledger (produto e filial como códigos), sem copiar os arrays"""
+    import pandas as pd
+    return pd.DataFrame({nome: getattr(ledger, nome) for nome in TIPOS_COLUNAS}, copy=False)
+
+
+class PublicadorLedger:
+    """
+    Publica versões imutáveis do ledger em `diretorio`, no formato de
+    arquivo IPC do Arrow: um record batch sem compressão por arquivo, que
+    os leitores mapeiam em memória sem cópia (ver `LeitorLedger`). O
+    ponteiro `ATUAL` indica a versão mais recente e é trocado com rename,
+    então um leitor vê sempre uma versão completa.
+
+    Só um processo publica: o que obtém com `assumir` a trava exclusiva
+    (flock) de `publicador.lock`. O sistema libera a trava quando o
+    processo termina, e outro processo pode assumir.
+    """
+
+    def __init__(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.ativo = False
+        self.versao = 0
+        self._publicado = None
+        self._trava = open(os.path.join(diretorio, TRAVA), 'a+')
+
+    def assumir(self):
+        """Tenta se tornar o publicador do diretório; retorna se é o publicador"""
+        if not self.ativo:
+            import fcntl
+            try:
+                fcntl.flock(self._trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            self.ativo = True
+            ponteiro = ler_ponteiro(self.diretorio)
+            self.versao = ponteiro[0] if ponteiro is not None else 0
+        return True
+
+    def publicar(self, ledger):
+        """Grava `ledger` (congelado) como uma nova versão, se ele mudou desde a anterior; retorna se gravou"""
+        if not self.ativo:
+            raise ValueError("Só o processo que assumiu a publicação pode publicar")
+        # O ledger só cresce no fim: linhas e nomes bastam para saber se mudou
+        estado = (len(ledger), len(ledger.produtos), len(ledger.filiais))
+        if estado == self._publicado:
+            return False
+
+        pa = importar_pyarrow()
+        versao = self.versao + 1
+        nome = _nome_arquivo(versao)
+        lote = lote_vendas(ledger)
+        caminho = os.path.join(self.diretorio, nome)
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        with pa.OSFile(temporario, 'wb') as arquivo, pa.ipc.new_file(arquivo, lote.schema) as escritor:
+            escritor.write_batch(lote)
+        os.replace(temporario, caminho)
+
+        temporario = os.path.join(self.diretorio, f'{PONTEIRO}.{os.getpid()}.tmp')
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({'versao': versao, 'arquivo': nome}, arquivo)
+        os.replace(temporario, os.path.join(self.diretorio, PONTEIRO))
+        self.versao = versao
+        self._publicado = estado
+
+        for antiga in range(versao - VERSOES_MANTIDAS, 0, -1):
+            try:
+                os.remove(os.path.join(self.diretorio, _nome_arquivo(antiga)))
+            except FileNotFoundError:
+                break
+        return True
+
+    def fechar(self):
+        # Fechar o arquivo libera a trava
+        self._trava.close()
+        self.ativo = False
+
+
+class LeitorLedger:
+    """
+    Mapeia a versão mais recente publicada em `diretorio` como um
+    `LedgerVendas` somente leitura cujas colunas são visões do arquivo. As
+    páginas ficam no cache do sistema, compartilhadas por todos os processos
+    que leem a mesma versão, então cada leitor a mais custa quase nada de
+    memória. `atualizar` troca para uma versão mais nova; os ledgers já
+    entregues continuam válidos.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.versao = 0
+        self.ledger = None
+
+    def atualizar(self):
+        """Mapeia a versão publicada se ela for mais nova que a atual; retorna se trocou"""
+        while True:
+            ponteiro = ler_ponteiro(self.diretorio)
+            if ponteiro is None or ponteiro[0] <= self.versao:
+                return False
+            try:
+                self.ledger = mapear_ledger(os.path.join(self.diretorio, ponteiro[1]))
+            except FileNotFoundError:
+                # Apagada por publicações mais novas depois da leitura do ponteiro
+                continue
+            self.versao = ponteiro[0]
+            return True
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Pontos máximos da linha de faturamento após o LTTB
+MAX_PONTOS_LINHA = 2000
+
+# Períodos (dias, semanas ou meses) disponíveis antes do LTTB, como múltiplo
+# do limite de pontos: até ~16 anos a linha fica diária
+FATOR_PERIODOS_LINHA = 3
+
+# Velas máximas por filial no gráfico de candlestick
+MAX_VELAS = 200
+
+# Acima deste número de pontos os traços de linha usam WebGL
+LIMIAR_WEBGL = 1000
+
+SUFIXOS_BALDE = {'D': '', 'W': ' (semanal)', 'M': ' (mensal)'}
+
+# Produtos exibidos nos gráficos de estoque; com catálogos maiores ficam os
+# de maior estoque e o restante é somado
+MAX_PRODUTOS_GRAFICO = 50
+
+
+def inicio_do_balde(dias, balde):
+    """
+    Primeiro dia (ordinal) do período de cada dia: o próprio dia ('D'), a
+    segunda-feira da semana ('W') ou o dia 1 do mês ('M').
+    """
+    dias = np.asarray(dias, dtype=np.int64)
+    if balde == 'D':
+        return dias
+    if balde == 'W':
+        # 1970-01-05 (dia 4) foi uma segunda-feira
+        return dias - (dias - 4) % 7
+    if balde == 'M':
+        return dias.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    raise ValueError(f"Período inválido: {balde!r}")
+
+
+def escolher_balde(inicio, fim, max_pontos):
+    """Período mais fino ('D', 'W' ou 'M') com no máximo `max_pontos` pontos entre dois dias"""
+    dias = fim - inicio + 1
+    if dias <= max_pontos:
+        return 'D'
+    if dias / 7 <= max_pontos:
+        return 'W'
+    return 'M'
+
+
+def lttb(x, y, limite):
+    """
+    Largest-Triangle-Three-Buckets: reduz a série a `limite` pontos
+    preservando a forma visual (picos e vales). `x` pode ser numérico ou
+    datetime64; a série volta inalterada se já couber no limite.
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return x, y
+
+    xf = np.asarray(x)
+    if xf.dtype.kind == 'M':
+        xf = xf.astype(np.int64)
+    xf = xf.astype(np.float64)
+    yf = np.asarray(y, dtype=np.float64)
+
+    # Primeiro e último pontos ficam; o miolo é dividido em limite - 2 baldes
+    bordas = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    indices = np.empty(limite, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        if i + 2 < len(bordas):
+            cx, cy = xf[fim:bordas[i + 2]].mean(), yf[fim:bordas[i + 2]].mean()
+        else:
+            cx, cy = xf[-1], yf[-1]
+        areas = np.abs((xf[a] - cx) * (yf[inicio:fim] - yf[a]) - (xf[a] - xf[inicio:fim]) * (cy - yf[a]))
+        a = inicio + int(np.argmax(areas))
+        indices[i + 1] = a
+    return x[indices], y[indices]
+
+
+def serie_faturamento(cubo, inicio=None, fim=None, max_pontos=MAX_PONTOS_LINHA, filiais=None, produtos=None):
+    """
+    Faturamento do cubo com resolução adaptada ao intervalo: escolhe o
+    período pelo número de dias e aplica LTTB se ainda passar de
+    `max_pontos`. Retorna (datas, valores, balde).
+    """
+    intervalo = cubo.intervalo_dias(inicio, fim, filiais, produtos)
+    if intervalo is None:
+        return np.empty(0, dtype='datetime64[D]'), np.empty(0), 'D'
+    balde = escolher_balde(*intervalo, FATOR_PERIODOS_LINHA * max_pontos)
+    datas, valores = cubo.faturamento_por_periodo(balde, inicio, fim, filiais, produtos)
+    datas, valores = lttb(datas, valores, max_pontos)
+    return datas, valores, balde
+
+
+def ohlc_adaptativo(cubo, inicio=None, fim=None, max_velas=MAX_VELAS, filiais=None, produtos=None):
+    """OHLC por filial com até `max_velas` velas por filial. Retorna (ohlc, balde)"""
+    intervalo = cubo.intervalo_dias(inicio, fim, filiais, produtos)
+    balde = escolher_balde(*intervalo, max_velas) if intervalo is not None else 'D'
+    return cubo.ohlc_por_periodo_filial(balde, inicio, fim, filiais, produtos), balde
+
+
+def maiores_estoques(produtos, limite=MAX_PRODUTOS_GRAFICO):
+    """
+    Nomes e estoques dos `limite` produtos com mais estoque e a soma do
+    estoque dos demais. Catálogos dentro do limite voltam inteiros, na ordem
+    original.
+    """
+    nomes = list(produtos)
+    estoques = np.fromiter((produtos[nome]['estoque'] for nome in nomes), np.int64, len(nomes))
+    if len(nomes) <= limite:
+        return nomes, estoques, 0
+    maiores = np.argpartition(-estoques, limite)[:limite]
+    maiores = maiores[np.argsort(-estoques[maiores], kind='stable')]
+    return [nomes[i] for i in maiores.tolist()], estoques[maiores], int(estoques.sum() - estoques[maiores].sum())
+
+
+def modo_renderizacao(pontos):
+    """render_mode do Plotly Express para uma linha com `pontos` pontos"""
+    return 'webgl' if pontos > LIMIAR_WEBGL else 'auto'
@@ -0,0 +1,238 @@
+import json
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+import requests
+
+from panut.colunar import TIPO_ARROW, arrow_disponivel, ledger_do_lote, ler_arrow
+from panut.cubo import CuboVendas
+from panut.indice import IndiceFaturamento
+from panut.ledger import CAPACIDADE_INICIAL, LedgerVendas
+from panut.loja import SnapshotLoja
+
+# Tempo máximo (s) de cada chamada ao backend
+TIMEOUT_PADRAO = 10
+
+# Espera (s) antes de tentar de novo após uma falha: começa no intervalo de
+# revalidação (no mínimo 1 s) e dobra a cada falha seguida, até o máximo
+ESPERA_FALHA_MINIMA = 1
+ESPERA_FALHA_MAXIMA = 60
+
+ANALYTICS_VAZIO = {
+    'total_vendas': 0,
+    'faturamento_total': 0,
+    'produto_mais_vendido': "Sem dados",
+    'faturamento_fevereiro': 0
+}
+
+
+class ReplicaDados:
+    """
+    Cópia local dos dados do backend, mantida por um feed de mudanças.
+
+    A primeira sincronização baixa tudo de /api/dados e guarda o cursor
+    devolvido. As seguintes pedem a /api/alteracoes só o que mudou desde o
+    cursor (vendas novas, produtos alterados e analytics) e mesclam no ledger
+    local. Uma recarga completa só acontece quando o backend invalida o
+    cursor (HTTP 410), por exemplo após reiniciar.
+
+    A cada `intervalo` segundos o snapshot é revalidado com um GET
+    condicional (If-None-Match com o cursor), que custa um 304 sem corpo
+    quando nada mudou. Após uma escrita do próprio cliente,
+    `registrar_escrita` com a versão e a época devolvidas pelo backend
+    força a sincronização na leitura seguinte, sem esperar o intervalo, até
+    o snapshot alcançar a escrita ou vir de uma época posterior a ela.
+
+    Se a sincronização falha, as leituras seguintes recebem o erro sem
+    acessar o backend até passar a espera (ver `ESPERA_FALHA_MAXIMA`), em
+    vez de cada reexecução de cada sessão tentar de novo.
+
+    `sessao` pode ser uma `requests.Session` ou um `ClienteAPI`.
+
+    Com `arrow` (padrão: se o pyarrow estiver instalado), as vendas são
+    pedidas como stream IPC do Arrow e copiadas coluna a coluna para o
+    ledger local, sem passar por dicionários; se o backend responder em
+    JSON, a resposta é lida como antes.
+
+    Os leitores recebem um `SnapshotLoja` imutável, como na loja local.
+    """
+
+    def __init__(self, url_api, sessao=None, intervalo=5, timeout=TIMEOUT_PADRAO, arrow=None):
+        self.url_api = url_api.rstrip('/')
+        self.sessao = sessao if sessao is not None else requests.Session()
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.arrow = arrow_disponivel() if arrow is None else arrow
+        self._aceitar = {'Accept': f'{TIPO_ARROW}, application/json;q=0.5'} if self.arrow else {}
+        self.cursor = None
+        self.recargas_completas = 0
+
+        self._lock = threading.Lock()
+        self._produtos = {}
+        self._filiais = []
+        self._vendas = LedgerVendas()
+        self._cubo = CuboVendas.de_ledger(self._vendas)
+        self._indice = IndiceFaturamento.de_cubo(self._cubo)
+        self._analytics = ANALYTICS_VAZIO
+        self._ultima_sincronizacao = None
+        # (época, versão) da última escrita confirmada pelo backend, ou None
+        self._escrita_minima = None
+        self._falhas = 0
+        self._erro = None
+        self._proxima_tentativa = 0.0
+        self._publicar()
+
+    def snapshot(self, forcar=False):
+        """
+        Retorna o snapshot local, sincronizando antes se o intervalo expirou
+        ou se ele é mais antigo que uma escrita já confirmada pelo backend.
+        Levanta `requests.RequestException` se a sincronização falhar ou se
+        ainda estiver na espera após uma falha; `snapshot_atual` continua
+        devolvendo o último snapshot.
+        """
+        if forcar or self._desatualizado():
+            with self._lock:
+                # Sessões concorrentes esperam no lock: a primeira pode já ter sincronizado
+                if forcar or self._desatualizado():
+                    self._sincronizar(forcar)
+        return self._snapshot
+
+    def _desatualizado(self):
+        ultima = self._ultima_sincronizacao
+        return (ultima is None or self._antes_da_escrita(self._escrita_minima)
+                or time.monotonic() - ultima >= self.intervalo)
+
+    def _antes_da_escrita(self, escrita):
+        # Versões só se comparam dentro da mesma época do backend
+        if escrita is None:
+            return False
+        epoca, versao = escrita
+        return self._snapshot.epoca != epoca or self._snapshot.versao < versao
+
+    def registrar_escrita(self, versao, epoca):
+        """Informa a versão e a época devolvidas pelo backend após uma escrita deste cliente"""
+        escrita = self._escrita_minima
+        if escrita is None or escrita[0] != epoca or escrita[1] < versao:
+            self._escrita_minima = (epoca, versao)
+        # A escrita confirmada mostra que o backend voltou: a leitura seguinte não espera
+        self._proxima_tentativa = 0.0
+        # A escrita confirmada mostra que o backend voltou: a leitura seguinte não espera
+        self._proxima_tentativa = 0.0
+
+    def snapshot_atual(self):
+        """Último snapshot sincronizado, sem acessar o backend"""
+        return self._snapshot
+
+    def sincronizar(self):
+        """Aplica as mudanças do backend agora, mesmo na espera após uma falha"""
+        with self._lock:
+            return self._sincronizar(ignorar_espera=True)
+
+    def _sincronizar(self, ignorar_espera=False):
+        """Aplica as mudanças do backend; recarrega tudo se o cursor for inválido"""
+        espera = self._proxima_tentativa - time.monotonic()
+        if espera > 0 and not ignorar_espera:
+            raise requests.ConnectionError(f"Backend indisponível; nova tentativa em {espera:.1f} s") from self._erro
+        escrita = self._escrita_minima
+        try:
+            self._buscar()
+        except requests.RequestException as e:
+            self._falhas += 1
+            self._erro = e
+            self._proxima_tentativa = time.monotonic() + min(
+                ESPERA_FALHA_MAXIMA, max(self.intervalo, ESPERA_FALHA_MINIMA) * 2 ** (self._falhas - 1)
+            )
+            raise
+        self._falhas = 0
+        self._erro = None
+        self._proxima_tentativa = 0.0
+        if escrita is not None and self._escrita_minima is escrita and self._snapshot.epoca != escrita[0]:
+            # O backend reiniciou depois da escrita e o snapshot já é da época
+            # nova: a versão dela não vale mais como mínimo
+            self._escrita_minima = None
+        return self._snapshot
+
+    def _buscar(self):
+        """Uma ida ao backend: o feed de mudanças ou, sem cursor válido, a carga completa"""
+        mudou = True
+        if self.cursor is not None:
+            resposta = self.sessao.get(
+                f'{self.url_api}/api/alteracoes',
+                params={'cursor': self.cursor},
+                headers={'If-None-Match': f'"{self.cursor}"', **self._aceitar},
+                timeout=self.timeout
+            )
+            if resposta.status_code == 304:
+                mudou = False
+            elif resposta.status_code == 410:
+                self.cursor = None
+            else:
+                resposta.raise_for_status()
+                self._aplicar(self._ler(resposta))
+
+        if self.cursor is None:
+            resposta = self.sessao.get(f'{self.url_api}/api/dados', headers=self._aceitar, timeout=self.timeout)
+            resposta.raise_for_status()
+            self._recarregar(self._ler(resposta))
+
+        if mudou:
+            self._publicar()
+        self._ultima_sincronizacao = time.monotonic()
+
+    @staticmethod
+    def _ler(resposta):
+        """Corpo da resposta como dicionário; em Arrow, `vendas` é um ledger somente leitura"""
+        if resposta.headers.get('Content-Type', '').startswith(TIPO_ARROW):
+            lote = ler_arrow(resposta.content)
+            dados = json.loads(lote.schema.metadata[b'dados'])
+            dados['vendas'] = ledger_do_lote(lote)
+            return dados
+        return resposta.json()
+
+    def _estender(self, vendas):
+        """Acrescenta as vendas de um ledger do backend, convertendo os códigos para os do ledger local"""
+        if isinstance(vendas, LedgerVendas):
+            produtos = np.array([self._vendas.codigo_produto(nome) for nome in vendas.produtos], dtype=np.int32)
+            filiais = np.array([self._vendas.codigo_filial(nome) for nome in vendas.filiais], dtype=np.int16)
+            return self._vendas.estender(vendas.dia, produtos[vendas.produto], filiais[vendas.filial],
+                                         vendas.quantidade, vendas.valor)
+        return self._vendas.estender_registros(vendas)
+
+    def _recarregar(self, dados):
+        self._produtos = dict(dados['produtos'])
+        self._filiais = list(dados['filiais'])
+        self._vendas = LedgerVendas(self._produtos, self._filiais,
+                                    capacidade=max(len(dados['vendas']), CAPACIDADE_INICIAL))
+        self._estender(dados['vendas'])
+        self._cubo = CuboVendas.de_ledger(self._vendas)
+        self._indice = IndiceFaturamento.de_cubo(self._cubo)
+        self._analytics = dados['analytics']
+        self.cursor = dados['cursor']
+        self.recargas_completas += 1
+
+    def _aplicar(self, alteracoes):
+        self._produtos.update(alteracoes['produtos'])
+        self._filiais = list(alteracoes['filiais'])
+        linhas = len(self._vendas)
+        self._estender(alteracoes['vendas'])
+        self._cubo.registrar_ledger(self._vendas, linhas)
+        self._indice.registrar_ledger(self._vendas, linhas)
+        self._analytics = alteracoes['analytics']
+        self.cursor = alteracoes['cursor']
+
+    def _publicar(self):
+        epoca, versao = self.cursor.split(':')[:2] if self.cursor else ('', 0)
+        self._snapshot = SnapshotLoja(
+            versao=int(versao),
+            produtos=MappingProxyType({
+                nome: MappingProxyType(dict(dados)) for nome, dados in self._produtos.items()
+            }),
+            filiais=tuple(self._filiais),
+            vendas=self._vendas.congelar(),
+            analytics=self._analytics,
+            cubo=self._cubo.congelar(),
+            indice=self._indice.congelar(),
+            epoca=epoca
+        )
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from panut.importacao import COLUNAS_VENDAS
+from panut.ledger import LedgerVendas, data_texto, dia_ordinal
+
+VENDAS_POR_BLOCO = 1_000_000
+
+# Último dia padrão das vendas geradas: fixo, para que a mesma semente gere
+# os mesmos dados em qualquer dia
+FIM_PADRAO = '2025-12-31'
+
+# Dia do ano com mais vendas quando há sazonalidade (início de dezembro)
+PICO_PADRAO = 335
+
+
+def _acumuladas(pesos, n):
+    """Probabilidades acumuladas de n categorias (uniformes sem `pesos`)"""
+    pesos = np.ones(n) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    if len(pesos) != n or (pesos < 0).any() or not pesos.sum() > 0:
+        raise ValueError("Os pesos devem ter um valor não negativo por categoria")
+    acumuladas = np.cumsum(pesos / pesos.sum())
+    acumuladas[-1] = 1.0
+    return acumuladas
+
+
+def pesos_dias(inicio, dias, sazonalidade=0.0, pico=PICO_PADRAO, pesos_semana=None):
+    """
+    Peso relativo de cada um dos `dias` a partir do dia ordinal `inicio`:
+    uma onda anual de amplitude `sazonalidade` (0 a 1) com máximo no dia do
+    ano `pico` e, opcionalmente, um peso por dia da semana (segunda a domingo).
+    """
+    ordinais = np.arange(inicio, inicio + dias)
+    pesos = np.ones(dias)
+    if sazonalidade:
+        datas = ordinais.astype('datetime64[D]')
+        dia_do_ano = (datas - datas.astype('datetime64[Y]')).astype(np.int64)
+        pesos *= 1 + sazonalidade * np.cos(2 * np.pi * (dia_do_ano - pico) / 365.25)
+    if pesos_semana is not None:
+        # O dia ordinal 0 (1970-01-01) foi uma quinta-feira
+        pesos *= np.asarray(pesos_semana, dtype=np.float64)[(ordinais + 3) % 7]
+    return pesos
+
+
+def blocos_vendas(n, produtos, filiais, semente=None, pesos_produtos=None, pesos_filiais=None, fim=FIM_PADRAO,
+                  dias=365, sazonalidade=0.0, pico=PICO_PADRAO, pesos_semana=None, quantidade_maxima=9,
+                  vendas_por_bloco=VENDAS_POR_BLOCO):
+    """
+    Gera n vendas sintéticas em blocos de até `vendas_por_bloco`, em ordem de
+    data, com memória proporcional ao bloco.
+
+    Cada bloco é um dicionário de arrays: 'dia' (ordinal), 'produto' e
+    'filial' (índices em `produtos` e `filiais`) e 'quantidade' (1 a
+    `quantidade_maxima`). As vendas cobrem os `dias` dias até `fim`. Com a
+    mesma `semente` e os mesmos parâmetros o resultado é sempre igual, qualquer
+    que seja `vendas_por_bloco`: cada coluna tem seu próprio gerador e consome
+    um número por venda.
+    """
+    semente = np.random.SeedSequence(semente)
+    gerador_dias, gerador_produtos, gerador_filiais, gerador_quantidades = (
+        np.random.Generator(np.random.PCG64(filha)) for filha in semente.spawn(4)
+    )
+    acumuladas_produtos = _acumuladas(pesos_produtos, len(produtos))
+    acumuladas_filiais = _acumuladas(pesos_filiais, len(filiais))
+
+    inicio = dia_ordinal(fim) - dias + 1
+    pesos = pesos_dias(inicio, dias, sazonalidade, pico, pesos_semana)
+    # As vendas de cada dia são sorteadas de uma vez; os blocos percorrem os dias em ordem
+    vendas_ate_dia = np.cumsum(gerador_dias.multinomial(n, pesos / pesos.sum()))
+
+    for primeira in range(0, n, vendas_por_bloco):
+        posicoes = np.arange(primeira, min(primeira + vendas_por_bloco, n))
+        k = len(posicoes)
+        yield {
+            'dia': (inicio + np.searchsorted(vendas_ate_dia, posicoes, side='right')).astype(np.int32),
+            'produto': np.searchsorted(acumuladas_produtos, gerador_produtos.random(k), side='right').astype(np.int32),
+            'filial': np.searchsorted(acumuladas_filiais, gerador_filiais.random(k), side='right').astype(np.int32),
+            'quantidade': (gerador_quantidades.random(k) * quantidade_maxima).astype(np.int64) + 1
+        }
+
+
+def ledger_sintetico(n, produtos, filiais, **opcoes):
+    """`LedgerVendas` com n vendas de `blocos_vendas`; `produtos` no formato da loja (com preço)"""
+    ledger = LedgerVendas(produtos, filiais, capacidade=max(n, 1))
+    precos = np.array([dados['preco'] for dados in produtos.values()], dtype=np.float64)
+    for bloco in blocos_vendas(n, list(produtos), list(filiais), **opcoes):
+        ledger.estender(bloco['dia'], bloco['produto'], bloco['filial'], bloco['quantidade'],
+                        precos[bloco['produto']] * bloco['quantidade'])
+    return ledger
+
+
+def _gravar_csv(caminho, blocos, inicio, datas, produtos, filiais):
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        arquivo.write(','.join(COLUNAS_VENDAS) + '\n')
+        for bloco in blocos:
+            # Categorias evitam criar uma string por venda para data, produto e filial
+            pd.DataFrame({
+                'data': pd.Categorical.from_codes(bloco['dia'] - inicio, categories=datas),
+                'produto': pd.Categorical.from_codes(bloco['produto'], categories=produtos),
+                'filial': pd.Categorical.from_codes(bloco['filial'], categories=filiais),
+                'quantidade': bloco['quantidade']
+            }).to_csv(arquivo, header=False, index=False)
+
+
+def _gravar_parquet(caminho, blocos, produtos, filiais):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Gravação de Parquet requer o pacote pyarrow")
+    esquema = pa.schema([('data', pa.date32()), ('produto', pa.dictionary(pa.int32(), pa.string())),
+                         ('filial', pa.dictionary(pa.int32(), pa.string())), ('quantidade', pa.int64())])
+    with pq.ParquetWriter(caminho, esquema) as escritor:
+        for bloco in blocos:
+            escritor.write_table(pa.Table.from_arrays([
+                pa.array(bloco['dia']).cast(pa.date32()),
+                pa.DictionaryArray.from_arrays(bloco['produto'], produtos),
+                pa.DictionaryArray.from_arrays(bloco['filial'], filiais),
+                pa.array(bloco['quantidade'])
+            ], schema=esquema))
+
+
+def salvar_vendas(caminho, n, produtos, filiais, **opcoes):
+    """
+    Grava n vendas de `blocos_vendas` em CSV ou Parquet (pela extensão),
+    bloco a bloco, com as colunas aceitas pela importação de vendas (data,
+    produto, filial, quantidade). Parquet requer o pacote pyarrow.
+    """
+    produtos, filiais = list(produtos), list(filiais)
+    blocos = blocos_vendas(n, produtos, filiais, **opcoes)
+    if str(caminho).lower().endswith('.parquet'):
+        _gravar_parquet(caminho, blocos, produtos, filiais)
+    else:
+        fim = dia_ordinal(opcoes.get('fim', FIM_PADRAO))
+        inicio = fim - opcoes.get('dias', 365) + 1
+        _gravar_csv(caminho, blocos, inicio, [data_texto(dia) for dia in range(inicio, fim + 1)], produtos, filiais)
@@ -0,0 +1,92 @@
+import io
+
+import numpy as np
+
+from panut import LojaDados
+from panut.analytics import FEVEREIRO, AnalyticsIncremental
+from panut.dados_iniciais import FILIAIS_INICIAIS, PRODUTOS_INICIAIS
+from panut.importacao import preparar_vendas
+from panut.ledger import LedgerVendas
+from panut.sintetico import ledger_sintetico
+
+
+def produtos_iniciais():
+    return {nome: dict(dados) for nome, dados in PRODUTOS_INICIAIS.items()}
+
+
+def vendas_misturadas():
+    """Ledger e agregados alimentados por vendas avulsas (`registrar`) e lotes (`registrar_ledger`)"""
+    produtos = produtos_iniciais()
+    ledger = LedgerVendas(produtos, FILIAIS_INICIAIS)
+    analytics = AnalyticsIncremental()
+
+    def vender(data, produto, filial, quantidade):
+        i = ledger.adicionar(data, produto, filial, quantidade, produtos[produto]['preco'] * quantidade)
+        analytics.registrar(ledger.dia[i], ledger.produto[i], quantidade, ledger.valor[i])
+
+    vender('2024-01-31', 'Graxas', 'Brasil', 3)
+    vender('2024-02-01', 'Óleos', 'EUA', 1)
+
+    # Lote sintético cobrindo vários meses, incluindo fevereiro
+    sintetico = ledger_sintetico(500, produtos, FILIAIS_INICIAIS, semente=1, fim=np.datetime64('2024-03-15'),
+                                 dias=120)
+    inicio = ledger.estender(sintetico.dia, sintetico.produto, sintetico.filial, sintetico.quantidade,
+                             sintetico.valor)
+    analytics.registrar_ledger(ledger, inicio)
+
+    # Produtos novos com códigos além da capacidade inicial dos agregados
+    for k in range(20):
+        produtos[f'Produto {k}'] = {'preco': 10.0 + k, 'estoque': 100}
+        vender('2024-03-16', f'Produto {k}', 'Alemanha', k + 1)
+    vender('2023-12-24', 'Pastas', 'Brasil', 2)
+
+    # Lote vazio não altera nada
+    analytics.registrar_ledger(ledger, len(ledger))
+    return ledger, analytics
+
+
+def test_registrar_e_registrar_ledger_batem_com_recalculo():
+    ledger, analytics = vendas_misturadas()
+    assert analytics.verificar(ledger) == []
+    assert analytics.total_vendas == len(ledger)
+
+
+def test_loja_mantem_agregados_consistentes():
+    loja = LojaDados(produtos_iniciais(), FILIAIS_INICIAIS)
+    assert loja.adicionar_venda('2024-02-10', 'Graxas', 'Brasil', 5)[0]
+    csv = "data,produto,filial,quantidade\n2024-02-11,Pastas,EUA,2\n2024-03-01,Graxas,Alemanha,7\n"
+    snapshot = loja.snapshot()
+    lote = preparar_vendas(io.StringIO(csv), snapshot.produtos, snapshot.filiais, 'vendas.csv')
+    assert loja.importar_vendas(lote)[0]
+    assert loja.adicionar_venda('2024-03-02', 'Óleos', 'Brasil', 1)[0]
+
+    assert loja._analytics.verificar(loja._vendas) == []
+
+
+def test_agregados_vazios_batem_com_ledger_vazio():
+    assert AnalyticsIncremental().verificar(LedgerVendas(PRODUTOS_INICIAIS, FILIAIS_INICIAIS)) == []
+
+
+def test_verificar_aponta_corrupcao():
+    ledger, analytics = vendas_misturadas()
+    analytics.faturamento_total += 1.0
+    analytics.quantidade_por_produto[1] += 1
+    analytics.faturamento_por_mes[(2024 - 1970) * 12 + 1] += 50.0
+    analytics.faturamento_mes_calendario[FEVEREIRO] += 50.0
+
+    divergencias = analytics.verificar(ledger)
+    assert any(d.startswith('faturamento_total') for d in divergencias)
+    assert "quantidade_por_produto difere do ledger" in divergencias
+    assert f"faturamento do mês {(2024 - 1970) * 12 + 1} difere do ledger" in divergencias
+    assert "faturamento_mes_calendario difere do ledger" in divergencias
+
+
+def test_verificar_aponta_venda_nao_registrada():
+    ledger, analytics = vendas_misturadas()
+    # Venda gravada no ledger sem passar pelos agregados
+    ledger.adicionar('2024-03-20', 'Graxas', 'Brasil', 1000, 50_000.0)
+
+    divergencias = analytics.verificar(ledger)
+    assert any(d.startswith('total_vendas') for d in divergencias)
+    assert any(d.startswith('produto_lider') for d in divergencias)
+
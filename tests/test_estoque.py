@@ -0,0 +1,201 @@
+import io
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from panut import LojaDados
+from panut.dados_iniciais import FILIAIS_INICIAIS, PRODUTOS_INICIAIS
+from panut.importacao import preparar_vendas
+from panut.loja import abrir_loja
+
+PRODUTO = 'Graxas'
+HOJE = str(np.datetime64('today', 'D'))
+
+
+def nova_loja(estoque):
+    produtos = {nome: dict(dados) for nome, dados in PRODUTOS_INICIAIS.items()}
+    produtos[PRODUTO]['estoque'] = estoque
+    return LojaDados(produtos, FILIAIS_INICIAIS)
+
+
+@pytest.fixture
+def trocas_frequentes():
+    # Trocas de thread frequentes expõem janelas entre a conferência e o desconto
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(intervalo)
+
+
+def em_paralelo(n_threads, alvo):
+    """Roda `alvo(i)` em n threads liberadas ao mesmo tempo; retorna os resultados"""
+    barreira = threading.Barrier(n_threads)
+    resultados = [None] * n_threads
+
+    def rodar(i):
+        barreira.wait()
+        resultados[i] = alvo(i)
+
+    threads = [threading.Thread(target=rodar, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def estoque(loja):
+    return loja.snapshot().produtos[PRODUTO]['estoque']
+
+
+@pytest.mark.parametrize('n_threads', [4, 16])
+def test_reservas_simultaneas_nao_passam_do_estoque(trocas_frequentes, n_threads):
+    loja = nova_loja(300)
+
+    def reservar(i):
+        reservado = 0
+        while loja.reservar_estoque(PRODUTO, 1 + i % 3) is None:
+            reservado += 1 + i % 3
+        return reservado
+
+    reservado = sum(em_paralelo(n_threads, reservar))
+    assert reservado <= 300
+    assert estoque(loja) == 300 - reservado
+    # A thread 0 reserva de 1 em 1 até esgotar
+    assert estoque(loja) == 0
+
+
+def test_devolucoes_simultaneas_recompoem_o_estoque(trocas_frequentes):
+    loja = nova_loja(100)
+
+    def reservar_e_devolver(i):
+        for _ in range(200):
+            if loja.reservar_estoque(PRODUTO, 2) is None:
+                assert estoque(loja) >= 0
+                loja.devolver_estoque(PRODUTO, 2)
+        return True
+
+    assert all(em_paralelo(8, reservar_e_devolver))
+    assert estoque(loja) == 100
+
+
+def test_reserva_de_produto_inexistente():
+    assert nova_loja(10).reservar_estoque('Inexistente', 1) == "❌ Produto não encontrado"
+
+
+def test_venda_com_erro_devolve_a_reserva(monkeypatch):
+    loja = nova_loja(10)
+
+    def falhar(*args):
+        raise RuntimeError("falha ao gravar")
+
+    monkeypatch.setattr(loja._vendas, 'adicionar', falhar)
+    with pytest.raises(RuntimeError):
+        loja.adicionar_venda(HOJE, PRODUTO, 'Brasil', 4)
+    assert estoque(loja) == 10
+
+
+
+def falhar_uma_vez(monkeypatch, objeto, metodo, erro, depois=False):
+    """Faz `objeto.metodo` levantar `erro` na próxima chamada (`depois` de executá-lo, se pedido)"""
+    original = getattr(objeto, metodo)
+
+    def falhar(*args, **kwargs):
+        monkeypatch.setattr(objeto, metodo, original)
+        if depois:
+            original(*args, **kwargs)
+        raise erro
+
+    monkeypatch.setattr(objeto, metodo, falhar)
+
+
+@pytest.mark.parametrize('onde', ['banco', 'salvar_produto', 'eventos', 'publicar'])
+def test_venda_com_erro_depois_do_ledger_mantem_o_desconto(tmp_path, monkeypatch, onde):
+    loja = abrir_loja(str(tmp_path / 'panut.db'), diretorio_eventos=str(tmp_path / 'eventos'))
+    inicial = estoque(loja)
+    # Cada venda tenta ir direto para o banco
+    loja._persistencia.lote = 1
+    alvos = {
+        'banco': (loja._persistencia, '_gravar', sqlite3.OperationalError("database is locked")),
+        'salvar_produto': (loja._persistencia, 'salvar_produto', sqlite3.OperationalError("database is locked")),
+        'eventos': (loja._eventos, 'registrar', OSError("disco cheio")),
+        'publicar': (loja, '_publicar', RuntimeError("falha ao publicar"), True),
+    }
+    falhar_uma_vez(monkeypatch, *alvos[onde])
+    with pytest.raises(Exception, match=str(alvos[onde][2])):
+        loja.adicionar_venda(HOJE, PRODUTO, 'Brasil', 4)
+
+    # A venda ficou no ledger, então o estoque continua descontado
+    snapshot = loja.snapshot()
+    codigo = snapshot.vendas.produtos.index(PRODUTO)
+    assert snapshot.produtos[PRODUTO]['estoque'] == inicial - 4
+    assert snapshot.vendas.dia[-1] == np.datetime64(HOJE).astype(int) and snapshot.vendas.quantidade[-1] == 4
+    assert snapshot.cubo.quantidade_por_produto()[codigo] == snapshot.vendas.quantidade[
+        snapshot.vendas.produto == codigo].sum()
+    if onde != 'eventos':
+        assert loja._eventos.estado()[PRODUTO]['estoque'] == inicial - 4
+
+    # Depois da falha, banco e log voltam a bater com a memória
+    assert loja.adicionar_venda(HOJE, PRODUTO, 'Brasil', 1)[0]
+    loja._persistencia.fechar()
+    reaberta = abrir_loja(str(tmp_path / 'panut.db')).snapshot()
+    assert reaberta.produtos[PRODUTO]['estoque'] == inicial - 5
+    assert len(reaberta.vendas) == len(snapshot.vendas) + 1
+
+@pytest.mark.parametrize('n_threads', [4, 16])
+def test_vendas_reposicoes_e_importacoes_simultaneas(trocas_frequentes, n_threads):
+    """
+    Esgota o estoque com `n_threads` vendedores enquanto outras threads fazem
+    reposições e importações, e confere que o estoque final fecha com o
+    vendido, nunca fica negativo e bate com o ledger e o cubo.
+    """
+    inicial = 500
+    loja = nova_loja(inicial)
+    linhas = [f"{HOJE},{PRODUTO if k % 2 else 'Pastas'},{FILIAIS_INICIAIS[k % 3]},{1 + k % 4}" for k in range(20)]
+    csv = ("data,produto,filial,quantidade\n" + "\n".join(linhas) + "\n").encode()
+    reposto = [0]
+    importado = [0]
+
+    def vender(i):
+        rng = np.random.default_rng(i)
+        vendido = 0
+        while True:
+            quantidade = int(rng.integers(1, 4))
+            sucesso, _ = loja.adicionar_venda(HOJE, PRODUTO, FILIAIS_INICIAIS[i % 3], quantidade)
+            if sucesso:
+                vendido += quantidade
+            elif estoque(loja) == 0 or quantidade == 1:
+                return vendido
+
+    def repor():
+        for _ in range(30):
+            sucesso, _ = loja.gerenciar_produto(PRODUTO, PRODUTOS_INICIAIS[PRODUTO]['preco'], 3, atualizar=True)
+            reposto[0] += 3 * sucesso
+            time.sleep(0.0005)
+
+    def importar():
+        for _ in range(5):
+            lote = preparar_vendas(io.BytesIO(csv), loja.snapshot().produtos, FILIAIS_INICIAIS, 'vendas.csv')
+            sucesso, _, _ = loja.importar_vendas(lote)
+            if sucesso:
+                importado[0] += int(lote.quantidades[lote.produtos == PRODUTO].sum())
+
+    extras = [threading.Thread(target=repor), threading.Thread(target=importar)]
+    for thread in extras:
+        thread.start()
+    vendido = sum(em_paralelo(n_threads, vender))
+    for thread in extras:
+        thread.join()
+
+    snapshot = loja.snapshot()
+    final = snapshot.produtos[PRODUTO]['estoque']
+    codigo = snapshot.vendas.produtos.index(PRODUTO)
+    no_ledger = int(snapshot.vendas.quantidade[snapshot.vendas.produto == codigo].sum())
+    assert final >= 0
+    assert inicial + reposto[0] - vendido - importado[0] == final
+    assert no_ledger == vendido + importado[0]
+    assert snapshot.cubo.quantidade_por_produto()[snapshot.cubo.produtos.index(PRODUTO)] == no_ledger
@@ -0,0 +1,58 @@
+import os
+import re
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from panut.figuras import VERSOES_API_INTERNA, api_interna_disponivel
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def versao_fixada():
+    with open(os.path.join(RAIZ, 'requirements.txt'), encoding='utf-8') as arquivo:
+        versao = re.search(r'^streamlit==(\d+)\.(\d+)', arquivo.read(), re.MULTILINE)
+    return int(versao[1]), int(versao[2])
+
+
+def test_versao_fixada_foi_conferida():
+    assert versao_fixada() in VERSOES_API_INTERNA, (
+        "requirements.txt fixa uma versão do Streamlit em que exibir_figura não foi conferida: "
+        "rode tests/test_figuras.py com ela e inclua-a em VERSOES_API_INTERNA"
+    )
+
+
+def test_versao_instalada_foi_conferida():
+    # Sem isso os testes abaixo passariam pelo caminho lento sem acusar nada
+    assert api_interna_disponivel(), f"Streamlit {st.__version__} instalado não está em VERSOES_API_INTERNA"
+
+
+def app_figuras():
+    import plotly.graph_objects as go
+    import plotly.io
+    import streamlit as st
+
+    from panut.figuras import exibir_figura
+
+    figura = go.Figure(go.Bar(x=['a', 'b'], y=[1, 2]))
+    spec = plotly.io.to_json(figura, validate=False)
+    for largura in (True, False):
+        st.plotly_chart(figura, use_container_width=largura)
+        exibir_figura(spec, use_container_width=largura)
+
+
+@pytest.mark.skipif(not api_interna_disponivel(), reason="versão do Streamlit não conferida")
+def test_exibir_figura_envia_o_mesmo_que_plotly_chart():
+    app = AppTest.from_function(app_figuras).run()
+    assert not app.exception
+    graficos = [elemento.proto for elemento in app.get('plotly_chart')]
+    assert len(graficos) == 4
+
+    for publico, interno in zip(graficos[::2], graficos[1::2]):
+        # Só `st.plotly_chart` gera id: o segundo veio mesmo pela API interna
+        assert publico.id and not interno.id
+        for campo in ('spec', 'config', 'theme', 'use_container_width'):
+            assert getattr(interno, campo) == getattr(publico, campo), campo
+        assert not interno.HasField('figure')
+
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from panut.cubo import CuboVendas
+from panut.indice import IndiceFaturamento
+from panut.ledger import LedgerVendas, data_texto
+
+FILIAIS = ['Brasil', 'Alemanha', 'EUA']
+PRODUTOS = ['Graxas', 'Pastas', 'Óleos']
+
+
+def consultas(indice, ledger):
+    """Faturamento de vários períodos, no total, por filial e por produto"""
+    if not len(ledger):
+        return []
+    primeiro, ultimo = int(ledger.dia.min()) - 2, int(ledger.dia.max()) + 2
+    periodos = [(primeiro, ultimo), (primeiro, primeiro + 5), (ultimo - 3, ultimo), (primeiro + 4, ultimo - 4)]
+    resultado = []
+    for inicio, fim in periodos:
+        inicio, fim = data_texto(inicio), data_texto(fim)
+        resultado.append(indice.faturamento(inicio, fim))
+        resultado.extend(indice.faturamento(inicio, fim, filial=codigo) for codigo in range(len(indice.filiais)))
+        resultado.extend(indice.faturamento(inicio, fim, produto=codigo) for codigo in range(len(indice.produtos)))
+        resultado.append(indice.faturamento_por_filial(inicio, fim))
+        resultado.append(indice.faturamento_por_produto(inicio, fim))
+    return resultado
+
+
+def recalculado(ledger):
+    return IndiceFaturamento.de_cubo(CuboVendas.de_ledger(ledger))
+
+
+def vender(ledger, indice, data, produto, filial, valor):
+    i = ledger.adicionar(data, produto, filial, 1, valor)
+    indice.registrar(ledger.dia[i], ledger.filial[i], ledger.produto[i], valor)
+
+
+@pytest.fixture
+def base():
+    ledger = LedgerVendas(PRODUTOS, FILIAIS)
+    indice = IndiceFaturamento(ledger.filiais, ledger.produtos)
+    for k in range(30):
+        vender(ledger, indice, data_texto(19_700 + k), PRODUTOS[k % 3], FILIAIS[k % 2], 10.0 + k)
+    return ledger, indice
+
+
+# Escritas depois do congelamento: mesmo dia, dia novo, retroativa, antes do
+# primeiro dia, produto novo e em lote
+ESCRITAS = {
+    'ultimo_dia': lambda ledger, indice: vender(ledger, indice, data_texto(19_729), 'Graxas', 'EUA', 7.0),
+    'dia_novo': lambda ledger, indice: vender(ledger, indice, data_texto(19_800), 'Pastas', 'Brasil', 3.0),
+    'retroativa': lambda ledger, indice: vender(ledger, indice, data_texto(19_705), 'Óleos', 'Alemanha', 5.0),
+    'antes_do_inicio': lambda ledger, indice: vender(ledger, indice, data_texto(19_650), 'Graxas', 'Brasil', 2.0),
+    'produto_novo': lambda ledger, indice: vender(ledger, indice, data_texto(19_729), 'Novo', 'Japão', 11.0),
+    'lote': lambda ledger, indice: indice.registrar_ledger(
+        ledger, ledger.estender([19_710, 19_729, 19_731], [0, 1, 2], [2, 1, 0], [1, 1, 1], [1.0, 2.0, 4.0])
+    ),
+}
+
+
+@pytest.mark.parametrize('escrita', ESCRITAS)
+def test_congelado_nao_muda_com_escritas_posteriores(base, escrita):
+    ledger, indice = base
+    congelado = indice.congelar()
+    esperado = consultas(congelado, ledger)
+    assert esperado == consultas(recalculado(ledger), ledger)
+
+    ESCRITAS[escrita](ledger, indice)
+    ESCRITAS['ultimo_dia'](ledger, indice)
+    assert consultas(congelado, ledger.fatia(0, 30)) == esperado
+    assert consultas(indice, ledger) == pytest.approx(consultas(recalculado(ledger), ledger))
+
+
+def test_congelar_compartilha_as_linhas_fechadas(base):
+    ledger, indice = base
+    congelado = indice.congelar()
+    assert np.shares_memory(congelado._por_produto, indice._por_produto)
+    assert not congelado._por_produto.flags.writeable
+
+    # Vendas do último dia não copiam os acumulados
+    acumulado = indice._por_produto
+    ESCRITAS['ultimo_dia'](ledger, indice)
+    assert indice._por_produto is acumulado
+
+    # A retroativa copia antes de alterar linhas compartilhadas
+    ESCRITAS['retroativa'](ledger, indice)
+    assert not np.shares_memory(congelado._por_produto, indice._por_produto)
+
+
+def test_congelado_e_somente_leitura(base):
+    _, indice = base
+    with pytest.raises(ValueError):
+        indice.congelar().registrar(19_700, 0, 0, 1.0)
+
+
+def test_congelar_indice_vazio():
+    ledger = LedgerVendas(PRODUTOS, FILIAIS)
+    congelado = IndiceFaturamento(ledger.filiais, ledger.produtos).congelar()
+    assert congelado.faturamento('2024-01-01', '2024-12-31') == 0.0
+    assert congelado.faturamento_por_filial('2024-01-01', '2024-12-31') == dict.fromkeys(FILIAIS, 0.0)
@@ -0,0 +1,134 @@
+import io
+import sqlite3
+
+import numpy as np
+import pytest
+
+from panut import PersistenciaSQLite
+from panut.importacao import preparar_produtos, preparar_vendas
+from panut.loja import abrir_loja
+
+HOJE = str(np.datetime64('today', 'D'))
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / 'panut.db')
+
+
+def reabrir(caminho):
+    loja = abrir_loja(caminho)
+    loja._persistencia.fechar()
+    return loja.snapshot()
+
+
+def test_produto_recusado_nao_deixa_buraco_nos_codigos(caminho):
+    loja = abrir_loja(caminho)
+    persistencia = loja._persistencia
+    # Preço que o banco recusa (NOT NULL), gravado por fora da validação da loja
+    persistencia.salvar_produto('Ruim', float('nan'), 5)
+    persistencia.registrar_venda(HOJE, 'Ruim', 'Brasil', 1, 10.0)
+    assert loja.gerenciar_produto('Novo', 2.5, 10)[0]
+    assert loja.adicionar_venda(HOJE, 'Novo', 'Brasil', 2)[0]
+    persistencia.fechar()
+
+    # O produto e a venda dele ficam de fora; o resto do lote é gravado
+    recusados = [(nome, None) for _, produtos in persistencia.recusados for nome in produtos]
+    recusados += [(None, venda[1]) for vendas, _ in persistencia.recusados for venda in vendas]
+    assert sorted(recusados, key=str) == [('Ruim', None), (None, 'Ruim')]
+
+    snapshot = reabrir(caminho)
+    assert 'Ruim' not in snapshot.produtos
+    assert snapshot.produtos['Novo'] == {'preco': 2.5, 'estoque': 8}
+    novo = snapshot.vendas.produtos.index('Novo')
+    assert int(snapshot.vendas.quantidade[snapshot.vendas.produto == novo].sum()) == 2
+
+
+def test_loja_rejeita_preco_invalido_antes_de_gravar(caminho):
+    loja = abrir_loja(caminho)
+    versao = loja.versao
+    for preco in (float('nan'), float('inf'), 0.0, -1.0):
+        assert loja.gerenciar_produto('Ruim', preco, 5) == (False, "❌ Preço deve ser um número positivo")
+        assert loja.gerenciar_produto('Graxas', preco, 1, atualizar=True)[0] is False
+    assert loja.versao == versao
+    loja._persistencia.fechar()
+
+    assert loja._persistencia.recusados == []
+    snapshot = reabrir(caminho)
+    assert 'Ruim' not in snapshot.produtos
+
+
+def test_falha_transitoria_devolve_o_lote_a_fila(caminho, monkeypatch):
+    persistencia = PersistenciaSQLite(caminho)
+    persistencia.salvar_produto('Graxas', 50.0, 10)
+    persistencia.registrar_venda(HOJE, 'Graxas', 'Brasil', 1, 50.0)
+
+    gravar = persistencia._gravar
+
+    def bloqueado(vendas, produtos):
+        # Falha depois de atribuir códigos, que precisam voltar a ficar livres
+        for nome in produtos:
+            persistencia._codigo_produto(nome)
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(persistencia, '_gravar', bloqueado)
+    with pytest.raises(sqlite3.OperationalError):
+        persistencia.descarregar()
+    assert persistencia._codigos_produto == {}
+    monkeypatch.setattr(persistencia, '_gravar', gravar)
+    persistencia.fechar()
+
+    assert persistencia.recusados == []
+    produtos, filiais, vendas, _, _ = PersistenciaSQLite(caminho).carregar()
+    assert list(produtos) == ['Graxas'] and filiais == ['Brasil'] and len(vendas) == 1
+
+
+def gravacoes_separadas(persistencia, monkeypatch):
+    """
+    Registra cada transação gravada, com o descarregamento periódico
+    disparando entre quaisquer duas gravações de produto
+    """
+    transacoes = []
+    gravar, salvar_produto = persistencia._gravar, persistencia.salvar_produto
+
+    def registrar(vendas, produtos):
+        transacoes.append(({venda[1] for venda in vendas}, dict(produtos)))
+        gravar(vendas, produtos)
+
+    def salvar_e_descarregar(*args, **kwargs):
+        salvar_produto(*args, **kwargs)
+        persistencia.descarregar()
+
+    monkeypatch.setattr(persistencia, '_gravar', registrar)
+    monkeypatch.setattr(persistencia, 'salvar_produto', salvar_e_descarregar)
+    return transacoes
+
+
+def test_importar_vendas_grava_vendas_e_estoques_juntos(caminho, monkeypatch):
+    loja = abrir_loja(caminho)
+    transacoes = gravacoes_separadas(loja._persistencia, monkeypatch)
+    csv = f"data,produto,filial,quantidade\n{HOJE},Graxas,Brasil,2\n{HOJE},Pastas,EUA,3\n".encode()
+    snapshot = loja.snapshot()
+    lote = preparar_vendas(io.BytesIO(csv), snapshot.produtos, snapshot.filiais, 'vendas.csv')
+    assert loja.importar_vendas(lote)[0]
+
+    assert len(transacoes) == 1
+    vendidos, produtos = transacoes[0]
+    assert vendidos == {'Graxas', 'Pastas'}
+    assert {nome: estoque for nome, (_, estoque) in produtos.items()} == {
+        'Graxas': snapshot.produtos['Graxas']['estoque'] - 2, 'Pastas': snapshot.produtos['Pastas']['estoque'] - 3}
+    loja._persistencia.fechar()
+    assert reabrir(caminho).produtos == loja.snapshot().produtos
+
+
+def test_importar_produtos_grava_todos_juntos(caminho, monkeypatch):
+    loja = abrir_loja(caminho)
+    transacoes = gravacoes_separadas(loja._persistencia, monkeypatch)
+    graxas = loja.snapshot().produtos['Graxas']['estoque']
+    csv = "produto,preco,estoque\nGraxas,55.0,7\nNovo A,1.5,3\nNovo B,2.5,4\n".encode()
+    assert loja.importar_produtos(preparar_produtos(io.BytesIO(csv), 'produtos.csv'))[0]
+
+    assert [produtos for _, produtos in transacoes] == [{'Graxas': (55.0, graxas + 7), 'Novo A': (1.5, 3),
+                                                          'Novo B': (2.5, 4)}]
+    loja._persistencia.fechar()
+    assert reabrir(caminho).produtos == loja.snapshot().produtos
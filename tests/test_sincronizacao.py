@@ -0,0 +1,212 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from panut import sincronizacao
+from panut.sincronizacao import ESPERA_FALHA_MAXIMA, ReplicaDados
+
+DADOS = {
+    'produtos': {'Graxas': {'preco': 50.0, 'estoque': 10}},
+    'filiais': ['Brasil'],
+    'vendas': [{'data': '2024-02-01', 'produto': 'Graxas', 'filial': 'Brasil', 'quantidade': 2, 'valor': 100.0}],
+    'analytics': sincronizacao.ANALYTICS_VAZIO,
+    'cursor': 'abc:1:1'
+}
+
+
+class Resposta:
+    def __init__(self, status_code, dados=None):
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'application/json'}
+        self._dados = dados
+
+    def json(self):
+        return self._dados
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+
+class BackendFalso:
+    """
+    Sessão que responde como o backend (carga completa e depois 304, ou 410
+    depois de reiniciar) ou falha quando `fora_do_ar`
+    """
+
+    def __init__(self, demora=0.0):
+        self.fora_do_ar = False
+        self.demora = demora
+        self.cursor = DADOS['cursor']
+        self.chamadas = 0
+        self._trava = threading.Lock()
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        with self._trava:
+            self.chamadas += 1
+        time.sleep(self.demora)
+        if self.fora_do_ar:
+            raise requests.ConnectionError("backend fora do ar")
+        if url.endswith('/api/dados'):
+            return Resposta(200, {**DADOS, 'cursor': self.cursor})
+        # Cursor de outra época (o backend reiniciou) pede a carga completa
+        if params['cursor'].split(':')[0] != self.cursor.split(':')[0]:
+            return Resposta(410)
+        return Resposta(304)
+
+    def reiniciar(self, cursor):
+        self.cursor = cursor
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(sincronizacao.time, 'monotonic', relogio)
+    return relogio
+
+
+def test_falha_espera_antes_de_tentar_de_novo(relogio):
+    backend = BackendFalso()
+    backend.fora_do_ar = True
+    replica = ReplicaDados('http://backend', sessao=backend, intervalo=5, arrow=False)
+
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+    assert backend.chamadas == 1
+
+    # Reexecuções durante a espera recebem o erro sem acessar o backend
+    for _ in range(8):
+        with pytest.raises(requests.ConnectionError):
+            replica.snapshot()
+        relogio.agora += 0.5
+    assert backend.chamadas == 1
+    assert replica.snapshot_atual().versao == 0
+
+    # Passada a espera, tenta de novo e, falhando, espera o dobro
+    relogio.agora += 1
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+    assert backend.chamadas == 2
+    relogio.agora += 9
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+    assert backend.chamadas == 2
+
+    backend.fora_do_ar = False
+    relogio.agora += 1
+    assert replica.snapshot().versao == 1
+    assert backend.chamadas == 3
+
+
+def test_espera_tem_limite(relogio):
+    backend = BackendFalso()
+    backend.fora_do_ar = True
+    replica = ReplicaDados('http://backend', sessao=backend, intervalo=5, arrow=False)
+    for _ in range(12):
+        relogio.agora += ESPERA_FALHA_MAXIMA
+        with pytest.raises(requests.ConnectionError):
+            replica.snapshot()
+    assert backend.chamadas == 12
+
+
+def test_sucesso_zera_a_espera(relogio):
+    backend = BackendFalso()
+    replica = ReplicaDados('http://backend', sessao=backend, intervalo=5, arrow=False)
+    replica.snapshot()
+
+    backend.fora_do_ar = True
+    for _ in range(3):
+        relogio.agora += ESPERA_FALHA_MAXIMA
+        with pytest.raises(requests.ConnectionError):
+            replica.snapshot()
+    backend.fora_do_ar = False
+    relogio.agora += ESPERA_FALHA_MAXIMA
+    replica.snapshot()
+
+    # A próxima falha volta a esperar só o intervalo
+    backend.fora_do_ar = True
+    relogio.agora += 5
+    chamadas = backend.chamadas
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+    relogio.agora += 5
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+    assert backend.chamadas == chamadas + 2
+
+
+def test_forcar_e_escrita_confirmada_ignoram_a_espera(relogio):
+    backend = BackendFalso()
+    backend.fora_do_ar = True
+    replica = ReplicaDados('http://backend', sessao=backend, intervalo=5, arrow=False)
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+
+    backend.fora_do_ar = False
+    assert replica.snapshot(forcar=True).versao == 1
+
+    backend.fora_do_ar = True
+    relogio.agora += 5
+    with pytest.raises(requests.ConnectionError):
+        replica.snapshot()
+    backend.fora_do_ar = False
+    replica.registrar_escrita(1, 'abc')
+    replica.snapshot(forcar=False)
+    assert backend.chamadas == 4
+
+
+
+def test_escrita_de_epoca_anterior_nao_forca_sincronizacoes(relogio):
+    backend = BackendFalso()
+    backend.reiniciar('abc:50:1')
+    replica = ReplicaDados('http://backend', sessao=backend, intervalo=5, arrow=False)
+    replica.snapshot()
+    replica.registrar_escrita(50, 'abc')
+    replica.snapshot()
+    assert backend.chamadas == 1
+
+    # Depois de reiniciar o backend conta as versões de novo a partir de zero
+    backend.reiniciar('def:3:1')
+    relogio.agora += 5
+    snapshot = replica.snapshot()
+    assert (snapshot.epoca, snapshot.versao) == ('def', 3)
+    assert backend.chamadas == 3
+    for _ in range(5):
+        replica.snapshot()
+    assert backend.chamadas == 3
+
+    # Uma escrita já na época nova que a réplica não viu força a sincronização
+    backend.reiniciar('ghi:2:1')
+    replica.registrar_escrita(2, 'ghi')
+    assert replica.snapshot().epoca == 'ghi'
+    assert backend.chamadas == 5
+    replica.snapshot()
+    assert backend.chamadas == 5
+
+def test_sessoes_concorrentes_sincronizam_uma_vez():
+    backend = BackendFalso(demora=0.05)
+    replica = ReplicaDados('http://backend', sessao=backend, intervalo=60, arrow=False)
+    barreira = threading.Barrier(8)
+    versoes = []
+
+    def ler():
+        barreira.wait()
+        versoes.append(replica.snapshot().versao)
+
+    threads = [threading.Thread(target=ler) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert versoes == [1] * 8
+    assert backend.chamadas == 1
@@ -0,0 +1,140 @@
+"""
+Inicia vários processos do Streamlit com o app.py e um balanceador local
+na frente deles.
+
+Cada worker roda em modo compartilhado (PANUT_COMPARTILHADO=1): produtos e
+vendas vivem no banco SQLite (PANUT_DB), e cada worker vê as escritas dos
+outros em até ~50 ms. Assim o trabalho de pandas e Plotly das sessões se
+divide entre os núcleos, em vez de disputar o GIL de um único processo.
+Com PANUT_PUBLICACAO, só um worker guarda as linhas do ledger e os demais
+as mapeiam de um snapshot Arrow publicado por ele (ver panut/publicacao.py).
+
+O balanceador repassa as conexões TCP sem interpretar o tráfego, exceto o
+cabeçalho da primeira requisição de cada conexão: o cookie `panut_worker`
+escolhe o worker, e um navegador sem o cookie é distribuído em rodízio e
+recebe o cookie na resposta. Assim o WebSocket, os uploads e os downloads
+de uma sessão vão sempre para o worker que guarda essa sessão.
+
+Uso:
+    python workers.py --workers 4 --porta 8501
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import secrets
+import signal
+import subprocess
+import sys
+
+COOKIE = 'panut_worker'
+PORTA_BASE_PADRAO = 8600
+# Maior cabeçalho HTTP aceito na primeira requisição de uma conexão
+TAMANHO_CABECALHO = 64 * 1024
+FIM_CABECALHO = b'\r\n\r\n'
+
+_COOKIE = re.compile(rb'^cookie:.*?\b' + COOKIE.encode() + rb'=(\d+)', re.IGNORECASE | re.MULTILINE)
+
+
+def iniciar_workers(app, n, porta_base, argumentos=()):
+    """Um processo `streamlit run` por worker, nas portas porta_base, porta_base + 1, ..."""
+    ambiente = dict(os.environ, PANUT_COMPARTILHADO='1')
+    # Segredo comum, para que os cookies de XSRF valham em qualquer worker
+    ambiente.setdefault('STREAMLIT_SERVER_COOKIE_SECRET', secrets.token_hex(16))
+    return [
+        subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', app, '--server.port', str(porta_base + i),
+                          '--server.address', '127.0.0.1', '--server.headless', 'true', *argumentos],
+                         env=ambiente)
+        for i in range(n)
+    ]
+
+
+async def _copiar(leitor, escritor):
+    try:
+        while dados := await leitor.read(65536):
+            escritor.write(dados)
+            await escritor.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        escritor.close()
+
+
+class Balanceador:
+    """Balanceador TCP com afinidade por cookie entre `portas` locais"""
+
+    def __init__(self, portas):
+        self.portas = list(portas)
+        self._rodizio = itertools.cycle(range(len(self.portas)))
+
+    def _escolher(self, cabecalho):
+        """(índice do worker, se o navegador ainda não tinha cookie)"""
+        encontrado = _COOKIE.search(cabecalho)
+        if encontrado is not None and int(encontrado.group(1)) < len(self.portas):
+            return int(encontrado.group(1)), False
+        return next(self._rodizio), True
+
+    async def _conectar(self, indice):
+        # Um worker fora do ar (ex.: ainda subindo) cede a vez ao seguinte
+        for tentativa in range(len(self.portas)):
+            i = (indice + tentativa) % len(self.portas)
+            try:
+                return i, await asyncio.open_connection('127.0.0.1', self.portas[i])
+            except OSError:
+                continue
+        raise ConnectionError("Nenhum worker disponível")
+
+    async def atender(self, leitor_cliente, escritor_cliente):
+        try:
+            cabecalho = await leitor_cliente.readuntil(FIM_CABECALHO)
+            indice, novo = self._escolher(cabecalho)
+            indice, (leitor_worker, escritor_worker) = await self._conectar(indice)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            escritor_cliente.close()
+            return
+
+        escritor_worker.write(cabecalho)
+        if novo:
+            # Cookie na primeira resposta, antes da linha em branco do cabeçalho
+            try:
+                resposta = await leitor_worker.readuntil(FIM_CABECALHO)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                escritor_cliente.close()
+                escritor_worker.close()
+                return
+            escritor_cliente.write(resposta[:-2] + f'Set-Cookie: {COOKIE}={indice}; Path=/; HttpOnly; '
+                                                   f'SameSite=Lax\r\n\r\n'.encode())
+        await asyncio.gather(_copiar(leitor_cliente, escritor_worker), _copiar(leitor_worker, escritor_cliente))
+
+    async def servir(self, host, porta):
+        servidor = await asyncio.start_server(self.atender, host, porta, limit=TAMANHO_CABECALHO)
+        async with servidor:
+            await servidor.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processos do Streamlit')
+    parser.add_argument('--porta', type=int, default=int(os.getenv('PORT', '8501')), help='Porta do balanceador')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--porta-base', type=int, default=PORTA_BASE_PADRAO, help='Porta do primeiro worker')
+    parser.add_argument('--app', default='app.py')
+    args = parser.parse_args()
+
+    processos = iniciar_workers(args.app, args.workers, args.porta_base)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"{args.workers} workers em http://{args.host}:{args.porta}")
+    try:
+        asyncio.run(Balanceador(range(args.porta_base, args.porta_base + args.workers)).servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.wait()
+
+
+if __name__ == '__main__':
+    main()